@@ -12,6 +12,10 @@ class Node(object):
         children: Method to return list of children. Alternatively, you can
                   look into __iter__ method, which allow nodes to be
                   iterable.
+
+    The 'coord' of a node built by the parser is its span in the source, as
+    packed by SimplePythonDiagnostics.make_span. Types are shared between
+    nodes, so they have no coord.
     """
 
     def children(self):
@@ -23,6 +27,9 @@ class Node(object):
     # Set of attributes for a given node
     attr_names = ()
 
+    # Subclasses still have a __dict__, unless they declare their own slots
+    __slots__ = ()
+
 class NodeVisitor(object):
     """
     A base NodeVisitor class for visiting MiniJava nodes.
@@ -69,10 +76,13 @@ class NodeVisitor(object):
         Custom visit method for "Program" node
         """
         print("====== PROGRAM START ======")
+        for imp in node.imports:
+            self.visit(imp, offset=2)
         if node.func_decl != None:
             for func in node.func_decl[::-1]:
                 self.visit(func, offset=2)
-        self.visit(node.main_func, offset=2)
+        if node.main_func is not None:
+            self.visit(node.main_func, offset=2)
         print("====== PROGRAM END ======")
 
 class AssignStmt(Node):
@@ -80,6 +90,7 @@ class AssignStmt(Node):
         self.name = name
         self.expr = expr
         self.coord = coord
+        self.binding = None
 
     def children(self):
         nodelist = []
@@ -141,6 +152,11 @@ class Array(Node):
     attr_names = ()
 
 class ArrayIndexing(Node):
+    """
+    Indexes the array named by an id, or the array given by another
+    ArrayIndexing (for a nested array) or by an ArraySlice
+    """
+
     def __init__(self, array_name, array_index, coord=None):
         self.array_name = array_name
         self.array_index = array_index
@@ -154,13 +170,60 @@ class ArrayIndexing(Node):
             nodelist.append(('array_index', self.array_index))
         return tuple(nodelist)
 
+    def name(self):
+        """
+        Returns the name of the variable holding the outermost array
+        """
+        if isinstance(self.array_name, (ArrayIndexing, ArraySlice)):
+            return self.array_name.name()
+        return self.array_name.value
+
+    attr_names = ()
+
+class ArraySlice(Node):
+    """
+    Takes the elements of an array (named by an id, or given by an
+    ArrayIndexing or another ArraySlice) from 'lower' up to 'upper', either
+    of which can be None to take the elements from the start or up to the
+    end
+    """
+
+    def __init__(self, array, lower, upper, coord=None):
+        self.array = array
+        self.lower = lower
+        self.upper = upper
+        self.coord = coord
+
+    def children(self):
+        nodelist = []
+        if self.array is not None:
+            nodelist.append(('array', self.array))
+        if self.lower is not None:
+            nodelist.append(('lower', self.lower))
+        if self.upper is not None:
+            nodelist.append(('upper', self.upper))
+        return tuple(nodelist)
+
+    def name(self):
+        """
+        Returns the name of the variable holding the outermost array
+        """
+        if isinstance(self.array, (ArrayIndexing, ArraySlice)):
+            return self.array.name()
+        return self.array.value
+
     attr_names = ()
 
 class Constant(Node):
+    # Array literals have a Constant per element, so they have no __dict__
+    __slots__ = ('const_type', 'value', 'coord', 'binding', 'type')
+
     def __init__(self, type, value, coord=None):
         self.const_type = type
         self.value = value
         self.coord = coord
+        # Symbol table binding of an id, filled in by the type checker
+        self.binding = None
 
     def children(self):
         nodelist = []
@@ -184,6 +247,37 @@ class DeclStmt(Node):
 
     attr_names = ('name', )
 
+class ForRange(Node):
+    """
+    A loop of the form 'for <var> in range(<start>, <end>, <step>)'. The
+    step is a constant, so the direction of the loop is known. The
+    iterations of a 'parallel for' loop may run in any order, on several
+    threads.
+    """
+
+    def __init__(self, var, start, end, step, body, coord=None, parallel=False):
+        self.var = var
+        self.start = start
+        self.end = end
+        self.step = step
+        self.body = body
+        self.coord = coord
+        self.parallel = parallel
+
+    def children(self):
+        nodelist = []
+        if self.start is not None:
+            nodelist.append(('start', self.start))
+        if self.end is not None:
+            nodelist.append(('end', self.end))
+        if self.step is not None:
+            nodelist.append(('step', self.step))
+        if self.body is not None:
+            nodelist.append(('body', self.body))
+        return tuple(nodelist)
+
+    attr_names = ('var', 'parallel')
+
 class Formal(Node):
     def __init__(self, name, type, coord=None):
         self.name = name
@@ -217,6 +311,17 @@ class IfStmt(Node):
 
     attr_names = ()
 
+class Import(Node):
+    def __init__(self, module, names, coord=None):
+        self.module = module
+        self.names = names
+        self.coord = coord
+
+    def children(self):
+        return ()
+
+    attr_names = ('module', 'names')
+
 class MethodDecl(Node):
     def __init__(self, name, ret_type, params, body, coord=None):
         self.name = name
@@ -251,12 +356,25 @@ class ParamList(Node):
     attr_names = ()
 
 class Program(Node):
-    def __init__(self, main_func, func_decl, coord=None):
+    def __init__(self, main_func, func_decl, coord=None, imports=None):
         self.main_func = main_func
         self.func_decl = func_decl
+        self.coord = coord
+        self.imports = imports or []
+
+    def methods(self):
+        """
+        All the methods of the program, ending with main if it has one (a
+        module imported by other files doesn't need one)
+        """
+        if self.main_func is None:
+            return list(self.func_decl)
+        return self.func_decl + [self.main_func]
 
     def children(self):
         nodelist = []
+        for i, imp in enumerate(self.imports):
+            nodelist.append(('imports[%d]' % i, imp))
         if self.func_decl is not None and len(self.func_decl) > 0:
             nodelist.append(('func_decl', self.func_decl))
         if self.main_func is not None:
@@ -281,6 +399,7 @@ class RetStmt(Node):
 class StmtList(Node):
     def __init__(self, stmt_lst, coord=None):
         self.stmt_lst = stmt_lst
+        self.coord = coord
 
     def children(self):
         nodelist = []
@@ -304,18 +423,98 @@ class FunctionCall(Node):
 
     attr_names = ('name', )
 
-class Type(Node):
-    def __init__(self, name, arr_depth=0, coord=None):
+# Functions built into the language, which programs can't redeclare
+BUILTINS = ('len', 'sum', 'min', 'max')
+
+class BuiltinCall(Node):
+    """
+    A call to one of the BUILTINS, which is compiled to inline code rather
+    than to a function call
+    """
+
+    def __init__(self, name, args_list, coord=None):
         self.name = name
+        self.args_list = args_list
         self.coord = coord
-        self.arr_depth = arr_depth
 
     def children(self):
         nodelist = []
+        for i, arg in enumerate(self.args_list or []):
+            nodelist.append(('args[%d]' % i, arg))
         return tuple(nodelist)
 
     attr_names = ('name', )
 
+class Type(Node):
+    """
+    Types are interned: there is a single, immutable Type object for each
+    base type and array depth, so two types are equal exactly when they are
+    the same object. Calling Type(...) returns the existing object.
+    """
+
+    # Base type name -> {array depth -> Type}
+    _interned = {}
+
+    def __new__(cls, name, arr_depth=0, coord=None):
+        return cls.get(name, arr_depth)
+
+    def __init__(self, name, arr_depth=0, coord=None):
+        # Everything is set up once, when the type is interned
+        pass
+
+    @classmethod
+    def get(cls, name, arr_depth=0):
+        """
+        Returns the Type for 'name' nested in 'arr_depth' arrays
+        """
+        try:
+            return cls._interned[name][arr_depth]
+        except KeyError:
+            pass
+
+        t = object.__new__(cls)
+        object.__setattr__(t, 'name', name)
+        object.__setattr__(t, 'arr_depth', arr_depth)
+        object.__setattr__(t, 'coord', None)
+        cls._interned.setdefault(name, {})[arr_depth] = t
+        return t
+
+    def array_type(self):
+        """
+        Returns the type of an array of this type
+        """
+        return Type.get(self.name, self.arr_depth + 1)
+
+    def element_type(self):
+        """
+        Returns the type of the elements of this array type
+        """
+        return Type.get(self.name, self.arr_depth - 1)
+
+    def __setattr__(self, name, value):
+        # Visitors record the type of every node they visit, which is harmless
+        if name != 'type':
+            raise AttributeError("Type objects are immutable")
+        object.__setattr__(self, name, value)
+
+    def __reduce__(self):
+        # Unpickling goes through the constructor, which re-interns the type
+        return (Type, (self.name, self.arr_depth))
+
+    def children(self):
+        nodelist = []
+        return tuple(nodelist)
+
+    attr_names = ('name', )
+
+INT = Type('int')
+BOOL = Type('bool')
+STR = Type('str')
+NONE = Type('None')
+# Given to names whose declaration failed to typecheck, so that their uses
+# don't cause further errors
+ERROR = Type('<error>')
+
 class UnaryOp(Node):
     def __init__(self, op, expr, coord=None):
         self.op = op
@@ -345,3 +544,36 @@ class WhileStmt(Node):
         return tuple(nodelist)
 
     attr_names = ()
+
+def constant_int(node):
+    """
+    Returns the value of an integer literal, which may be negated, or None
+    if 'node' isn't one
+    """
+    if isinstance(node, UnaryOp) and node.op == '-':
+        value = constant_int(node.expr)
+        return -value if value is not None else None
+    if isinstance(node, Constant) and node.const_type == 'int':
+        return node.value
+    return None
+
+def loop_reductions(loop):
+    """
+    Returns the (op, name) of each variable declared outside a typechecked
+    parallel loop that its body reduces, which are all the variables it
+    assigns without declaring them
+    """
+    declared = set()
+    reduced = {}
+    stack = [loop.body]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, AssignStmt):
+            if getattr(node, 'isDecl', False):
+                declared.add(node.name)
+            else:
+                reduced[node.name] = node.expr.op
+        elif isinstance(node, ForRange):
+            declared.add(node.var)
+        stack.extend(child for name, child in node.children())
+    return sorted((op, name) for name, op in reduced.items() if name not in declared)
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+
+import glob
+import os
+import shutil
+import subprocess
+import tempfile
+
+class BuildError(Exception): pass
+
+# Flags for each of the build presets offered by the driver
+BUILD_PRESETS = {
+    'O2': ['-O2'],
+    'O3-native': ['-O3', '-march=native'],
+    'lto': ['-O3', '-march=native', '-flto'],
+}
+
+DEFAULT_COMPILERS = ['cc', 'gcc', 'clang']
+
+# Marks the C files with parallel loops, which need OpenMP to run in parallel
+OPENMP_PRAGMA = '#pragma omp'
+
+# Program compiled to find out whether the compiler supports OpenMP
+OPENMP_PROBE = '''\
+#include <omp.h>
+int main(void) { return omp_get_max_threads() > 0 ? 0 : 1; }
+'''
+
+
+def write_file(path, text):
+    """
+    Replaces the content of a file atomically: the text is written to a
+    temporary file first, so anything reading the file (a C compiler, an
+    editor, the next run) sees either the old or the new content in full
+    """
+    temp = path + '.tmp'
+    with open(temp, 'w') as f:
+        f.write(text)
+    os.replace(temp, path)
+
+
+def uses_openmp(sources):
+    """
+    Returns whether any of the C files has a parallel loop
+    """
+    for source in sources:
+        with open(source, 'r') as f:
+            if OPENMP_PRAGMA in f.read():
+                return True
+    return False
+
+
+class CCompiler(object):
+    """
+    Compiles and links the generated C code with a C compiler found on the
+    system, either in a single step or as a two-stage profile-guided build.
+    """
+
+    def __init__(self, cc=None, verbose=False):
+        self.cc = self.find_compiler(cc)
+        self.verbose = verbose
+        self.is_clang = 'clang' in self.run([self.cc, '--version']).stdout
+        # Flags enabling OpenMP, once the compiler was probed for them
+        self.openmp = None
+
+    def find_compiler(self, cc):
+        """
+        Returns the path of the C compiler to use: the one given, then $CC,
+        then the first of cc, gcc and clang on the PATH
+        """
+        candidates = [cc] if cc is not None else [os.environ.get('CC')] + DEFAULT_COMPILERS
+        for candidate in candidates:
+            if candidate and shutil.which(candidate):
+                return shutil.which(candidate)
+        raise BuildError("Could not find a C compiler (tried " + ', '.join(c for c in candidates if c) + ")")
+
+    def run(self, cmd, **kwargs):
+        if self.verbose:
+            print('* ' + ' '.join(cmd))
+        try:
+            result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                    universal_newlines=True, **kwargs)
+        except OSError as e:
+            raise BuildError("Could not run \"" + cmd[0] + "\": " + str(e))
+        if result.returncode != 0:
+            raise BuildError("\"" + ' '.join(cmd) + "\" failed:\n" + result.stderr)
+        return result
+
+    def flags(self, preset):
+        if preset not in BUILD_PRESETS:
+            raise BuildError("Unknown build preset \"" + preset + "\"")
+        return BUILD_PRESETS[preset]
+
+    def openmp_flags(self):
+        """
+        Returns the flags enabling OpenMP, or no flags if the compiler (or
+        its runtime library) doesn't support it, in which case parallel
+        loops are compiled as the serial loops they also are
+        """
+        if self.openmp is None:
+            probe_dir = tempfile.mkdtemp(prefix='sp-omp-')
+            try:
+                probe = os.path.join(probe_dir, 'probe.c')
+                write_file(probe, OPENMP_PROBE)
+                self.run([self.cc, '-fopenmp', '-o', os.path.join(probe_dir, 'probe'), probe])
+                self.openmp = ['-fopenmp']
+            except BuildError:
+                if self.verbose:
+                    print('* ' + self.cc + ' has no OpenMP support, parallel loops will run serially')
+                self.openmp = []
+            finally:
+                shutil.rmtree(probe_dir, ignore_errors=True)
+        return self.openmp
+
+    def compile(self, sources, executable, preset='O2', extra_flags=()):
+        """
+        Compiles and links the C files in 'sources' into 'executable'
+        """
+        if uses_openmp(sources):
+            extra_flags = self.openmp_flags() + list(extra_flags)
+        cmd = [self.cc] + self.flags(preset) + list(extra_flags) + ['-o', executable] + list(sources)
+        self.run(cmd)
+        return executable
+
+    def compile_pgo(self, sources, executable, preset='O2', train_input=None, train_args=(), extra_flags=()):
+        """
+        Builds an instrumented 'executable', runs it once on the training
+        input (fed through stdin) to collect a profile, and rebuilds it
+        using that profile
+        """
+        profile_dir = tempfile.mkdtemp(prefix='sp-pgo-')
+        try:
+            if self.is_clang:
+                raw = os.path.join(profile_dir, 'default-%p.profraw')
+                self.compile(sources, executable, preset, list(extra_flags) + ['-fprofile-instr-generate=' + raw])
+            else:
+                self.compile(sources, executable, preset, list(extra_flags) + ['-fprofile-generate=' + profile_dir])
+
+            self.train(executable, train_input, train_args)
+
+            if self.is_clang:
+                profdata = os.path.join(profile_dir, 'default.profdata')
+                profdata_tool = shutil.which('llvm-profdata')
+                if profdata_tool is None:
+                    raise BuildError("Profile-guided builds with clang need llvm-profdata")
+                self.run([profdata_tool, 'merge', '-output=' + profdata] +
+                         glob.glob(os.path.join(profile_dir, '*.profraw')))
+                use_flags = ['-fprofile-instr-use=' + profdata]
+            else:
+                use_flags = ['-fprofile-use=' + profile_dir, '-fprofile-correction', '-Wno-missing-profile']
+
+            return self.compile(sources, executable, preset, list(extra_flags) + use_flags)
+        finally:
+            shutil.rmtree(profile_dir, ignore_errors=True)
+
+    def train(self, executable, train_input=None, train_args=()):
+        """
+        Runs the instrumented executable once to record its profile
+        """
+        cmd = [os.path.abspath(executable)] + list(train_args)
+        if self.verbose:
+            print('* ' + ' '.join(cmd))
+        stdin = open(train_input, 'r') if train_input is not None else subprocess.DEVNULL
+        try:
+            result = subprocess.run(cmd, stdin=stdin, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                                    universal_newlines=True)
+        finally:
+            if train_input is not None:
+                stdin.close()
+        if result.returncode != 0:
+            raise BuildError("The training run failed:\n" + result.stderr)
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+
+import json
+from bisect import bisect_right
+
+from SimplePythonSymbolTable import ParseErrorList
+
+# A span is the [start, end) range of offsets a node covers in the source,
+# packed into a single int (the start in the low bits) so that it costs a
+# node no more than one small object
+SPAN_SHIFT = 32
+SPAN_MASK = (1 << SPAN_SHIFT) - 1
+
+def make_span(start, end):
+    return start | (end << SPAN_SHIFT)
+
+def span_start(span):
+    return span & SPAN_MASK
+
+def span_end(span):
+    return span >> SPAN_SHIFT
+
+class SourceMap(object):
+    """
+    Converts offsets in a source into lines and columns (both starting at
+    1). The index of line starts is only built the first time it's needed,
+    so sources without errors never pay for it.
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self.line_starts = None
+
+    def locate(self, offset):
+        if self.line_starts is None:
+            self.line_starts = [0]
+            pos = self.data.find('\n')
+            while pos != -1:
+                self.line_starts.append(pos + 1)
+                pos = self.data.find('\n', pos + 1)
+        line = bisect_right(self.line_starts, offset)
+        return line, offset - self.line_starts[line - 1] + 1
+
+class Diagnostic(object):
+    """
+    A problem found in the source, along with the phase that found it
+    ('lexical', 'syntax', 'type' or 'import') and the span it covers. The
+    file, lines and columns of the span are filled in by locate().
+    """
+
+    def __init__(self, phase, message, span=None, severity='error'):
+        self.phase = phase
+        self.message = message
+        self.span = span
+        self.severity = severity
+        self.file = None
+        self.line = self.column = None
+        self.end_line = self.end_column = None
+
+    def locate(self, source_map, filename=None):
+        if filename is not None:
+            self.file = filename
+        if self.span is not None:
+            self.line, self.column = source_map.locate(span_start(self.span))
+            self.end_line, self.end_column = source_map.locate(span_end(self.span))
+
+    def as_dict(self):
+        return {
+            'file': self.file,
+            'phase': self.phase,
+            'severity': self.severity,
+            'message': self.message,
+            'line': self.line,
+            'column': self.column,
+            'end_line': self.end_line,
+            'end_column': self.end_column,
+        }
+
+    def format(self, filename=None):
+        """
+        Formats the diagnostic the way most compilers do, as
+        "file:line:column: severity: message"
+        """
+        filename = filename or self.file or '<input>'
+        if self.line is None:
+            return "{}: {}: {}".format(filename, self.severity, self.message)
+        return "{}:{}:{}: {}: {}".format(filename, self.line, self.column, self.severity, self.message)
+
+def from_error(error, phase='type'):
+    """
+    Returns the diagnostics for a ParseError (or for each of the errors of
+    a ParseErrorList) raised by the type checker
+    """
+    if isinstance(error, ParseErrorList):
+        return [d for e in error.errors for d in from_error(e, phase)]
+    message = str(error.args[0]) if error.args else str(error)
+    span = error.args[1] if len(error.args) > 1 and isinstance(error.args[1], int) else None
+    return [Diagnostic(phase, message, span)]
+
+def locate_all(diagnostics, source_map, filename):
+    for diagnostic in diagnostics:
+        diagnostic.locate(source_map, filename)
+    return diagnostics
+
+def report(diagnostics, fmt='text', out=None):
+    """
+    Writes the diagnostics, which must have been located, sorted by file
+    and position, either one per line or as a single JSON object
+    """
+    diagnostics = sorted(diagnostics, key=lambda d: (d.file or '', d.line or 0, d.column or 0))
+
+    if fmt == 'json':
+        result = {
+            'diagnostics': [diagnostic.as_dict() for diagnostic in diagnostics],
+        }
+        json.dump(result, out, indent=2, sort_keys=True)
+        out.write('\n')
+    else:
+        for diagnostic in diagnostics:
+            out.write(diagnostic.format() + '\n')
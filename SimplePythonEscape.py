@@ -0,0 +1,247 @@
+from SimplePythonIRGen import TAC, IRControl
+
+# Controls opening a C block, at the end of which the variables declared in
+# it (and the arrays stored on the stack in it) go away
+BLOCK_CONTROLS = frozenset(['FUNC', 'IF', 'ELSE', 'WHILE', 'FOR', 'BLOCK'])
+
+
+def operand_names(operand, elements):
+    """
+    Returns the names of the variables and temporaries an operand points
+    into. Those in the elements of an array literal are only included if
+    'elements' is true, as the elements are otherwise copied.
+    """
+    if operand.op_type in ('id', 'expr'):
+        return [operand.value]
+    if operand.op_type == 'array' and elements:
+        names = []
+        for element in operand.value:
+            names.extend(operand_names(element, elements))
+        return names
+    return []
+
+
+def aliased_names(ir):
+    """
+    Returns the names of the values that the result of a line of IR may
+    point into. Arrays and strings aren't copied by assignments, views of
+    arrays or function calls (which may return one of their arguments), and
+    arrays of strings share the strings of the arrays they are built from.
+    """
+    strings = ir.typeinfo == 'str'
+    shared = ir.arr_depth > 0 or strings
+    if ir.op in ('DECL', 'ASSIGN', 'SLICE', 'ARRAY_IDX', 'CHECKED_ARRAY_IDX') and shared:
+        # The rows of a nested array literal are copied into it
+        return operand_names(ir.src1, strings)
+    if ir.op == 'CALL' and shared:
+        names = []
+        for arg in ir.src2:
+            names.extend(operand_names(arg, True))
+        return names
+    if ir.op == '+' and ir.arr_depth > 0 and strings:
+        return operand_names(ir.src1, True) + operand_names(ir.src2, True)
+    return []
+
+
+class ValueSets(object):
+    """
+    Disjoint sets of the values (variables and temporaries, identified by
+    their name and the block they are declared in) that may point to the
+    same array or string
+    """
+
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, value):
+        root = self.parent.setdefault(value, value)
+        while self.parent[root] != root:
+            root = self.parent[root]
+        # Point the values on the way straight to the root
+        while value != root:
+            self.parent[value], value = root, self.parent[value]
+        return root
+
+    def union(self, value1, value2):
+        root1 = self.find(value1)
+        root2 = self.find(value2)
+        if root1 != root2:
+            self.parent[root1] = root2
+
+
+def local_allocations(irlst):
+    """
+    Returns the indices of the lines of IR whose result is only used in the
+    block they are in, along with everything that may point into it, and
+    isn't returned. An array or string built by one of these lines can be
+    released at the end of its block (or of an iteration of its loop).
+    """
+    values = ValueSets()
+    # The block each block is nested in, and, for each of the open blocks,
+    # its number and the names declared in it
+    outer = {}
+    blocks = []
+    declared = []
+    returned = []
+    sites = []
+
+    def resolve(name):
+        # The innermost declaration of a name, as C scopes it
+        for names in reversed(declared):
+            if name in names:
+                return names[name]
+        return (name, blocks[0])
+
+    def declare(name):
+        value = (name, blocks[-1])
+        declared[-1][name] = value
+        values.find(value)
+        return value
+
+    for i, ir in enumerate(irlst):
+        if isinstance(ir, IRControl):
+            if ir.ctl in BLOCK_CONTROLS:
+                outer[len(outer)] = blocks[-1] if ir.ctl != 'FUNC' else None
+                blocks.append(len(outer) - 1)
+                declared.append({})
+                if ir.ctl == 'FUNC':
+                    for param in ir.data[2] or ():
+                        declare(param[0])
+            elif ir.ctl.startswith('END'):
+                blocks.pop()
+                declared.pop()
+            elif ir.ctl == 'RET':
+                returned.extend(resolve(name) for name in operand_names(ir.data, True))
+        elif isinstance(ir, TAC) and ir.dest is not None:
+            sources = [resolve(name) for name in aliased_names(ir)]
+            # Temporaries are declared where they are computed
+            if ir.op == 'DECL' or ir.dest.op_type == 'expr':
+                dest = declare(ir.dest.value)
+            else:
+                dest = resolve(ir.dest.value)
+            for source in sources:
+                values.union(dest, source)
+            sites.append((i, dest, blocks[-1]))
+
+    escaped = set(values.find(value) for value in returned)
+    # The blocks the values of each set are declared in
+    scopes = {}
+    for value in values.parent:
+        scopes.setdefault(values.find(value), set()).add(value[1])
+
+    def nested_in(scope, block):
+        while scope is not None:
+            if scope == block:
+                return True
+            scope = outer[scope]
+        return False
+
+    local = set()
+    for i, dest, block in sites:
+        root = values.find(dest)
+        if root not in escaped and all(nested_in(scope, block) for scope in scopes[root]):
+            local.add(i)
+    return local
+
+
+# The operators building a new array out of two arrays, or an array and an int
+ARRAY_OPS = frozenset(['+', '-', '*', '/', '%'])
+
+
+def flat_size(operand, depth, sizes):
+    """
+    Returns the number of elements of an array operand with 'depth'
+    dimensions, if it is known at compile time, or None
+    """
+    if operand.op_type == 'array':
+        if depth <= 1:
+            return len(operand.value)
+        rows = [flat_size(row, depth - 1, sizes) for row in operand.value]
+        return None if None in rows else sum(rows)
+    if operand.op_type in ('id', 'expr'):
+        return sizes.get(operand.value)
+    return None
+
+
+def arena_scopes(irlst, local, stack_max_length):
+    """
+    Returns the indices of the FUNC controls of the functions that may build
+    arrays or strings in an arena, and of the WHILE and FOR controls of the
+    loops resetting it on each iteration. These are the functions and
+    innermost loops of the 'local' lines whose result may not fit in a
+    buffer of 'stack_max_length' elements on the stack. Parallel loops
+    build on the heap rather than in the arena, as it isn't shared between
+    threads.
+    """
+    scopes = set()
+    func = None
+    # The indices of the open loops, and of those that are parallel
+    loops = []
+    parallel = []
+    # The number of elements of the arrays whose length is known, and the
+    # variables assigned after they are declared, whose length can change
+    sizes = {}
+    assigned = set()
+
+    for i, ir in enumerate(irlst):
+        if isinstance(ir, IRControl):
+            if ir.ctl == 'FUNC':
+                func = i
+                sizes = {}
+                assigned = set()
+                for later in irlst[i + 1:]:
+                    if isinstance(later, IRControl) and later.ctl == 'ENDFUNC':
+                        break
+                    if isinstance(later, TAC) and later.op == 'ASSIGN' and later.dest is not None:
+                        assigned.add(later.dest.value)
+            elif ir.ctl in ('WHILE', 'FOR'):
+                loops.append(i)
+                parallel.append(ir.ctl == 'FOR' and ir.data[4] is not None)
+            elif ir.ctl in ('ENDWHILE', 'ENDFOR'):
+                loops.pop()
+                parallel.pop()
+            continue
+        if not isinstance(ir, TAC) or ir.dest is None:
+            continue
+
+        size = None
+        builds = False
+        if ir.typeinfo == 'str' and ir.arr_depth == 0:
+            if ir.op == '+':
+                builds = True
+                if ir.src1.op_type == 'str' and ir.src2.op_type == 'str':
+                    size = len(ir.src1.value) + len(ir.src2.value)
+        elif ir.arr_depth > 0:
+            if ir.op == '+':
+                builds = True
+                size1 = flat_size(ir.src1, ir.arr_depth, sizes)
+                size2 = flat_size(ir.src2, ir.arr_depth, sizes)
+                if size1 is not None and size2 is not None:
+                    size = size1 + size2
+            elif ir.op in ARRAY_OPS:
+                builds = True
+                known = [flat_size(src, 1, sizes) for src in (ir.src1, ir.src2)]
+                size = next((s for s in known if s is not None), None)
+            elif ir.op in ('DECL', 'ASSIGN'):
+                size = flat_size(ir.src1, ir.arr_depth, sizes)
+                # A nested literal with rows that aren't literals is copied
+                # into an array of its own
+                builds = (ir.src1.op_type == 'array' and ir.arr_depth > 1 and
+                          any(row.op_type != 'array' for row in ir.src1.value))
+                if ir.op == 'DECL' and ir.dest.value not in assigned:
+                    sizes[ir.dest.value] = size
+            elif ir.op == 'SLICE' and ir.arr_depth == 1:
+                length = flat_size(ir.src1, 1, sizes)
+                if length is not None and all(bound.op_type == 'int' for bound in ir.src2):
+                    start, stop, _ = slice(ir.src2[0].value, ir.src2[1].value).indices(length)
+                    size = max(stop - start, 0)
+        if ir.dest.op_type == 'expr':
+            sizes[ir.dest.value] = size
+
+        if not builds or i not in local or any(parallel):
+            continue
+        if size is None or not 0 < size <= stack_max_length:
+            scopes.add(func)
+            if loops:
+                scopes.add(loops[-1])
+    return scopes
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+
+import json
+
+from SimplePythonIRGen import TAC, IRControl, Operand
+
+class IRFormatError(Exception): pass
+
+# First line of every IR file, and the version of the format it holds
+MAGIC = 'SPIR'
+VERSION = 1
+
+# An IR file is line-oriented text, so that the IR of two builds can be
+# compared with diff. After the header line, each line is a JSON array
+# holding one line of IR:
+#
+#     ["T", op, typeinfo, arr_depth, dest, src1, src2]     for a TAC
+#     ["C", ctl, data]                                    for an IRControl
+#
+# Operands are written as {op_type: value}, e.g. {"id": "x"} or {"int": 3},
+# and the elements of an array operand are operands themselves. Lists and
+# tuples (the arguments of a CALL, the data of a FUNC, ...) are written as
+# JSON arrays, and names and numbers as themselves.
+#
+# Temporaries are only unique within a function. When loading, every use
+# of a temporary in a function gets the same Operand object, as it did
+# when the IR was generated.
+
+def encode_value(value):
+    if isinstance(value, Operand):
+        if value.op_type == 'array':
+            return {'array': [encode_value(element) for element in value.value]}
+        return {value.op_type: value.value}
+    elif isinstance(value, (list, tuple)):
+        return [encode_value(element) for element in value]
+    return value
+
+def encode(ir):
+    if isinstance(ir, IRControl):
+        return ['C', ir.ctl, encode_value(ir.data)]
+    return ['T', ir.op, ir.typeinfo, ir.arr_depth,
+            encode_value(ir.dest), encode_value(ir.src1), encode_value(ir.src2)]
+
+def encode_lines(irlst):
+    """
+    Returns the lines of text holding the IR, leaving out removed (None)
+    lines
+    """
+    dumps = json.JSONEncoder(separators=(',', ':')).encode
+    return [dumps(encode(ir)) for ir in irlst if ir is not None]
+
+def dump(irlst, out):
+    """
+    Writes the IR to the file 'out', leaving out removed (None) lines
+    """
+    out.write('{} {}\n'.format(MAGIC, VERSION))
+    for line in encode_lines(irlst):
+        out.write(line)
+        out.write('\n')
+
+def decode_operand(pairs):
+    """
+    Builds the Operand for an object read from an IR file
+    """
+    (op_type, value), = pairs
+    return Operand(op_type, value)
+
+class IRDecoder(object):
+    """
+    Builds the IR back from the rows read from an IR file, in which the
+    JSON decoder has already turned operands into Operand objects
+    """
+
+    def __init__(self):
+        # Temporaries of the function being decoded, by name
+        self.temps = {}
+
+    def share_temps(self, value):
+        """
+        Replaces the temporaries in 'value' by the Operand already used for
+        them in the current function
+        """
+        if isinstance(value, Operand):
+            if value.op_type == 'expr':
+                return self.temps.setdefault(value.value, value)
+            elif value.op_type == 'array':
+                value.value = [self.share_temps(element) for element in value.value]
+        elif isinstance(value, list):
+            return [self.share_temps(element) for element in value]
+        return value
+
+    def decode(self, fields):
+        if fields[0] == 'C':
+            _, ctl, data = fields
+            if ctl == 'FUNC':
+                self.temps = {}
+            return IRControl(ctl, self.share_temps(data))
+        elif fields[0] == 'T':
+            _, op, typeinfo, arr_depth, dest, src1, src2 = fields
+            return TAC(op, typeinfo, self.share_temps(dest), self.share_temps(src1),
+                       self.share_temps(src2), arr_depth)
+        raise IRFormatError("Unknown kind of IR line \"" + str(fields[0]) + "\"")
+
+def load(f):
+    """
+    Reads an IR file and returns the list of its lines of IR
+    """
+    header = f.readline().split()
+    if len(header) != 2 or header[0] != MAGIC:
+        raise IRFormatError("Not an IR file")
+    if header[1] != str(VERSION):
+        raise IRFormatError("Unsupported IR format version " + header[1])
+
+    return decode_lines(f.read().splitlines(), 2)
+
+def decode_lines(lines, first_line=1):
+    """
+    Returns the IR held by lines of text written by encode_lines. Errors
+    are reported with the line number, counting from 'first_line'.
+    """
+    # Parsing all the lines in a single call is much faster than one by one
+    try:
+        rows = json.loads('[' + ','.join(lines) + ']', object_pairs_hook=decode_operand)
+    except ValueError:
+        rows = None
+
+    decoder = IRDecoder()
+    irlst = []
+    for number, line in enumerate(lines, first_line):
+        try:
+            fields = rows[number - first_line] if rows is not None else json.loads(line, object_pairs_hook=decode_operand)
+            irlst.append(decoder.decode(fields))
+        except (ValueError, TypeError) as e:
+            raise IRFormatError("Malformed IR on line " + str(number) + ": " + str(e))
+    return irlst
+
+def split_functions(irlst):
+    """
+    Returns a dict mapping the name of each function to the lines of IR
+    from its FUNC to its ENDFUNC, so that functions can be saved and
+    compiled separately
+    """
+    functions = {}
+    start = None
+    for i, ir in enumerate(irlst):
+        if isinstance(ir, IRControl) and ir.ctl == 'FUNC':
+            start = i
+        elif isinstance(ir, IRControl) and ir.ctl == 'ENDFUNC':
+            functions[ir.data] = [line for line in irlst[start:i + 1] if line is not None]
+    return functions
@@ -1,5 +1,8 @@
 #!/usr/bin/env python3
 
+from array import array
+import SimplePythonAST as ast
+
 def convert_to_string(obj):
     if isinstance(obj, list) or isinstance(obj, tuple):
         return '(' + ', '.join(map(convert_to_string, obj)) + ')'
@@ -43,6 +46,8 @@ class TAC(object):
 
 
 class Operand(object):
+    __slots__ = ('op_type', 'value')
+
     def __init__(self, op_type, value):
         self.op_type = op_type
         self.value = value
@@ -59,18 +64,187 @@ class Operand(object):
         return string
 
 
+# Kinds of the rows of a CompactIR
+ROW_REMOVED = 0
+ROW_TAC = 1
+ROW_CONTROL = 2
+
+# Operands whose objects are never modified, and can be shared by value
+VALUE_OPERANDS = frozenset(['id', 'int', 'str', 'bool'])
+
+
+class CompactIR(object):
+    """
+    Stores the IR as a struct of arrays instead of a list of objects: one
+    row per line, with its kind, opcode, type, array depth and the pool
+    indices of its operands (-1 for None) held in typed arrays. Control
+    lines keep their data in the dest column.
+
+    Names, variables and constants are pooled by value, so each distinct
+    one is stored once. Temporaries (and other operands) are pooled as the
+    object itself, as optimizers fold them in place and rely on every use
+    of a temporary seeing it; a temporary used twice takes two pool slots
+    referring to the same object.
+
+    It can be used in place of IRGen.IR_lst: indexing and iterating yield
+    TAC and IRControl objects built from the row, and assigning a TAC,
+    IRControl or None to an index or slice stores it back into the rows.
+    Modifying the object returned for a row doesn't change the row.
+    """
+
+    def __init__(self, irlst=()):
+        self.kind = array('b')
+        self.opcode = array('H')
+        self.typeinfo = array('H')
+        self.depth = array('H')
+        self.dest = array('i')
+        self.src1 = array('i')
+        self.src2 = array('i')
+
+        self.names = []
+        self.name_index = {}
+        self.pool = []
+        self.pool_by_value = {}
+
+        self.extend(irlst)
+
+    def intern_name(self, name):
+        index = self.name_index.get(name)
+        if index is None:
+            index = self.name_index[name] = len(self.names)
+            self.names.append(name)
+        return index
+
+    def intern(self, obj, previous=-1):
+        """
+        Returns a pool index holding 'obj', adding it to the pool if needed.
+        'previous' is the index the row held before, which is reused if it
+        still holds the same object.
+        """
+        if obj is None:
+            return -1
+        if previous >= 0 and self.pool[previous] is obj:
+            return previous
+
+        if isinstance(obj, Operand) and obj.op_type in VALUE_OPERANDS:
+            key = (obj.op_type, obj.value)
+        elif isinstance(obj, str):
+            key = ('name', obj)
+        else:
+            key = None
+        if key is not None:
+            index = self.pool_by_value.get(key)
+            if index is not None:
+                return index
+
+        index = len(self.pool)
+        self.pool.append(obj)
+        if key is not None:
+            self.pool_by_value[key] = index
+        return index
+
+    def encode(self, ir, previous=(-1, -1, -1)):
+        """
+        Returns the columns of the row for 'ir'
+        """
+        if ir is None:
+            return ROW_REMOVED, 0, 0, 0, -1, -1, -1
+        elif isinstance(ir, IRControl):
+            return ROW_CONTROL, self.intern_name(ir.ctl), 0, 0, self.intern(ir.data, previous[0]), -1, -1
+        return (ROW_TAC, self.intern_name(ir.op), self.intern_name(ir.typeinfo), ir.arr_depth,
+                self.intern(ir.dest, previous[0]), self.intern(ir.src1, previous[1]),
+                self.intern(ir.src2, previous[2]))
+
+    def decode(self, i):
+        kind = self.kind[i]
+        if kind == ROW_REMOVED:
+            return None
+        pool = self.pool
+        dest = self.dest[i]
+        if kind == ROW_CONTROL:
+            return IRControl(self.names[self.opcode[i]], pool[dest] if dest >= 0 else None)
+        src1 = self.src1[i]
+        src2 = self.src2[i]
+        return TAC(self.names[self.opcode[i]], self.names[self.typeinfo[i]],
+                   pool[dest] if dest >= 0 else None,
+                   pool[src1] if src1 >= 0 else None,
+                   pool[src2] if src2 >= 0 else None,
+                   self.depth[i])
+
+    def columns(self):
+        return (self.kind, self.opcode, self.typeinfo, self.depth, self.dest, self.src1, self.src2)
+
+    def append(self, ir):
+        for column, value in zip(self.columns(), self.encode(ir)):
+            column.append(value)
+
+    def extend(self, irlst):
+        for ir in irlst:
+            self.append(ir)
+
+    def __len__(self):
+        return len(self.kind)
+
+    def __iter__(self):
+        for i in range(len(self.kind)):
+            yield self.decode(i)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self.decode(j) for j in range(*i.indices(len(self.kind)))]
+        if i < 0:
+            i += len(self.kind)
+        if not 0 <= i < len(self.kind):
+            raise IndexError('CompactIR index out of range')
+        return self.decode(i)
+
+    def __setitem__(self, i, ir):
+        if isinstance(i, slice):
+            irlst = list(self)
+            irlst[i] = ir
+            self.reset(irlst)
+            return
+        if i < 0:
+            i += len(self.kind)
+        previous = (self.dest[i], self.src1[i], self.src2[i])
+        for column, value in zip(self.columns(), self.encode(ir, previous)):
+            column[i] = value
+
+    def reset(self, irlst):
+        """
+        Replaces the rows with 'irlst', dropping the pool entries that are
+        no longer used
+        """
+        irlst = list(irlst)
+        self.__init__(irlst)
+
+    def compact(self):
+        """
+        Drops the lines that were removed (set to None) by the optimizers
+        """
+        self.reset(ir for ir in self if ir is not None)
+
+    def nbytes(self):
+        """
+        Returns the size of the rows, leaving out the pooled objects
+        """
+        return sum(column.itemsize * len(column) for column in self.columns())
+
+
 class IRGen(object):
     """
     This Intermediate Representation converts Python code into
     a sequence of methods and main-method calls.
     """
 
-    def __init__(self):
+    def __init__(self, compact=False):
         """
-        method_lst: list of IR code
+        method_lst: list of IR code, or a CompactIR holding it if 'compact'
         """
-        self.IR_lst = []
+        self.IR_lst = CompactIR() if compact else []
         self.register_count = 0
+        # Names of the temporaries, shared by every function
+        self.register_names = []
 
     def generate(self, node):
         """
@@ -93,7 +267,9 @@ class IRGen(object):
         Increase the register count and return its value for use
         """
         self.register_count += 1
-        return Operand('expr', '_t%d' % self.register_count)
+        if self.register_count > len(self.register_names):
+            self.register_names.append('_t%d' % self.register_count)
+        return Operand('expr', self.register_names[self.register_count - 1])
 
     def reset_var(self):
         """
@@ -149,6 +325,17 @@ class IRGen(object):
 
         return reg
 
+    def gen_BuiltinCall(self, node):
+        args = [self.generate(arg) for arg in node.args_list]
+        # The length of a string is computed differently from that of an
+        # array, which is always known
+        name = 'strlen' if node.name == 'len' and node.args_list[0].type is ast.STR else node.name
+
+        reg = self.inc_var()
+        self.add_code(TAC('BUILTIN', node.type.name, reg, name, args))
+
+        return reg
+
     def gen_ExprStmt(self, node):
         expr = self.generate(node.expr)
         self.add_code(TAC('ASSIGN', 'void', None, expr))
@@ -182,6 +369,18 @@ class IRGen(object):
             self.generate(node.body)
             self.add_code(IRControl('ENDWHILE', cond))
 
+    def gen_ForRange(self, node):
+        # The bounds are computed once, before the loop, and the step is a
+        # constant, so the optimizer knows how the variable changes. A
+        # parallel loop also carries the (op, name) of its reductions.
+        start = self.generate(node.start)
+        end = self.generate(node.end)
+        var = Operand('id', node.var)
+        reductions = ast.loop_reductions(node) if node.parallel else None
+
+        self.add_code(IRControl('FOR', (var, start, end, ast.constant_int(node.step), reductions)))
+        self.generate(node.body)
+        self.add_code(IRControl('ENDFOR', var))
 
     def gen_MethodDecl(self, node):
         self.reset_var()
@@ -194,10 +393,12 @@ class IRGen(object):
         self.add_code(IRControl('ENDFUNC', node.name))
 
     def gen_Program(self, node):
-        for decl in node.func_decl:
-            self.generate(decl)
+        # The emitter includes the header of each imported module
+        for module in dict.fromkeys(imp.module for imp in node.imports):
+            self.add_code(IRControl('IMPORT', module))
 
-        self.generate(node.main_func)
+        for decl in node.methods():
+            self.generate(decl)
 
     def gen_RetStmt(self, node):
         expr = self.generate(node.expr)
@@ -218,4 +419,17 @@ class IRGen(object):
         array_index = self.generate(node.array_index)
         reg = self.inc_var()
         self.add_code(TAC('ARRAY_IDX', node.type.name, reg, array_name, array_index, node.type.arr_depth))
+        return reg
+
+    def gen_ArraySlice(self, node):
+        array = self.generate(node.array)
+        # The bounds that are left out are the start and the end of the array
+        lower = self.generate(node.lower) if node.lower is not None else Operand('int', 0)
+        if node.upper is not None:
+            upper = self.generate(node.upper)
+        else:
+            upper = self.inc_var()
+            self.add_code(TAC('BUILTIN', 'int', upper, 'len', [array]))
+        reg = self.inc_var()
+        self.add_code(TAC('SLICE', node.type.name, reg, array, [lower, upper], node.type.arr_depth))
         return reg
\ No newline at end of file
@@ -1,20 +1,503 @@
 #!/usr/bin/env python3
-import sys
 
+import hashlib
+import re
 import SimplePythonAST as ast
+from SimplePythonEscape import arena_scopes, local_allocations
 from SimplePythonIRGen import IRGen, IRControl, TAC
 
 
-def emit_headers():
-    system_headers = ['stdio.h', 'stdlib.h', 'string.h']
-    for header in system_headers:
-        print('#include <{}>'.format(header))
-    print()
+SYSTEM_HEADERS = ['stdio.h', 'stdlib.h', 'string.h']
+
+# OpenMP reduction operators of the operators a parallel loop can reduce
+# its shared variables with
+REDUCTION_OPS = {
+    '+': '+',
+    '*': '*',
+    'and': '&&',
+    'or': '||',
+}
+
+# C types of the SimplePython types
+C_TYPE_NAMES = {
+    'int': 'int',
+    'str': 'const char*',
+    'bool': 'int'
+}
+
+# Alignment of the arrays, in bytes, when the emitter gives vector hints:
+# a cache line, which is also the width of the widest vectors (AVX-512),
+# so that vectorized loops over them don't need to peel iterations to
+# reach an aligned address
+VECTOR_ALIGNMENT = 64
+
+# Fewest elements an array needs to be aligned: aligned allocations are
+# slower than malloc, and loops over shorter arrays gain little from
+# vectorizing
+ALIGNED_ARRAY_MIN_LENGTH = 64
+
+# Elements per line of the initializer of a longer array literal, so that
+# large literals don't end up on one line of several megabytes
+INITIALIZER_LINE_LENGTH = 16
+
+# Allocates the arrays built at runtime, with the alignment the compiler
+# is told about
+ALIGNED_ALLOC_HELPERS = '''\
+#if defined(__GNUC__)
+__attribute__((malloc, assume_aligned({0})))
+#endif
+static inline void* sp_alloc(size_t size) {{
+    return aligned_alloc({0}, (size + {1}) / {0} * {0});
+}}
+'''.format(VECTOR_ALIGNMENT, VECTOR_ALIGNMENT - 1)
+
+# Longest array (or string) that is built on the stack when it never leaves
+# the block it is built in, so that recursive functions don't run out of
+# stack
+STACK_ARRAY_MAX_LENGTH = 256
+
+# Size of the chunks of memory the arena of a function allocates its arrays
+# from, in bytes, unless an array needs a larger one
+ARENA_CHUNK_SIZE = 4096
+
+# A function's arena holds the arrays and strings built at runtime that
+# never leave the function. A loop saves its position before it starts,
+# and goes back to it at the start of every iteration, so that the chunks
+# are reused rather than allocated again, and everything is freed when the
+# function returns.
+ARENA_HELPERS = '''\
+typedef struct sp_chunk {{
+    struct sp_chunk* next;
+    char* end;
+}} sp_chunk;
+
+typedef struct {{
+    sp_chunk* first;
+    sp_chunk* chunk;
+    char* top;
+    char* end;
+}} sp_arena;
+
+typedef struct {{
+    sp_chunk* chunk;
+    char* top;
+    char* end;
+}} sp_arena_mark;
+
+static void* sp_arena_grow(sp_arena* arena, size_t size) {{
+    // The chunks after the current one were released by a reset
+    sp_chunk** link = arena->chunk != NULL ? &arena->chunk->next : &arena->first;
+    while (*link != NULL && (size_t) ((*link)->end - (char*) *link) < {0} + size) link = &(*link)->next;
+    if (*link == NULL) {{
+        size_t capacity = size > {2} ? size : {2};
+        sp_chunk* chunk = aligned_alloc({0}, {0} + capacity);
+        chunk->next = NULL;
+        chunk->end = (char*) chunk + {0} + capacity;
+        *link = chunk;
+    }}
+    arena->chunk = *link;
+    arena->top = (char*) *link + {0} + size;
+    arena->end = (*link)->end;
+    return (char*) *link + {0};
+}}
+
+#if defined(__GNUC__)
+__attribute__((assume_aligned({0})))
+#endif
+static inline void* sp_arena_alloc(sp_arena* arena, size_t size) {{
+    size = (size + {1}) / {0} * {0};
+    if ((size_t) (arena->end - arena->top) < size) return sp_arena_grow(arena, size);
+    void* p = arena->top;
+    arena->top += size;
+    return p;
+}}
+
+static inline sp_arena_mark sp_arena_save(const sp_arena* arena) {{
+    sp_arena_mark mark = {{arena->chunk, arena->top, arena->end}};
+    return mark;
+}}
+
+static inline void sp_arena_reset(sp_arena* arena, sp_arena_mark mark) {{
+    arena->chunk = mark.chunk;
+    arena->top = mark.top;
+    arena->end = mark.end;
+}}
+
+static void sp_arena_free(sp_arena* arena) {{
+    while (arena->first != NULL) {{
+        sp_chunk* next = arena->first->next;
+        free(arena->first);
+        arena->first = next;
+    }}
+}}
+'''.format(VECTOR_ALIGNMENT, VECTOR_ALIGNMENT - 1, ARENA_CHUNK_SIZE)
+
+# Reports an element-wise operation on arrays of different lengths
+LENGTH_CHECK_HELPERS = '''\
+static void sp_length_error(const char* op, int len1, int len2) {
+    fflush(stdout);
+    fprintf(stderr, "ValueError: %s was applied to arrays of sizes %d and %d\\n", op, len1, len2);
+    exit(1);
+}
+'''
+
+# A C int constant, such as a bound of a slice that is known at compile time
+INT_LITERAL = re.compile(r'^-?\d+$')
+
+# Clamp the bounds of a slice to the array the way Python does, counting
+# negative bounds from the end
+SLICE_HELPERS = '''\
+static inline int sp_slice_index(int idx, int len) {
+    if (idx < 0) idx += len;
+    return idx < 0 ? 0 : (idx > len ? len : idx);
+}
+
+static inline int sp_slice_length(int lower, int upper) {
+    return upper > lower ? upper - lower : 0;
+}
+'''
+
+# Reports a nested array built from rows of different lengths
+ROW_LENGTH_CHECK_HELPERS = '''\
+static void sp_row_length_error(int len1, int len2) {
+    fflush(stdout);
+    fprintf(stderr, "ValueError: the rows of a nested array have lengths %d and %d\\n", len1, len2);
+    exit(1);
+}
+'''
+
+# Reports min or max of an empty array
+EMPTY_ARRAY_HELPERS = '''\
+static void sp_empty_error(const char* name) {
+    fflush(stdout);
+    fprintf(stderr, "ValueError: %s was given an empty array\\n", name);
+    exit(1);
+}
+'''
+
+# Kernels of the builtins reducing an array of ints, written so that the C
+# compiler vectorizes their loops, and the helpers each of them needs
+ARRAY_REDUCTION_HELPERS = {
+    'sum': ([], '''\
+static inline int sp_sum(const int* restrict a, int n) {
+    int s = 0;
+    for (int i = 0; i < n; i++) s += a[i];
+    return s;
+}
+'''),
+    'min': ([EMPTY_ARRAY_HELPERS], '''\
+static inline int sp_min(const int* restrict a, int n) {
+    if (n == 0) sp_empty_error("min");
+    int m = a[0];
+    for (int i = 1; i < n; i++) m = a[i] < m ? a[i] : m;
+    return m;
+}
+'''),
+    'max': ([EMPTY_ARRAY_HELPERS], '''\
+static inline int sp_max(const int* restrict a, int n) {
+    if (n == 0) sp_empty_error("max");
+    int m = a[0];
+    for (int i = 1; i < n; i++) m = a[i] > m ? a[i] : m;
+    return m;
+}
+'''),
+}
+
+# min and max of two ints, which evaluate each of them once
+SCALAR_MIN_MAX_HELPERS = {
+    'min': 'static inline int sp_min2(int a, int b) { return a < b ? a : b; }\n',
+    'max': 'static inline int sp_max2(int a, int b) { return a > b ? a : b; }\n',
+}
+
+BOUNDS_CHECK_HELPERS = '''\
+static void sp_bounds_error(const char* name, int idx, int len) {
+    fflush(stdout);
+    fprintf(stderr, "IndexError: the array \\"%s\\" was accessed with an index of %d, but it has a size of %d\\n", name, idx, len);
+    exit(1);
+}
+
+static inline int sp_check_index(const char* name, int idx, int len) {
+    if (idx < 0 || idx >= len) sp_bounds_error(name, idx, len);
+    return idx;
+}
+'''
+
+
+class CCode(object):
+    """
+    An in-memory buffer of indented lines of C code
+    """
+
+    def __init__(self):
+        self.lines = []
+        self.indentation = 0
+
+    def line(self, text):
+        self.lines.append('    ' * self.indentation + text)
+
+    def blank(self):
+        self.lines.append('')
+
+    def open_block(self, header=None):
+        self.line(header + ' {' if header else '{')
+        self.indentation += 1
+
+    def close_block(self):
+        self.indentation -= 1
+        self.line('}')
+
+    def getvalue(self):
+        return '\n'.join(self.lines) + '\n'
+
+
+class CTranslationUnit(object):
+    """
+    The sections of a C file: the included headers, the runtime helpers
+    used by the generated code, and the code of the functions
+    """
+
+    def __init__(self):
+        self.headers = list(SYSTEM_HEADERS)
+        # Headers of the imported modules
+        self.includes = []
+        self.helpers = []
+        # Declarations of the static read-only data of the array and string
+        # literals, as the keys of a dict, which keeps them in order and
+        # finds duplicates without comparing them to every other one
+        self.constants = {}
+        self.prototypes = []
+        self.body = CCode()
+
+    def add_helper(self, helper):
+        if helper not in self.helpers:
+            self.helpers.append(helper)
+
+    def add_constant(self, constant):
+        self.constants[constant] = None
+
+    def render(self):
+        parts = ['#include <' + header + '>\n' for header in self.headers]
+        parts.extend('#include "' + header + '"\n' for header in self.includes)
+        parts.append('\n')
+        for helper in self.helpers:
+            parts.append(helper)
+            parts.append('\n')
+        if self.constants:
+            parts.append(''.join(constant + '\n' for constant in self.constants))
+            parts.append('\n')
+        if self.prototypes:
+            # Functions may be called before they are defined
+            parts.append(''.join(prototype + ';\n' for prototype in self.prototypes))
+            parts.append('\n')
+        parts.append(self.body.getvalue())
+        return ''.join(parts)
+
+
+def const_type(ctype):
+    """
+    Returns the read-only version of the C type of the elements of an array
+    """
+    return ctype + ' const' if ctype.endswith('*') else 'const ' + ctype
+
+
+def content_name(prefix, content):
+    """
+    Returns a name for static data that only depends on its contents, so
+    that identical literals share it, even when compiled separately
+    """
+    return prefix + hashlib.sha1(content.encode('utf-8')).hexdigest()[:16]
+
+
+def array_initializer(elements):
+    """
+    Returns the initializer of a static array holding 'elements', with
+    INITIALIZER_LINE_LENGTH elements per line if they don't fit on one
+    """
+    if len(elements) <= INITIALIZER_LINE_LENGTH:
+        return '{' + ', '.join(elements) + '}'
+    lines = [', '.join(elements[i:i + INITIALIZER_LINE_LENGTH])
+             for i in range(0, len(elements), INITIALIZER_LINE_LENGTH)]
+    return '{\n    ' + ',\n    '.join(lines) + '\n}'
+
+
+def reassigned_names(irlst):
+    """
+    Returns a dict mapping the name of each function to the names of the
+    variables it assigns after declaring them
+    """
+    names = {}
+    current = None
+    for ir in irlst:
+        if isinstance(ir, IRControl):
+            if ir.ctl == 'FUNC':
+                current = names.setdefault(ir.data[0], set())
+        elif ir is not None and ir.op == 'ASSIGN' and ir.dest is not None:
+            current.add(ir.dest.value)
+    return names
+
+
+def c_signature(name, ret_type, params):
+    """
+    Returns the C declarator of a function, given its name, its return
+    type and its (name, type) parameters
+    """
+    param_str = ', '.join(['{} {}'.format(C_TYPE_NAMES[param[1]], param[0]) for param in params])
+    return '{} {}({})'.format(C_TYPE_NAMES[ret_type], name, param_str)
+
+
+def module_header(module, signatures):
+    """
+    Returns the C header declaring the functions a module exports, given
+    the (name, return type, params) signature of each of them
+    """
+    guard = 'SP_' + module.upper() + '_H'
+    lines = ['#ifndef ' + guard, '#define ' + guard, '']
+    lines.extend(c_signature(*signature) + ';' for signature in signatures)
+    lines.extend(['', '#endif'])
+    return '\n'.join(lines) + '\n'
+
+
+class ArrayConcat(object):
+    """
+    The result of concatenating two arrays. It is only turned into code
+    once we know the name of the variable that holds it, so that the
+    allocation goes directly into that variable.
+    """
+
+    def __init__(self, ctype, left, left_len, right, right_len, length):
+        self.ctype = ctype
+        self.left = left
+        self.left_len = left_len
+        self.right = right
+        self.right_len = right_len
+        self.length = length
+
+    def reads(self):
+        return (self.left, self.right)
+
+    def size(self):
+        return '({} + {}) * sizeof({})'.format(self.left_len, self.right_len, self.ctype)
+
+    def emit(self, code, dest, declare, restrict, alloc):
+        """
+        Emits the allocation 'alloc' and the copies of the two halves into
+        'dest'
+        """
+        decl = ('{}* restrict ' if restrict else '{}* ').format(self.ctype) if declare else ''
+        size = 'sizeof({})'.format(self.ctype)
+        code.line('{}{} = {};'.format(decl, dest, alloc))
+        code.line('memcpy({}, {}, {} * {});'.format(dest, self.left, self.left_len, size))
+        code.line('memcpy({} + {}, {}, {} * {});'.format(dest, self.left_len, self.right, self.right_len, size))
+
+
+class ArrayMap(object):
+    """
+    The result of an element-wise operation on two arrays, or on an array
+    and a scalar. Like an ArrayConcat, it is only turned into code once we
+    know the name of the variable that holds it.
+    """
+
+    def __init__(self, ctype, op, left, right, length):
+        # The operands are (C expression, whether it's an array) pairs
+        self.ctype = ctype
+        self.op = op
+        self.left = left
+        self.right = right
+        self.length = length
+
+    def reads(self):
+        return tuple(expr for expr, is_array in (self.left, self.right) if is_array)
+
+    def size(self):
+        return '{} * sizeof({})'.format(self.length, self.ctype)
+
+    def emit(self, code, dest, declare, restrict, alloc):
+        """
+        Emits the allocation 'alloc' of 'dest' and a loop computing its
+        elements
+        """
+        decl = ('{}* restrict ' if restrict else '{}* ').format(self.ctype) if declare else ''
+        left, right = [expr + '[_i]' if is_array else expr for expr, is_array in (self.left, self.right)]
+        code.line('{}{} = {};'.format(decl, dest, alloc))
+        code.line('for (int _i = 0; _i < {}; _i++) {}[_i] = {} {} {};'.format(self.length, dest, left, self.op, right))
+
+
+class ArrayRows(object):
+    """
+    A nested array built from rows that aren't all literals. The rows are
+    copied one after the other into a single allocation, which is only
+    turned into code once we know the name of the variable that holds it.
+    """
+
+    def __init__(self, ctype, rows, row_size, length):
+        self.ctype = ctype
+        self.rows = rows
+        self.row_size = row_size
+        self.length = length
+
+    def reads(self):
+        return tuple(self.rows)
+
+    def size(self):
+        return '{} * sizeof({})'.format(self.length, self.ctype)
+
+    def emit(self, code, dest, declare, restrict, alloc):
+        """
+        Emits the allocation 'alloc' of 'dest' and the copies of its rows
+        """
+        decl = ('{}* restrict ' if restrict else '{}* ').format(self.ctype) if declare else ''
+        size = 'sizeof({})'.format(self.ctype)
+        code.line('{}{} = {};'.format(decl, dest, alloc))
+        for i, row in enumerate(self.rows):
+            start = dest if i == 0 else '{} + {}'.format(dest, multiply_lengths(str(i), self.row_size))
+            code.line('memcpy({}, {}, {} * {});'.format(start, row, self.row_size, size))
+
+
+# Arrays built by the emitter into the variable that holds them
+NEW_ARRAYS = (ArrayConcat, ArrayMap, ArrayRows)
+
+
+class OpenLoop(object):
+    """
+    A loop of the function being emitted, which is open. If it builds
+    arrays in the arena of the function, the position of the arena saved
+    in 'mark' before the loop is restored at the start of each of its
+    iterations and after it.
+    """
+
+    def __init__(self, parallel=False, mark=None):
+        self.parallel = parallel
+        self.mark = mark
+
+
+def multiply_lengths(*lengths):
+    """
+    Returns a C expression for the product of array lengths
+    """
+    lengths = [length for length in lengths if length != '1']
+    if all(length.isdigit() for length in lengths):
+        product = 1
+        for length in lengths:
+            product *= int(length)
+        return str(product)
+    return ' * '.join(length if length.isidentifier() or length.isdigit() else '(' + length + ')'
+                      for length in lengths)
 
 
 class SPtoC(object):
-    def __init__(self, IRGen):
+    def __init__(self, IRGen, bounds_check=False, vector_hints=True, local_allocation=True):
         self.IRGen = IRGen
+        self.bounds_check = bounds_check
+        # Align the arrays and mark their pointers restrict. Arrays can't
+        # be modified once built, so pointers to the same one never write
+        # through each other, and the C compiler can vectorize the loops
+        # reading them without checking for overlaps. Only the pointers to
+        # a new array that are never assigned are restrict, as an array is
+        # written (when it is built) through the first pointer to it.
+        self.vector_hints = vector_hints
+        # Build the arrays and strings that don't escape their block on
+        # the stack or in the function's arena rather than with malloc
+        self.local_allocation = local_allocation
 
         self.binOps = {
             '+': '+',
@@ -36,128 +519,489 @@ class SPtoC(object):
             'not': '!'
         }
 
-        self.typeNames = {
-            'int': 'int',
-            'str': 'char*',
-            'bool': 'int'
+        self.typeNames = C_TYPE_NAMES
+
+        self.controls = {
+            'FUNC': lambda data: self.emit_func(data[0], data[1], data[2]),
+            'IMPORT': lambda data: self.unit.includes.append(data + '.h'),
+            'IF': lambda data: self.emit_conditional('if', data),
+            'WHILE': self.emit_while,
+            'ENDWHILE': lambda data: self.emit_end_loop(),
+            'FOR': lambda data: self.emit_for(*data),
+            'ENDFOR': lambda data: self.emit_end_for(),
+            'ENDFUNC': lambda data: self.emit_end_func(),
+            'ELSE': lambda data: self.emit_conditional('else', None),
+            'BLOCK': lambda data: self.open_block(),
+            'PRINT': self.emit_print,
+            'RET': self.emit_ret,
+            'CHECKBOUNDS': lambda data: self.emit_check_bounds(*data),
+            'BEGINLOOPCOND': lambda data: None,
+            'CONTINUE': lambda data: self.emit_line('continue;'),
+            'BREAK': lambda data: self.emit_line('break;'),
         }
 
-        self.indentation = 0
-        self.reg_to_expr = {}  # NOTE: The expr must be a fully valid C expr
+        self.unit = None
+        self.code = None
+        self.reg_to_expr = {}  # NOTE: The expr must be a fully valid C expr, or one of the NEW_ARRAYS
+        # Whether each of the open for loops is wrapped in a block of its own
+        self.loop_blocks = []
         self.str_lens = {}
+        # The lengths of strings known when each of the open blocks started
+        self.block_str_lens = []
+        self.arr_lens = {}
+        # The lengths of the inner dimensions of nested arrays. A nested
+        # array is stored flat, row after row, so that it is contiguous.
+        self.inner_shapes = {}
+        # The rows of nested arrays, as (array name, base pointer, offset)
+        self.views = {}
+        # The arrays pointing to static read-only data, and the variables
+        # that are assigned after they are declared, which can't
+        self.const_arrays = set()
+        self.reassigned = {}
+        self.assigned = set()
+        # The indices of the lines of IR building arrays and strings that
+        # don't outlive their block, and the index of the line being emitted
+        self.local_sites = set()
+        self.index = None
+        # The new arrays of the temporaries built by those lines
+        self.local_temps = set()
+        # The indices of the functions and loops of the IR building arrays
+        # in an arena, and the last line of IR emitted
+        self.arena_scopes = set()
+        self.last_ir = None
+        # The return type of the function being emitted, its open loops,
+        # whether it has an arena, and how many positions of the arena its
+        # loops saved
+        self.ret_type = None
+        self.loops = []
+        self.arena = False
+        self.arena_marks = 0
 
     def convert_operand(self, operand):
         """
         Returns the operand as a string suitable for C code gen
         """
-        if operand.op_type == 'array':
-            ops = ', '.join(map(self.convert_operand, operand.value))
-            return '{' + ops + '}'
-        elif operand.op_type == 'expr':  # Temporary
-            return self.reg_to_expr[operand]
+        op_type = operand.op_type
+        if op_type == 'expr':  # Temporary
+            expr = self.reg_to_expr[operand]
+            if isinstance(expr, NEW_ARRAYS):
+                expr = self.materialize(operand, expr)
+            return expr
+        elif op_type == 'id':
+            return operand.value
+        elif op_type == 'array':
+            return '{' + ', '.join([self.convert_operand(op) for op in operand.value]) + '}'
 
         # Constant
         # This may not always be C-compatible, we need to convert to a C constant!
-        elif operand.op_type == 'str':
-            return '"{}"'.format(operand.value.replace('"', '\\"'))
-        elif operand.op_type == 'bool':
+        elif op_type == 'str':
+            return self.pooled_string(operand.value)
+        elif op_type == 'bool':
             return '1' if operand.value else '0'
         else:
             return str(operand.value)
 
+    def materialize(self, operand, array):
+        """
+        Stores a new array that is used as an operand into its own
+        temporary variable
+        """
+        self.emit_new_array(array, operand.value, True, operand in self.local_temps)
+        self.reg_to_expr[operand] = operand.value
+        return operand.value
+
+    def emit_new_array(self, array, dest, declare, local=False, buffer=None):
+        """
+        Emits a new array into 'dest'. With vector hints, the new array's
+        pointer is declared restrict, unless it is assigned later, and a
+        long array is aligned.
+
+        A 'local' array, which doesn't outlive the block it is built in, is
+        stored in a buffer on the stack called 'buffer' (by default, after
+        'dest') if it is short and its length is known, and otherwise in the
+        arena of the function.
+        """
+        length = array.length
+        if local and length.isdigit() and 0 < int(length) <= STACK_ARRAY_MAX_LENGTH:
+            alloc = buffer or dest + '_buf'
+            self.emit_line(self.array_decl(array.ctype, alloc, int(length), length) + ';')
+        else:
+            aligned = self.vector_hints and (not length.isdigit() or int(length) >= ALIGNED_ARRAY_MIN_LENGTH)
+            alloc = self.allocation(array.size(), local, aligned)
+        array.emit(self.code, dest, declare, self.vector_hints and dest not in self.assigned, alloc)
+
+    def allocation(self, size, local, aligned=False):
+        """
+        Returns a C expression allocating 'size' bytes, from the arena of
+        the function if the memory doesn't outlive its block, and from the
+        heap otherwise. The arena isn't shared between the threads of a
+        parallel loop, and is only used in the function and loops that set
+        it up (see arena_scopes).
+        """
+        if local and self.arena and (not self.loops or self.loops[-1].mark is not None):
+            return 'sp_arena_alloc(&_arena, {})'.format(size)
+        if aligned:
+            self.unit.add_helper(ALIGNED_ALLOC_HELPERS)
+            return 'sp_alloc({})'.format(size)
+        return 'malloc({})'.format(size)
+
+    def array_decl(self, ctype, name, length, size=''):
+        """
+        Returns the declarator of an array literal (or of a buffer of 'size'
+        elements) called 'name'
+        """
+        if self.vector_hints and length >= ALIGNED_ARRAY_MIN_LENGTH:
+            return '_Alignas({}) {} {}[{}]'.format(VECTOR_ALIGNMENT, ctype, name, size)
+        return '{} {}[{}]'.format(ctype, name, size)
+
     def emit_line(self, line):
-        print('    ' * self.indentation, end='')
-        print(line)
+        self.code.line(line)
+
+    def open_block(self, header=None):
+        self.code.open_block(header)
+        self.block_str_lens.append(dict(self.str_lens))
+
+    def close_block(self):
+        """
+        Closes a block, forgetting the lengths of strings computed in it,
+        whose variables go away with it
+        """
+        self.code.close_block()
+        self.str_lens = self.block_str_lens.pop()
 
     def emitCcode(self, file):
-        old_stdout = sys.stdout
-        sys.stdout = file
+        """
+        Writes the C code for the whole IR to 'file' in a single write
+        """
+        file.write(self.generate())
 
-        emit_headers()
-        for element in self.IRGen.IR_lst:
+    def generate(self):
+        """
+        Returns the C code for the whole IR as a string
+        """
+        self.unit = CTranslationUnit()
+        self.code = self.unit.body
+        if self.bounds_check:
+            self.unit.add_helper(BOUNDS_CHECK_HELPERS)
+
+        self.emit_ir(self.IRGen.IR_lst)
+        return self.unit.render()
+
+    def emit_ir(self, irlst):
+        """
+        Appends the C code for the lines of IR to the current unit
+        """
+        self.reassigned = reassigned_names(irlst)
+        self.local_sites = local_allocations(irlst) if self.local_allocation else set()
+        self.arena_scopes = arena_scopes(irlst, self.local_sites, STACK_ARRAY_MAX_LENGTH)
+        for index, element in enumerate(irlst):
             if element is None:
                 continue
+            self.index = index
 
             if type(element) == IRControl:
-                if element.ctl.startswith('END'):
+                ctl = element.ctl
+                if ctl in self.controls:
+                    self.controls[ctl](element.data)
+                elif ctl.startswith('END'):
                     self.emit_scope_end()
-                    if element.ctl == 'ENDFUNC':
-                        print()
-                elif element.ctl == 'FUNC':
-                    self.emit_func(element.data[0], element.data[1], element.data[2])
-                elif element.ctl == 'IF':
-                    self.emit_conditional('if', element.data)
-                elif element.ctl == 'WHILE':
-                    self.emit_conditional('while', element.data)
-                elif element.ctl == 'ELSE':
-                    self.emit_conditional('else', None)
-                elif element.ctl == 'PRINT':
-                    self.emit_print(element.data)
-                elif element.ctl == 'RET':
-                    self.emit_ret(element.data)
-                elif element.ctl == 'BEGINLOOPCOND':
-                    pass
                 else:
-                    self.emit_line(element)
+                    self.emit_line(str(element))
             else:
-                if element.op == 'DECL':
+                op = element.op
+                if op == 'DECL':
                     self.emit_decl(element.typeinfo, element.dest, element.src1, element.arr_depth)
-                elif element.op == 'ASSIGN':
-                    self.emit_assign(element.dest, element.src1, element.arr_depth)
-                elif element.src2 is not None and element.op in self.binOps:
-                    self.emit_binop(element.op, element.typeinfo, element.dest,
+                elif op == 'ASSIGN':
+                    self.emit_assign(element.dest, element.src1, element.arr_depth, element.typeinfo)
+                elif element.src2 is not None and op in self.binOps:
+                    self.emit_binop(op, element.typeinfo, element.dest,
                                     element.src1, element.src2, element.arr_depth)
-                elif element.src2 is None and element.op in self.unaryOps:
-                    self.emit_unaryOp(element.op, element.dest, element.src1, element.arr_depth)
-                elif element.op == 'CALL':
+                elif element.src2 is None and op in self.unaryOps:
+                    self.emit_unaryOp(op, element.dest, element.src1, element.arr_depth)
+                elif op == 'CALL':
                     self.emit_call(element.dest, element.src1, element.src2)
-                elif element.op == 'ARRAY_IDX':
-                    self.emit_array_idx(element.dest, element.src1, element.src2)
+                elif op == 'SLICE':
+                    self.emit_slice(element.dest, element.typeinfo, element.src1, element.src2, element.arr_depth)
+                elif op == 'BUILTIN':
+                    self.emit_builtin(element.dest, element.src1, element.src2)
+                elif op == 'ARRAY_IDX':
+                    self.emit_array_idx(element.dest, element.typeinfo, element.src1, element.src2, element.arr_depth)
+                elif op == 'CHECKED_ARRAY_IDX':
+                    self.emit_array_idx(element.dest, element.typeinfo, element.src1, element.src2, element.arr_depth,
+                                        checked=True)
                 else:
-                    self.emit_line(element)
-
-        sys.stdout = old_stdout
+                    self.emit_line(str(element))
+            self.last_ir = element
 
-    def emit_array_idx(self, dest, src1, src2):
-        s1 = self.convert_operand(src1)
+    def emit_array_idx(self, dest, type, src1, src2, arr_depth=0, checked=False):
+        """
+        Indexes an array. Indexing a nested array with fewer indices than
+        it has dimensions gives a row of it, which points into the flat
+        storage of the whole array rather than being copied.
+        """
+        if src1 in self.views:
+            name, s1, offset = self.views[src1]
+        elif src1.op_type == 'array':
+            # A row of a constant nested array, folded by the optimizer
+            name = '<constant>'
+            s1 = self.literal_array(self.typeNames[type], src1, arr_depth + 1, dest.value + '_1',
+                                    self.index in self.local_sites)
+            offset = None
+        else:
+            name, s1, offset = src1.value, self.convert_operand(src1), None
         s2 = self.convert_operand(src2)
-        self.reg_to_expr[dest] = '{}[{}]'.format(s1, s2)
+        if checked:
+            s2 = 'sp_check_index("{}", {}, {})'.format(name, s2, self.get_arr_len(src1))
+        shape = self.get_inner_shape(src1, arr_depth + 1)
+        row_size = multiply_lengths(*shape)
+        if row_size != '1':
+            s2 = '{} * {}'.format(s2, row_size if row_size.isidentifier() or row_size.isdigit() else '(' + row_size + ')')
+        if offset is not None and offset != '0':
+            s2 = offset if s2 == '0' else '{} + {}'.format(offset, s2)
 
-    def emit_call(self, dest, name, args_list):
-        call_args = ''
-        for call_idx, call_arg in enumerate(args_list):
-            call_args += self.convert_operand(call_arg)
+        if arr_depth == 0:
+            self.reg_to_expr[dest] = s1 + '[' + s2 + ']'
+        else:
+            self.views[dest] = (name, s1, s2)
+            self.reg_to_expr[dest] = '(' + s1 + ' + ' + s2 + ')'
+            self.arr_lens[dest.value] = shape[0]
+            self.inner_shapes[dest.value] = shape[1:]
+            if self.is_const(src1):
+                self.const_arrays.add(dest.value)
+
+    def emit_slice(self, dest, type, array, bounds, arr_depth):
+        """
+        Takes the elements of an array between two bounds as a view: a
+        pointer into the array along with a length, rather than a copy.
+        Arrays can't be modified, and are never freed, so a view never has
+        to be copied.
+        """
+        if array in self.views:
+            name, base, offset = self.views[array]
+        elif array.op_type == 'array':
+            name, offset = '<constant>', None
+            base = self.literal_array(self.typeNames[type], array, arr_depth, dest.value + '_1',
+                                      self.index in self.local_sites)
+        else:
+            name, base, offset = array.value, self.convert_operand(array), None
+        length = self.get_arr_len(array)
+        shape = self.get_inner_shape(array, arr_depth)
+
+        lower, upper = [self.convert_operand(bound) for bound in bounds]
+        if length.isdigit() and INT_LITERAL.match(lower) and INT_LITERAL.match(upper):
+            start, stop, _ = slice(int(lower), int(upper)).indices(int(length))
+            start, length = str(start), str(max(stop - start, 0))
+        else:
+            self.unit.add_helper(SLICE_HELPERS)
+            start = dest.value + '_lo'
+            self.emit_line('int {} = sp_slice_index({}, {});'.format(start, lower, length))
+            self.emit_line('int {}_len = sp_slice_length({}, sp_slice_index({}, {}));'.format(
+                dest.value, start, upper, length))
+            length = dest.value + '_len'
+
+        start = multiply_lengths(start, *shape)
+        if offset is not None and start != '0':
+            offset = '{} + {}'.format(offset, start)
+        elif offset is None:
+            offset = start
+        self.views[dest] = (name, base, offset)
+        self.reg_to_expr[dest] = base if offset == '0' else '(' + base + ' + ' + offset + ')'
+        self.arr_lens[dest.value] = length
+        self.inner_shapes[dest.value] = shape
+        if self.is_const(array):
+            self.const_arrays.add(dest.value)
+
+    def emit_check_bounds(self, array, lo, bound, op):
+        """
+        Emits the check for all the accesses to 'array' made by a loop
+        counting up from 'lo' while it is 'op' 'bound'
+        """
+        b = self.convert_operand(bound)
+        length = self.get_arr_len(array)
+        last = '{} - 1'.format(b) if op == '<' else b
+        self.emit_line('if ({} {} {} && {} >= {}) sp_bounds_error("{}", {}, {});'.format(
+            lo, op, b, last, length, array.value, last, length))
 
-            if call_idx != len(args_list) - 1:
-                call_args += ', '
-        self.reg_to_expr[dest] = '{}({})'.format(name, call_args)
+    def emit_call(self, dest, name, args_list):
+        call_args = ', '.join([self.convert_operand(arg) for arg in args_list])
+        self.reg_to_expr[dest] = name + '(' + call_args + ')'
 
     def emit_unaryOp(self, operator, dest, src1, arr_depth):
         s1 = self.convert_operand(src1)
-        op = self.unaryOps[operator]
-        self.reg_to_expr[dest] = '{}{}'.format(op, s1)
+        self.reg_to_expr[dest] = self.unaryOps[operator] + s1
 
     def get_str_len(self, string):
+        """
+        Returns a C expression for the length of a string operand. The
+        length of a variable or temporary is computed once, into a variable
+        which is updated when the string variable is assigned.
+        """
+        if string.op_type != 'expr' and string.op_type != 'id':
+            return str(len(string.value))
+
         if string.value in self.str_lens:
             return self.str_lens[string.value]
 
-        if string.op_type == 'expr' or string.op_type == 'id':
-            length_name = '{}_len'.format(string.value)
-            value = self.convert_operand(string)
-            self.emit_line('int {} = strlen({});'.format(length_name, value))
-            self.str_lens[string.value] = length_name
-            return length_name
-        else:
-            length = str(len(string.value))
-            self.str_lens[string.value] = length
-            return length
+        length_name = '{}_len'.format(string.value)
+        value = self.convert_operand(string)
+        self.emit_line('int {} = strlen({});'.format(length_name, value))
+        self.str_lens[string.value] = length_name
+        return length_name
+
+    def get_arr_len(self, array):
+        """
+        Returns a C expression for the length of an array operand
+        """
+        if array.op_type == 'array':
+            return str(len(array.value))
+        return self.arr_lens[array.value]
+
+    def get_inner_shape(self, array, depth):
+        """
+        Returns C expressions for the lengths of the inner dimensions of an
+        array operand with 'depth' dimensions
+        """
+        if depth <= 1:
+            return ()
+        if array.op_type == 'array':
+            if not array.value:
+                return ('0',) * (depth - 1)
+            row = array.value[0]
+            return (self.get_arr_len(row),) + self.get_inner_shape(row, depth - 1)
+        return self.inner_shapes.get(array.value, ())
+
+    def flatten(self, array, depth):
+        """
+        Returns the C expressions of the elements of an array literal, row
+        after row, or None if it has rows that aren't literals
+        """
+        if depth <= 1:
+            return [self.convert_operand(element) for element in array.value]
+        elements = []
+        for row in array.value:
+            if row.op_type != 'array':
+                return None
+            row_elements = self.flatten(row, depth - 1)
+            if row_elements is None:
+                return None
+            elements.extend(row_elements)
+        return elements
+
+    def pooled_array(self, ctype, elements):
+        """
+        Returns the name of the static read-only array holding 'elements',
+        which is only initialized once, and is shared by all the identical
+        literals of the program
+        """
+        initializer = array_initializer(elements)
+        name = content_name('sp_array_', ctype + initializer)
+        decl = self.array_decl(const_type(ctype), name, len(elements))
+        self.unit.add_constant('static {} = {};'.format(decl, initializer))
+        return name
+
+    def pooled_string(self, value):
+        """
+        Returns the name of the static read-only string holding 'value',
+        shared by all the identical literals of the program
+        """
+        literal = '"' + value.replace('"', '\\"') + '"'
+        name = content_name('sp_str_', literal)
+        self.unit.add_constant('static const char {}[] = {};'.format(name, literal))
+        return name
+
+    def literal_array(self, ctype, array, depth, name, local=True):
+        """
+        Returns the name of the static data holding an array literal. An
+        array with rows that aren't literals is built into a variable
+        called 'name' instead, and one with elements computed at runtime
+        into a local array. Unless they are 'local', and don't outlive
+        their block (as when the array is an operand, which is copied),
+        these are copied to the heap.
+        """
+        elements = self.flatten(array, depth)
+        if elements is None:
+            self.emit_new_array(self.array_rows(ctype, name, array, depth), name, True, local)
+            return name
+        if not self.constant_elements(array):
+            # Static data can only be initialized with constants
+            buffer = name + '_buf'
+            self.emit_line('{} = {{{}}};'.format(self.array_decl(ctype, buffer, len(elements)), ', '.join(elements)))
+            if local:
+                return buffer
+            length = str(len(elements))
+            self.emit_new_array(ArrayRows(ctype, [buffer], length, length), name, True)
+            return name
+        return self.pooled_array(ctype, elements)
+
+    def constant_elements(self, array):
+        """
+        Returns whether all the elements of an array literal, and of its
+        rows, are constants, such as -1, which is a temporary
+        """
+        for element in array.value:
+            if element.op_type == 'array':
+                if not self.constant_elements(element):
+                    return False
+            elif element.op_type == 'id':
+                return False
+            elif element.op_type == 'expr' and not INT_LITERAL.match(str(self.reg_to_expr[element])):
+                return False
+        return True
+
+    def is_const(self, array):
+        """
+        Returns whether an array operand may point to static read-only data
+        """
+        return array.op_type == 'array' or array.value in self.const_arrays
+
+    def array_rows(self, ctype, name, array, depth):
+        """
+        Returns an ArrayRows for a nested array literal with rows that
+        aren't all literals, checking that they have the same shape
+        """
+        shape = self.get_inner_shape(array, depth)
+        rows = []
+        for i, row in enumerate(array.value):
+            row_shape = (self.get_arr_len(row),) + self.get_inner_shape(row, depth - 1)
+            for length, row_length in zip(shape, row_shape):
+                if not (length.isdigit() and length == row_length):
+                    self.unit.add_helper(ROW_LENGTH_CHECK_HELPERS)
+                    self.emit_line('if ({0} != {1}) sp_row_length_error({0}, {1});'.format(length, row_length))
+            rows.append(self.array_operand(row, ctype, '{}_{}'.format(name, i + 1), depth - 1))
+        return ArrayRows(ctype, rows, multiply_lengths(*shape), multiply_lengths(str(len(rows)), *shape))
+
+    def emit_pointer_decl(self, ctype, name, expr, is_const, literal=False):
+        """
+        Declares the variable 'name' pointing to an array. A pointer to
+        static read-only data is declared const, unless the variable is
+        assigned later. A pointer to a 'literal' array, rather than to one
+        another variable points to, is declared restrict unless the
+        variable is assigned later.
+        """
+        restrict = ' restrict' if self.vector_hints and literal and name not in self.assigned else ''
+        if is_const and name not in self.assigned:
+            self.const_arrays.add(name)
+            ctype = const_type(ctype)
+        elif is_const:
+            expr = '({}*) {}'.format(ctype, expr)
+        self.emit_line('{}*{} {} = {};'.format(ctype, restrict, name, expr))
+
+    def array_operand(self, operand, ctype, name, depth=1):
+        """
+        Returns the name of a variable or static array holding the array
+        'operand'. A literal whose rows aren't all literals is built into a
+        variable called 'name'.
+        """
+        if operand.op_type == 'array':
+            return self.literal_array(ctype, operand, depth, name)
+        return self.convert_operand(operand)
 
     def emit_binop(self, operator, type, dest, src1, src2, arr_depth):
-        s1 = self.convert_operand(src1)
-        s2 = self.convert_operand(src2)
         op = self.binOps[operator]
 
-        if type == 'str':
+        if type == 'str' and arr_depth == 0:
+            s1 = self.convert_operand(src1)
+            s2 = self.convert_operand(src2)
             len1 = self.get_str_len(src1)
             len2 = self.get_str_len(src2)
 
@@ -165,117 +1009,320 @@ class SPtoC(object):
             self.emit_line('int {} = {} + {};'.format(result_len, len1, len2))
             self.str_lens[dest.value] = result_len
 
-            self.emit_line('char* {} = (char*) malloc({} + 1);'.format(dest.value, result_len))
+            local = self.index in self.local_sites
+            if local and len1.isdigit() and len2.isdigit() and int(len1) + int(len2) <= STACK_ARRAY_MAX_LENGTH:
+                self.emit_line('char {}[{}];'.format(dest.value, int(len1) + int(len2) + 1))
+            else:
+                self.emit_line('char* {} = (char*) {};'.format(dest.value, self.allocation(result_len + ' + 1', local)))
             self.emit_line('strcpy({}, {});'.format(dest.value, s1))
             self.emit_line('strcat({}, {});'.format(dest.value, s2))
 
             self.reg_to_expr[dest] = dest.value
+        elif arr_depth > 0 and op == '+':
+            ctype = self.typeNames[type]
+            len1 = self.get_arr_len(src1)
+            len2 = self.get_arr_len(src2)
+            shape = self.get_inner_shape(src1, arr_depth)
+            # The rows of nested arrays must have the same shape for the
+            # result to be stored flat
+            for length1, length2 in zip(shape, self.get_inner_shape(src2, arr_depth)):
+                if not (length1.isdigit() and length1 == length2):
+                    self.unit.add_helper(LENGTH_CHECK_HELPERS)
+                    self.emit_line('if ({0} != {1}) sp_length_error("{2}", {0}, {1});'.format(length1, length2, op))
+            var1 = self.array_operand(src1, ctype, dest.value + '_1', arr_depth)
+            var2 = self.array_operand(src2, ctype, dest.value + '_2', arr_depth)
+
+            self.arr_lens[dest.value] = self.add_lengths(len1, len2)
+            self.inner_shapes[dest.value] = shape
+            size1 = multiply_lengths(len1, *shape)
+            size2 = multiply_lengths(len2, *shape)
+            self.reg_to_expr[dest] = ArrayConcat(ctype, var1, size1, var2, size2, self.add_lengths(size1, size2))
+            if self.index in self.local_sites:
+                self.local_temps.add(dest)
+        elif arr_depth > 0:
+            self.emit_elementwise(op, type, dest, src1, src2)
         else:
-            if arr_depth > 0 and op == '+':
-                
-                loc = 'malloc('
-                
-                var1 = s1
-                var2 = s2
-                
-                if s1.split(',')[0][0] == '{':
-                    self.emit_line('{} {}{} = {};'.format(type, dest.value+'_1', '[]'*arr_depth, s1))
-                    var1 = dest.value+'_1'
-                
-                sizeof_s1 = 'sizeof({})'.format(var1)
-                sizeof_s1_0 = 'sizeof({}[0])'.format(var1)
-                    
-                loc += sizeof_s1+'+'
-                
-                if s2.split(',')[0][0] == '{':
-                    self.emit_line('{} {}{} = {};'.format(type, dest.value+'_2', '[]'*arr_depth, s2))
-                    var2 = dest.value+'_2'
-                
-                sizeof_s2 = 'sizeof({})'.format(var2)
-                    
-                loc += sizeof_s2 + ');\n'
-                
-                loc += '    ' * self.indentation
-                loc += 'memcpy({}, {}, {});\n'.format(dest, var1, sizeof_s1)
-                
-                loc += '    ' * self.indentation
-                loc += 'memcpy({}+{}/{}, {}, {})'.format(dest, sizeof_s1, sizeof_s1_0, var2, sizeof_s2)
-                    
-                self.reg_to_expr[dest] = loc
+            s1 = self.convert_operand(src1)
+            s2 = self.convert_operand(src2)
+            self.reg_to_expr[dest] = '(' + s1 + ' ' + op + ' ' + s2 + ')'
+
+    def emit_elementwise(self, op, type, dest, src1, src2):
+        """
+        Defers an element-wise operation on arrays of ints, or on one and
+        an int, checking first that two arrays have the same length
+        """
+        ctype = self.typeNames[type]
+        operands = []
+        lengths = []
+        for i, src in enumerate((src1, src2)):
+            is_array = src.op_type == 'array' or self.is_array(src)
+            if is_array:
+                lengths.append(self.get_arr_len(src))
+                expr = self.array_operand(src, ctype, '{}_{}'.format(dest.value, i + 1))
+            elif src.op_type == 'expr':
+                # The scalar is computed once, rather than for each element
+                expr = '{}_{}'.format(dest.value, i + 1)
+                self.emit_line('{} {} = {};'.format(ctype, expr, self.convert_operand(src)))
             else:
-                self.reg_to_expr[dest] = '({} {} {})'.format(s1, op, s2)
+                expr = self.convert_operand(src)
+            operands.append((expr, is_array))
 
-    def emit_assign(self, dest, value, depth):
-        assign_val = self.convert_operand(value)
-        if dest is None:
-            self.emit_line(assign_val + ';')
+        if len(lengths) == 2 and not (lengths[0].isdigit() and lengths[0] == lengths[1]):
+            self.unit.add_helper(LENGTH_CHECK_HELPERS)
+            self.emit_line('if ({0} != {1}) sp_length_error("{2}", {0}, {1});'.format(lengths[0], lengths[1], op))
+
+        self.arr_lens[dest.value] = lengths[0]
+        self.reg_to_expr[dest] = ArrayMap(ctype, op, operands[0], operands[1], lengths[0])
+        if self.index in self.local_sites:
+            self.local_temps.add(dest)
+
+    def is_array(self, operand):
+        """
+        Returns whether a variable or temporary holds an array
+        """
+        return operand.value in self.arr_lens
+
+    def emit_builtin(self, dest, name, args):
+        if name == 'len':
+            length = self.get_arr_len(args[0])
+            self.reg_to_expr[dest] = length if length.isdigit() else '(' + length + ')'
+        elif name == 'strlen':
+            self.reg_to_expr[dest] = self.get_str_len(args[0])
+        elif len(args) == 1:
+            length = self.get_arr_len(args[0])
+            array = self.array_operand(args[0], 'int', dest.value + '_1')
+            helpers, kernel = ARRAY_REDUCTION_HELPERS[name]
+            for helper in helpers + [kernel]:
+                self.unit.add_helper(helper)
+            self.reg_to_expr[dest] = 'sp_{}({}, {})'.format(name, array, length)
         else:
-            if depth > 0:
-                if assign_val[0] != 'm':
-                    self.emit_line('{} = {};'.format(dest.value, assign_val))
+            self.unit.add_helper(SCALAR_MIN_MAX_HELPERS[name])
+            expr = self.convert_operand(args[0])
+            for arg in args[1:]:
+                expr = 'sp_{}2({}, {})'.format(name, expr, self.convert_operand(arg))
+            self.reg_to_expr[dest] = expr
+
+    def add_lengths(self, len1, len2):
+        if len1.isdigit() and len2.isdigit():
+            return str(int(len1) + int(len2))
+        return '{} + {}'.format(len1, len2)
+
+    def emit_assign(self, dest, value, depth, type=None):
+        if dest is None:
+            self.emit_line(self.convert_operand(value) + ';')
+            return
+
+        if depth > 0:
+            length = self.get_arr_len(value)
+            shape = self.get_inner_shape(value, depth)
+            array = self.reg_to_expr.get(value) if value.op_type == 'expr' else None
+            if isinstance(array, NEW_ARRAYS) and dest.value not in array.reads():
+                # The buffer is named after the temporary, as the variable
+                # may be assigned several times in the same block
+                self.emit_new_array(array, dest.value, False, value in self.local_temps, value.value + '_buf')
+            else:
+                if isinstance(array, NEW_ARRAYS):
+                    # The new array is computed from the one it replaces (as
+                    # in x = x + y), which must be read before it is replaced
+                    self.materialize(value, array)
+                ctype = self.typeNames[type]
+                if value.op_type == 'array':
+                    expr = self.literal_array(ctype, value, depth, dest.value + '_1', self.index in self.local_sites)
                 else:
-                    array_ind = '*' * depth
-                    lines = assign_val.split('\n')
-                    lines[1] = lines[1][:11] + str(dest)[1:] + lines[1][11+len(str(value)):]
-                    lines[2] = lines[2][:11] + str(dest)[1:] + lines[2][11+len(str(value)):]
-                    self.emit_line('{}{} {} = {};'.format(self.typeNames[type], array_ind, dest.value, '\n'.join(lines)))
-            else:    
-                self.emit_line('{} = {};'.format(dest.value, assign_val))
+                    expr = self.convert_operand(value)
+                # The variable isn't const, as it is assigned
+                if self.is_const(value):
+                    expr = '({}*) {}'.format(ctype, expr)
+                self.emit_line(dest.value + ' = ' + expr + ';')
+
+            if self.arr_lens.get(dest.value) == dest.value + '_len':
+                self.emit_line('{}_len = {};'.format(dest.value, length))
+            else:
+                self.arr_lens[dest.value] = length
+            row_lengths = tuple('{}_len{}'.format(dest.value, i + 1) for i in range(len(shape)))
+            if shape and self.inner_shapes.get(dest.value) == row_lengths:
+                for row_length, new_length in zip(row_lengths, shape):
+                    self.emit_line('{} = {};'.format(row_length, new_length))
+            else:
+                self.inner_shapes[dest.value] = shape
+            return
+
+        self.emit_line(dest.value + ' = ' + self.convert_operand(value) + ';')
+        if type == 'str' and dest.value in self.str_lens:
+            # The length computed for the previous string is kept up to date
+            if value.op_type not in ('expr', 'id'):
+                length = str(len(value.value))
+            else:
+                length = self.str_lens.get(value.value, 'strlen({})'.format(dest.value))
+            self.emit_line('{} = {};'.format(self.str_lens[dest.value], length))
 
     def emit_ret(self, expr):
-        ret_expr = self.convert_operand(expr)
-        self.emit_line('return {};'.format(ret_expr))
+        value = self.convert_operand(expr)
+        if self.arena:
+            # The returned value is computed before the arena is released
+            if not (value.isidentifier() or INT_LITERAL.match(value)):
+                self.emit_line('{} {} = {};'.format(self.ret_type, expr.value, value))
+                value = expr.value
+            self.emit_line('sp_arena_free(&_arena);')
+        self.emit_line('return ' + value + ';')
 
     def emit_func(self, name, ret_type, params):
-        param_str = ''
-        for idx, param in enumerate(params):
-            param_str += '{} {}'.format(self.typeNames[param[1]], param[0])
-            if idx != len(params) - 1:
-                param_str += ', '
-        loc = '{} {}({})'.format(self.typeNames[ret_type], name, param_str)
-        self.emit_line(loc+' {')
-        self.indentation += 1
+        # Nothing is carried over from the previous function, so that each
+        # one is emitted the same way when compiled on its own
+        self.reg_to_expr = {}
+        self.str_lens = {}
+        self.arr_lens = {}
+        self.inner_shapes = {}
+        self.views = {}
+        self.const_arrays = set()
+        self.assigned = self.reassigned.get(name, set())
+        self.local_temps = set()
+        self.loops = []
+        self.arena_marks = 0
+        self.ret_type = self.typeNames[ret_type]
+
+        signature = c_signature(name, ret_type, params)
+        if name != 'main':
+            self.unit.prototypes.append(signature)
+        self.open_block(signature)
+        self.arena = self.index in self.arena_scopes
+        if self.arena:
+            self.unit.add_helper(ARENA_HELPERS)
+            self.emit_line('sp_arena _arena = {0};')
+
+    def emit_end_func(self):
+        # A function ending with a return released its arena there
+        returned = isinstance(self.last_ir, IRControl) and self.last_ir.ctl == 'RET'
+        if self.arena and not returned:
+            self.emit_line('sp_arena_free(&_arena);')
+        self.emit_scope_end()
+        self.code.blank()
 
     def emit_decl(self, type, dest, value, arr_depth=0):
-        assign_val = self.convert_operand(value)
+        ctype = self.typeNames[type]
         if arr_depth > 0:
-            if assign_val[0] != 'm':
-                array_ind = '[]' * arr_depth
-                self.emit_line('{} {}{} = {};'.format(self.typeNames[type], dest.value, array_ind, assign_val))
+            length = self.get_arr_len(value)
+            self.inner_shapes[dest.value] = self.get_inner_shape(value, arr_depth)
+            array = self.reg_to_expr.get(value) if value.op_type == 'expr' else None
+            if isinstance(array, NEW_ARRAYS):
+                self.emit_new_array(array, dest.value, True, value in self.local_temps)
+            elif value.op_type == 'array':
+                expr = self.literal_array(ctype, value, arr_depth, dest.value, self.index in self.local_sites)
+                # A literal with rows that aren't literals is built in place
+                if expr != dest.value:
+                    self.emit_pointer_decl(ctype, dest.value, expr, True, True)
             else:
-                array_ind = '*' * arr_depth
-                lines = assign_val.split('\n')
-                lines[1] = lines[1][:11] + str(dest)[1:] + lines[1][11+len(str(value)):]
-                lines[2] = lines[2][:11] + str(dest)[1:] + lines[2][11+len(str(value)):]
-                self.emit_line('{}{} {} = {};'.format(self.typeNames[type], array_ind, dest.value, '\n'.join(lines)))
-                
+                self.emit_pointer_decl(ctype, dest.value, self.convert_operand(value), self.is_const(value))
+
+            # A length only known at runtime (that of a slice, or of an array
+            # built from one), or that of an array assigned later, possibly
+            # in a branch or a loop, is kept in a variable of its own, which
+            # is updated when the array is reassigned
+            if not length.isdigit() or dest.value in self.assigned:
+                self.emit_line('int {}_len = {};'.format(dest.value, length))
+                length = dest.value + '_len'
+            self.arr_lens[dest.value] = length
+            # So are the lengths of the rows of a nested array assigned later
+            if dest.value in self.assigned:
+                shape = []
+                for i, row_length in enumerate(self.inner_shapes[dest.value]):
+                    shape.append('{}_len{}'.format(dest.value, i + 1))
+                    self.emit_line('int {} = {};'.format(shape[-1], row_length))
+                self.inner_shapes[dest.value] = tuple(shape)
         else:
-            self.emit_line('{} {} = {};'.format(self.typeNames[type], dest.value, assign_val))
+            self.emit_line(ctype + ' ' + dest.value + ' = ' + self.convert_operand(value) + ';')
+            # A new variable, whose length isn't known yet
+            self.str_lens.pop(dest.value, None)
+
+    def open_loop(self, parallel=False):
+        """
+        Records a loop about to be opened. If the loop builds arrays in the
+        arena, the position of the arena is saved before the loop, and the
+        arena goes back to it at the start of each iteration (see
+        reset_arena) and after the loop.
+        """
+        loop = OpenLoop(parallel)
+        if self.arena and self.index in self.arena_scopes:
+            self.arena_marks += 1
+            loop.mark = '_arena_mark{}'.format(self.arena_marks)
+            self.emit_line('sp_arena_mark {} = sp_arena_save(&_arena);'.format(loop.mark))
+        self.loops.append(loop)
+
+    def reset_arena(self):
+        if self.loops[-1].mark is not None:
+            self.emit_line('sp_arena_reset(&_arena, {});'.format(self.loops[-1].mark))
+
+    def emit_while(self, condition):
+        self.open_loop()
+        self.emit_conditional('while', condition)
+        self.reset_arena()
+
+    def emit_end_loop(self):
+        self.close_block()
+        self.reset_arena()
+        self.loops.pop()
 
     def emit_conditional(self, name, condition):
-        cond = '({}) '.format(self.convert_operand(condition)) if condition is not None else ''
-        self.emit_line('{} {}'.format(name, cond) + '{')
-        self.indentation += 1
+        if condition is not None:
+            self.open_block(name + ' (' + self.convert_operand(condition) + ')')
+        else:
+            self.open_block(name)
+
+    def emit_for(self, var, start, end, step, reductions=None):
+        """
+        Opens a C for loop counting 'var' from 'start' up (or down) to 'end'.
+        Unless it's a constant, the end is evaluated once, into a variable
+        declared along with the counter, as range() only evaluates it once.
+
+        A parallel loop (one with a list of reductions) is preceded by an
+        OpenMP pragma, and is left as is by compilers without OpenMP. The
+        pragma needs the loop to only declare its counter, so the end is
+        declared in a block wrapping the loop instead.
+        """
+        init = 'int {} = {}'.format(var.value, self.convert_operand(start))
+        block = False
+        if end.op_type == 'int':
+            bound = str(end.value)
+        elif reductions is None:
+            bound = '_end_' + var.value
+            init += ', {} = {}'.format(bound, self.convert_operand(end))
+        else:
+            bound = '_end_' + var.value
+            block = True
+            self.open_block()
+            self.emit_line('int {} = {};'.format(bound, self.convert_operand(end)))
+        self.loop_blocks.append(block)
+        self.open_loop(reductions is not None)
+
+        if reductions is not None:
+            clauses = ''.join(' reduction({}:{})'.format(REDUCTION_OPS[op], name) for op, name in reductions)
+            self.emit_line('#pragma omp parallel for' + clauses)
+        if step > 0:
+            test = '{} < {}'.format(var.value, bound)
+            update = var.value + '++' if step == 1 else '{} += {}'.format(var.value, step)
+        else:
+            test = '{} > {}'.format(var.value, bound)
+            update = var.value + '--' if step == -1 else '{} -= {}'.format(var.value, -step)
+        self.open_block('for ({}; {}; {})'.format(init, test, update))
+        self.reset_arena()
+
+    def emit_end_for(self):
+        block = self.loop_blocks.pop()
+        self.emit_end_loop()
+        if block:
+            self.close_block()
 
     def emit_scope_end(self):
-        self.indentation -= 1
-        self.emit_line('}')
+        self.close_block()
 
     def emit_print(self, args_lst):
-        fmt_spec = ''
-        print_args = ''
-        for print_idx, print_var in enumerate(args_lst):
-            if print_var[1] == 'int':
-                fmt_spec += '%d'
-            elif print_var[1] == 'str':
-                fmt_spec += '%s'
-            elif print_var[1] == 'bool':
-                fmt_spec += '%d'
-
-            print_args += self.convert_operand(print_var[0])
-
-            if print_idx != len(args_lst) - 1:
-                fmt_spec += ' '
-                print_args += ', '
-
-        self.emit_line('printf("{}\\n", {});'.format(fmt_spec, print_args))
+        fmt_specs = []
+        print_args = []
+        for print_var in args_lst:
+            if print_var[1] == 'str':
+                fmt_specs.append('%s')
+            else:
+                fmt_specs.append('%d')
+            print_args.append(self.convert_operand(print_var[0]))
+
+        self.emit_line('printf("{}\\n", {});'.format(' '.join(fmt_specs), ', '.join(print_args)))
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+
+import hashlib
+import json
+
+import SimplePythonAST as ast
+from SimplePythonSymbolTable import ParseErrorList
+from SimplePythonTypeChecker import TypeChecker, PARALLEL_THRESHOLD, walk
+from SimplePythonDiagnostics import span_start, span_end
+from SimplePythonIRGen import IRGen, IRControl
+from SimplePythonIRtoC import SPtoC, CTranslationUnit, BOUNDS_CHECK_HELPERS, c_signature
+from SimplePythonIRFormat import encode_lines, decode_lines
+from SimplePythonBuild import write_file
+
+# Extension of the file caching the compiled functions of a C file
+CACHE_SUFFIX = '.spcache'
+# Changed whenever the compiler generates different code for the same
+# function, so that older caches are thrown away
+CACHE_VERSION = 10
+
+def source_fingerprint(node, data):
+    """
+    Returns a hash of the source of a subtree. Hashing the text is much
+    faster than walking the tree, and the same text always parses to the
+    same tree, wherever it is in the file.
+    """
+    return hashlib.sha1(data[span_start(node.coord):span_end(node.coord)].encode()).hexdigest()
+
+def ast_fingerprint(node):
+    """
+    Returns a hash of the structure of a subtree, for trees that weren't
+    built from a source. Spans are left out, like the position of the
+    text is for source_fingerprint.
+    """
+    parts = []
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if node is None:
+            parts.append(')')
+            continue
+        parts.append(node.__class__.__name__)
+        if isinstance(node, ast.Type):
+            parts.append(repr((node.name, node.arr_depth)))
+        else:
+            parts.append(repr([getattr(node, name) for name in node.attr_names]))
+        # None marks the end of the children of a node
+        stack.append(None)
+        for name, child in reversed(list(node.children())):
+            parts.append(name)
+            stack.append(child)
+    return hashlib.sha1('\0'.join(parts).encode()).hexdigest()
+
+def type_name(t):
+    return t.name + '[]' * t.arr_depth
+
+def signature_key(signature):
+    """
+    Returns a string such as "int(int,str[])" for the (param types,
+    return type) of a function, or None for an undeclared function
+    """
+    if signature is None:
+        return None
+    params, ret_type = signature
+    return '{}({})'.format(type_name(ret_type), ','.join(type_name(param) for param in params))
+
+def callees(decl):
+    """
+    Returns the names of the functions called by a function, which are its
+    edges in the call graph
+    """
+    return sorted(set(node.name for node in walk(decl) if isinstance(node, ast.FunctionCall)))
+
+class FunctionCache(object):
+    """
+    The compiled functions of a program, saved between runs. Each entry
+    holds the fingerprint of a function's tree, the signatures of the
+    functions it calls (its edges in the call graph), and its IR and C.
+    Without a path, the cache is only kept in memory.
+    """
+
+    def __init__(self, path, stamp):
+        self.path = path
+        self.stamp = stamp
+        self.functions = {}
+        self.load()
+
+    def load(self):
+        if self.path is None:
+            return
+        try:
+            with open(self.path, 'r') as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            return
+        # Caches written by another version or with other options are stale
+        if cache.get('version') == CACHE_VERSION and cache.get('stamp') == self.stamp:
+            self.functions = cache.get('functions', {})
+
+    def save(self):
+        """
+        Writes the cache atomically, so that an interrupted run never
+        leaves a truncated cache behind
+        """
+        if self.path is None:
+            return
+        cache = {'version': CACHE_VERSION, 'stamp': self.stamp, 'functions': self.functions}
+        write_file(self.path, json.dumps(cache, separators=(',', ':')))
+
+class IncrementalCompiler(object):
+    """
+    Compiles a program function by function, only typechecking,
+    generating, optimizing and emitting the functions that changed since
+    the last run. A function is recompiled when its tree changed or when
+    the signature of a function it calls changed, as its body was checked
+    (and its calls emitted) against the old one. Every optimization pass
+    works within a single function, so nothing else needs invalidating.
+    """
+
+    def __init__(self, cache, options, imported=None, jobs=1, verbose=False):
+        self.cache = cache
+        self.options = options
+        self.imported = imported or {}
+        self.jobs = jobs
+        self.verbose = verbose
+        # Methods of the program compiled last, and how many of them had
+        # to be recompiled
+        self.decls = []
+        self.recompiled = 0
+
+    def stale_reason(self, entry, fingerprint, callees):
+        """
+        Returns why the function must be recompiled, or None if its cached
+        code can be used
+        """
+        if entry is None:
+            return 'new'
+        if entry['ast'] != fingerprint:
+            return 'changed'
+        changed = sorted(name for name in set(callees) | set(entry['callees'])
+                         if callees.get(name) != entry['callees'].get(name))
+        if changed:
+            return 'signature of ' + ', '.join(changed) + ' changed'
+        return None
+
+    def compile(self, root, data=None):
+        """
+        Returns the C code of the program, raising a ParseError (or a
+        ParseErrorList) if it doesn't typecheck. 'data' is the source the
+        tree was parsed from, if any.
+        """
+        checker = TypeChecker(self.jobs, self.imported)
+        decls = root.methods()
+        global_st, errors = checker.declare_functions(decls)
+
+        functions = {}
+        stale = []
+        for decl in decls:
+            if data is not None and decl.coord is not None:
+                fingerprint = source_fingerprint(decl, data)
+            else:
+                fingerprint = ast_fingerprint(decl)
+            entry = self.cache.functions.get(decl.name)
+
+            # An unchanged function calls the same functions as before, so
+            # only the others need to be walked to find their callees
+            if entry is not None and entry['ast'] == fingerprint:
+                names = entry['callees']
+            else:
+                names = callees(decl)
+            signatures = {name: signature_key(global_st.funcs.get(name)) for name in names}
+
+            reason = self.stale_reason(entry, fingerprint, signatures)
+            if reason is None:
+                functions[decl.name] = entry
+            else:
+                if self.verbose:
+                    print("* Recompiling " + decl.name + " (" + reason + ")")
+                functions[decl.name] = {'ast': fingerprint, 'callees': signatures}
+                stale.append(decl)
+
+        if self.jobs > 1 and len(stale) >= PARALLEL_THRESHOLD:
+            errors += checker.check_methods_parallel(stale, global_st)
+        else:
+            for decl in stale:
+                errors += checker.check_method(decl, global_st)
+        if len(errors) == 1:
+            raise errors[0]
+        elif errors:
+            raise ParseErrorList(errors)
+
+        for decl in stale:
+            entry = functions[decl.name]
+            irgen = IRGen()
+            irgen.generate(decl)
+            entry['ir'] = encode_lines(irgen.IR_lst)
+
+            self.options.optimize_ir(irgen.IR_lst)
+            sptoc = SPtoC(irgen, self.options.bounds_check, self.options.vector_hints,
+                          self.options.local_allocation)
+            sptoc.unit = CTranslationUnit()
+            sptoc.code = sptoc.unit.body
+            sptoc.emit_ir(irgen.IR_lst)
+            entry['c'] = sptoc.code.lines
+            entry['helpers'] = sptoc.unit.helpers
+            entry['constants'] = list(sptoc.unit.constants)
+
+        self.recompiled = len(stale)
+        self.decls = decls
+        if stale or len(functions) != len(self.cache.functions):
+            self.cache.functions = functions
+            self.cache.save()
+        return self.render(root)
+
+    def render(self, root):
+        """
+        Puts the C code of the functions together, the way SPtoC lays out
+        the C code of a whole program
+        """
+        unit = CTranslationUnit()
+        unit.includes.extend(module + '.h' for module in dict.fromkeys(imp.module for imp in root.imports))
+        if self.options.bounds_check:
+            unit.add_helper(BOUNDS_CHECK_HELPERS)
+        for decl in self.decls:
+            if decl.name != 'main':
+                params = [(param.name, param.type.name) for param in decl.params.params]
+                unit.prototypes.append(c_signature(decl.name, decl.ret_type.name, params))
+            entry = self.cache.functions[decl.name]
+            for helper in entry['helpers']:
+                unit.add_helper(helper)
+            for constant in entry['constants']:
+                unit.add_constant(constant)
+            unit.body.lines.extend(entry['c'])
+        return unit.render()
+
+    def ir(self, root):
+        """
+        Returns the IR of the program (before optimization), decoded from
+        the cache
+        """
+        irlst = [IRControl('IMPORT', module) for module in dict.fromkeys(imp.module for imp in root.imports)]
+        for decl in self.decls:
+            irlst.extend(decode_lines(self.cache.functions[decl.name]['ir']))
+        return irlst
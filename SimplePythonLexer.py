@@ -47,20 +47,42 @@ reserved = {
     'if' : 'IF',
     'else' : 'ELSE',
     'while' : 'WHILE',
+    'for' : 'FOR',
+    'in' : 'IN',
+    'range' : 'RANGE',
+    'parallel' : 'PARALLEL',
     'print' : 'PRINT',
-    'return' : 'RETURN'
+    'return' : 'RETURN',
+    'from' : 'FROM',
+    'import' : 'IMPORT'
 }
 
 # Add reserved names to list of tokens
 tokens += list(reserved.values())
 
+# Tokens whose value isn't their source text, so they record the offset
+# where they end when they are scanned
+SCANNED_TOKENS = frozenset(['DECIMAL', 'STRINGLIT', 'ID'] + list(reserved.values()))
+
 
 class SimplePythonLexer():
     def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """
+        Forgets everything about the previous input, so that the lexer can
+        be reused for another file, even if it stopped in the middle of the
+        previous one
+        """
         # Keeps track of the current indentation level
         self.current_indentation = 0
         self.remaining_indentation = 0 # Needed to force PLY to emit multiple tokens
         self.indentation_type = 'INDENT'
+        # (message, offset) of each illegal character skipped over
+        self.errors = []
+        if hasattr(self, 'lexer'):
+            self.lexer.lineno = 1
 
     # A string containing ignored characters (spaces and tabs)
     t_ignore = ' \t'
@@ -89,17 +111,20 @@ class SimplePythonLexer():
     # A regular expression rule with some action code
     def t_DECIMAL(self, t):
         r'\d+'
+        t.endlexpos = t.lexer.lexpos
         t.value = int(t.value)
         return t
 
     def t_STRINGLIT(self, t):
         r'\'(\\\'|[^\'])*\' | "(\\"|[^"])*"'
+        t.endlexpos = t.lexer.lexpos
         # Clean up outer quotes and remove backslashes before quotes
         t.value = t.value[1:-1].replace("\\'", "'").replace('\\"', '"')
         return t
 
     def t_ID(self, t):
         r'[a-zA-Z_][a-zA-Z_0-9]*'
+        t.endlexpos = t.lexer.lexpos
         t.type = reserved.get(t.value, 'ID') # Check for reserved words
         return t
 
@@ -138,9 +163,10 @@ class SimplePythonLexer():
         r'\n+'
         t.lexer.lineno += len(t.value)
 
-    # Error handling rule. DO NOT MODIFY
+    # Error handling rule. The character is skipped and reported along with
+    # the parser's diagnostics
     def t_error(self, t):
-        print("Illegal character '%s'" % t.value[0])
+        self.errors.append(("Illegal character '%s'" % t.value[0], t.lexpos))
         t.lexer.skip(1)
 
     # Build the lexer. DO NOT MODIFY
@@ -156,6 +182,8 @@ class SimplePythonLexer():
             if not tok:
                 break
             print(tok)
+        for message, offset in self.errors:
+            print(message + " at offset " + str(offset))
 
 
 # Main function. DO NOT MODIFY
@@ -1,17 +1,27 @@
 #!/usr/bin/env python3
 
 import argparse
+import os
 import sys
 
 from SimplePythonLexer import SimplePythonLexer
 from SimplePythonParser import SimplePythonParser
-from SimplePythonSymbolTable import GlobalSymbolTable
+from SimplePythonSymbolTable import GlobalSymbolTable, ParseError
+from SimplePythonDiagnostics import from_error, locate_all, report
 from SimplePythonTypeChecker import TypeChecker
 from SimplePythonIRGen import IRGen
-from SimplePythonIRtoC import SPtoC
-from SimplePythonOptimizer import ConstOptimizer
+from SimplePythonIRtoC import SPtoC, module_header
+from SimplePythonIRFormat import dump as dump_ir, load as load_ir, IRFormatError
+from SimplePythonOptimizer import UNROLL_BUDGET, UNROLL_FACTOR
+from SimplePythonBuild import CCompiler, BuildError, BUILD_PRESETS, write_file
+from SimplePythonModules import ModuleLoader, ModuleBuilder, CompileOptions
+from SimplePythonIncremental import FunctionCache, IncrementalCompiler, CACHE_SUFFIX
+from SimplePythonWatch import FileBuild, ModulesBuild, watch
 import SimplePythonAST as ast
 
+# Extension of the files written by --emit-ir
+IR_SUFFIX = '.spir'
+
 if __name__ == "__main__":
 
     # Python module "argparse" allows you to easily add commandline flags
@@ -21,56 +31,209 @@ if __name__ == "__main__":
     # Of course, this is entirely optional and not necessary, as long as
     # the compiler functions correctly.
     argparser = argparse.ArgumentParser(description='Take in the python source code and compile it')
-    argparser.add_argument('FILE', help="Input file")
+    argparser.add_argument('FILE', nargs='+', help="Input file (SimplePython source, or IR saved with --emit-ir), or the modules of a program")
     argparser.add_argument('-o', '--output', action='store', default='a.c', help="Specify the name for the output file")
+    argparser.add_argument('--out-dir', action='store', help="Compile each module into its own C file and header in this directory, only recompiling the modules that changed")
+    argparser.add_argument('-I', '--include-dir', action='append', default=[], help="Also look for imported modules in this directory")
     argparser.add_argument('-a', '--print-ast', action='store_true', help="Print AST Nodes")
     argparser.add_argument('-p', '--parse-only', action='store_true', help="Stop after scanning and parsing the input")
     argparser.add_argument('-t', '--typecheck-only', action='store_true', help="Stop after typechecking")
+    argparser.add_argument('-j', '--jobs', type=int, default=1, help="Number of processes used to typecheck large programs")
     argparser.add_argument('-i', '--ir', action='store_true', help='Display IR')
+    argparser.add_argument('--emit-ir', action='store', metavar='FILE', help="Save the generated IR (before optimization) to FILE, which can be compiled later in place of the source")
+    argparser.add_argument('--diagnostics-format', choices=['text', 'json'], default='text', help="Report errors as text on stderr, or as JSON on stdout")
     argparser.add_argument('-v', '--verbose', action='store_true', help="Provides additional output")
-    argparser.add_argument('-O', '--optimize', action='store_true', help="Use optimizations (constant folding and peephole optimization)")
+    argparser.add_argument('-O', '--optimize', action='store_true', help="Use optimizations (loop unrolling, constant folding, peephole optimization and tail call elimination)")
+    argparser.add_argument('--unroll-budget', type=int, default=UNROLL_BUDGET, help="Fully unroll the loops with a known trip count that take at most this many lines of IR once unrolled (default: %(default)s)")
+    argparser.add_argument('--unroll-factor', type=int, default=UNROLL_FACTOR, help="Unroll larger loops with a known trip count by this factor, 1 to disable (default: %(default)s)")
+    argparser.add_argument('--incremental', action='store_true', help="Cache the compiled functions next to the output, and only recompile the ones that changed")
+    argparser.add_argument('-w', '--watch', action='store_true', help="Keep running, and rebuild the output every time one of the input files changes")
+    argparser.add_argument('--compact-ir', action='store_true', help="Store the IR in typed arrays to save memory on very large programs")
+    argparser.add_argument('--bounds-check', action='store_true', help="Check array indices that can't be proven in range at runtime")
+    argparser.add_argument('--no-vector-hints', action='store_true', help="Don't align the arrays or mark their pointers restrict, which helps the C compiler vectorize loops")
+    argparser.add_argument('--no-escape-analysis', action='store_true', help="Allocate every array and string built at runtime with malloc, even those that don't outlive their block")
+    argparser.add_argument('-b', '--build', choices=sorted(BUILD_PRESETS), help="Compile the C output into an executable with the given preset")
+    argparser.add_argument('-x', '--executable', action='store', help="Specify the name for the executable (defaults to the output name without .c)")
+    argparser.add_argument('--cc', action='store', help="C compiler to build with (defaults to $CC, cc, gcc or clang)")
+    argparser.add_argument('--pgo', action='store_true', help="Build with profile-guided optimization, training on one run of the program")
+    argparser.add_argument('--train-input', action='store', help="File fed to the training run's stdin when using --pgo")
     args = argparser.parse_args()
 
-    # Prints additional output if the flag is set
-    if args.verbose:
-        print("* Reading file " + args.FILE + "...\n")
+    # Report every error found, rather than stopping at the first
+    def fail(diagnostics):
+        out = sys.stdout if args.diagnostics_format == 'json' else sys.stderr
+        report(diagnostics, args.diagnostics_format, out)
+        sys.exit(1)
+
+    def build(c_files, executable):
+        preset = args.build or 'O2'
 
-    f = open(args.FILE, 'r')
-    data = f.read()
-    f.close()
+        if args.verbose:
+            print("* Building {} ({})...\n".format(executable, preset + (', PGO' if args.pgo else '')))
 
-    if args.verbose:
-        print("* Scanning and Parsing...\n")
+        cc = CCompiler(args.cc, args.verbose)
+        if args.pgo:
+            cc.compile_pgo(c_files, executable, preset, args.train_input)
+        else:
+            cc.compile(c_files, executable, preset)
 
-    # Build and runs the parser to get AST
-    parser = SimplePythonParser()
-    root = parser.parse(data)
+    def main_module(builder):
+        mains = [module for module in builder.modules if module.root.main_func is not None]
+        if len(mains) != 1:
+            raise BuildError("Exactly one module must define main to build an executable")
+        return mains[0]
 
-    # Use the default visitor (from W5) to go through the AST and print them
-    # if the user provdes '--print-ast' flag
-    if args.print_ast:
-        visitor = ast.NodeVisitor()
-        visitor.visit(root)
+    options = CompileOptions(args.optimize, args.bounds_check, args.compact_ir, args.incremental,
+                             args.unroll_budget, args.unroll_factor, not args.no_vector_hints,
+                             not args.no_escape_analysis)
+    module_mode = len(args.FILE) > 1 or args.out_dir is not None
+    out_dir = args.out_dir or '.'
+    if module_mode and any(path.endswith(IR_SUFFIX) for path in args.FILE):
+        sys.exit("Saved IR can't be compiled as a module")
 
-    # If user asks to quit after parsing, do so.
-    if args.parse_only:
-        quit()
+    # Rebuild whenever the sources change, reporting errors instead of
+    # stopping at them
+    if args.watch:
+        if args.FILE[0].endswith(IR_SUFFIX):
+            sys.exit("Saved IR can't be watched")
 
-    if args.verbose:
-        print("* Typechecking...\n")
+        if module_mode:
+            builder = ModuleBuilder(ModuleLoader(args.include_dir), out_dir, options, args.jobs, args.verbose)
+            target = ModulesBuild(builder, args.FILE)
+        else:
+            # The compiled functions are always kept in memory, and saved
+            # next to the output with --incremental
+            cache_path = os.path.splitext(args.output)[0] + CACHE_SUFFIX if args.incremental else None
+            target = FileBuild(args.FILE[0], args.output, options, args.include_dir, args.jobs, args.verbose, cache_path)
 
-    typechecker = TypeChecker()
-    typechecker.typecheck(root)
+        def on_success(c_files):
+            if args.build is None and not args.pgo:
+                return True
+            try:
+                if module_mode:
+                    build(c_files, args.executable or os.path.join(out_dir, main_module(builder).name))
+                elif target.imported_modules:
+                    raise BuildError("Programs that import modules must be built with --out-dir")
+                else:
+                    build(c_files, args.executable or os.path.splitext(args.output)[0])
+            except BuildError as e:
+                sys.stderr.write(str(e) + '\n')
+                return False
+            return True
 
-    if args.typecheck_only:
+        out = sys.stdout if args.diagnostics_format == 'json' else sys.stderr
+        watch(target, lambda diagnostics: report(diagnostics, args.diagnostics_format, out), on_success)
+        if module_mode:
+            builder.close()
         quit()
 
-    if args.verbose:
-        print("* Generating IR...")
-    
-    irgen = IRGen()
-    irgen.generate(root)
-    
+    # Programs made of several modules are compiled one C file per module
+    if module_mode:
+        builder = ModuleBuilder(ModuleLoader(args.include_dir), out_dir, options, args.jobs, args.verbose)
+        c_files, diagnostics = builder.build(args.FILE)
+        builder.close()
+        if diagnostics:
+            fail(diagnostics)
+
+        if args.build is not None or args.pgo:
+            try:
+                build(c_files, args.executable or os.path.join(out_dir, main_module(builder).name))
+            except BuildError as e:
+                sys.exit(str(e))
+        quit()
+
+    path = args.FILE[0]
+    # IR saved with --emit-ir skips the front end
+    if path.endswith(IR_SUFFIX):
+        if args.verbose:
+            print("* Loading IR from " + path + "...\n")
+
+        irgen = IRGen(args.compact_ir)
+        imported_modules = []
+        code = None
+        try:
+            with open(path, 'r') as f:
+                irgen.IR_lst.extend(load_ir(f))
+        except IRFormatError as e:
+            sys.exit(path + ": " + str(e))
+    else:
+        # Prints additional output if the flag is set
+        if args.verbose:
+            print("* Reading file " + path + "...\n")
+
+        f = open(path, 'r')
+        data = f.read()
+        f.close()
+
+        if args.verbose:
+            print("* Scanning and Parsing...\n")
+
+        # Build and runs the parser to get AST
+        parser = SimplePythonParser()
+        root = parser.parse(data)
+        # The parser is reused for the imported modules, so keep this one's
+        source_map = parser.source_map
+
+        # The tree is incomplete after a syntax error, so don't typecheck it
+        if parser.diagnostics:
+            fail(locate_all(parser.diagnostics, source_map, path))
+
+        # Only the signatures of the imported modules are needed to check
+        # this one
+        loader = ModuleLoader(args.include_dir, parser)
+        try:
+            imported_modules, imported = loader.resolve(root, os.path.dirname(path) or '.')
+        except ParseError as e:
+            fail(locate_all(from_error(e, 'import'), source_map, path))
+
+        # Use the default visitor (from W5) to go through the AST and print them
+        # if the user provdes '--print-ast' flag
+        if args.print_ast:
+            visitor = ast.NodeVisitor()
+            visitor.visit(root)
+
+        # If user asks to quit after parsing, do so.
+        if args.parse_only:
+            quit()
+
+        irgen = IRGen(args.compact_ir)
+        code = None
+        if args.incremental and not args.typecheck_only:
+            if args.verbose:
+                print("* Compiling the functions that changed...\n")
+
+            cache = FunctionCache(os.path.splitext(args.output)[0] + CACHE_SUFFIX, options.stamp())
+            compiler = IncrementalCompiler(cache, options, imported, args.jobs, args.verbose)
+            try:
+                code = compiler.compile(root, data)
+            except ParseError as e:
+                fail(locate_all(from_error(e), source_map, path))
+
+            # The IR is only decoded from the cache when it's asked for
+            if args.emit_ir is not None or args.ir:
+                irgen.IR_lst.extend(compiler.ir(root))
+        else:
+            if args.verbose:
+                print("* Typechecking...\n")
+
+            typechecker = TypeChecker(args.jobs, imported)
+            try:
+                typechecker.typecheck(root)
+            except ParseError as e:
+                fail(locate_all(from_error(e), source_map, path))
+
+            if args.typecheck_only:
+                quit()
+
+            if args.verbose:
+                print("* Generating IR...")
+
+            irgen.generate(root)
+
+    if args.emit_ir is not None:
+        with open(args.emit_ir, 'w') as f:
+            dump_ir(irgen.IR_lst, f)
+
     if args.ir:
         if args.verbose:
             print()
@@ -83,15 +246,31 @@ if __name__ == "__main__":
 
         irgen.print_ir()
 
-    if args.optimize:
-        const_opt = ConstOptimizer(irgen.IR_lst)
-        const_opt.optimize()
+    if code is None:
+        options.optimize_ir(irgen.IR_lst)
+        code = SPtoC(irgen, options.bounds_check, options.vector_hints, options.local_allocation).generate()
 
+    # The output is replaced atomically, so a build reading it never sees
+    # half of it
     try:
-        out = open(args.output, 'w')
-    except:
+        write_file(args.output, code)
+        out = None
+    except OSError:
         out = sys.stdout
+        out.write(code)
+
+    if out is not sys.stdout:
+        # The C file includes the headers of the modules it imports
+        for module in imported_modules:
+            write_file(os.path.join(os.path.dirname(args.output), module.name + '.h'),
+                       module_header(module.name, module.signatures()))
+
+    if args.build is not None or args.pgo:
+        if out is sys.stdout:
+            sys.exit("Can't build an executable without an output file")
+        if imported_modules:
+            sys.exit("Programs that import modules must be built with --out-dir")
+
+        build([args.output], args.executable or os.path.splitext(args.output)[0])
 
-    sptoc = SPtoC(irgen)
-    sptoc.emitCcode(out)
     
\ No newline at end of file
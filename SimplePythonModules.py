@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from SimplePythonParser import SimplePythonParser
+from SimplePythonSymbolTable import ParseError, ParseErrorList
+from SimplePythonDiagnostics import from_error, locate_all
+from SimplePythonTypeChecker import TypeChecker
+from SimplePythonIRGen import IRGen
+from SimplePythonIRtoC import SPtoC, module_header
+from SimplePythonOptimizer import optimize_ir, UNROLL_BUDGET, UNROLL_FACTOR
+from SimplePythonIncremental import FunctionCache, IncrementalCompiler, CACHE_SUFFIX
+from SimplePythonBuild import write_file
+
+# Extension of SimplePython source files, which is left out of module names
+SOURCE_SUFFIX = '.py'
+
+class CompileOptions(object):
+    """
+    The options that change the C generated for a module. They are stamped
+    on the first line of the C file, so that changing them recompiles it.
+    """
+
+    def __init__(self, optimize=False, bounds_check=False, compact_ir=False, incremental=False,
+                 unroll_budget=UNROLL_BUDGET, unroll_factor=UNROLL_FACTOR, vector_hints=True,
+                 local_allocation=True):
+        self.optimize = optimize
+        self.bounds_check = bounds_check
+        self.compact_ir = compact_ir
+        # Cache the compiled functions of each module, next to its C file
+        self.incremental = incremental
+        self.unroll_budget = unroll_budget
+        self.unroll_factor = unroll_factor
+        self.vector_hints = vector_hints
+        self.local_allocation = local_allocation
+
+    def stamp(self):
+        # The compact IR and the cache give the same C, so they don't need
+        # a rebuild
+        flags = [flag for flag, used in (('-O', self.optimize), ('--bounds-check', self.bounds_check),
+                                         ('--no-vector-hints', not self.vector_hints),
+                                         ('--no-escape-analysis', not self.local_allocation)) if used]
+        # Loops are only unrolled by the optimizer
+        if self.optimize and self.unroll_budget != UNROLL_BUDGET:
+            flags.append('--unroll-budget ' + str(self.unroll_budget))
+        if self.optimize and self.unroll_factor != UNROLL_FACTOR:
+            flags.append('--unroll-factor ' + str(self.unroll_factor))
+        return ' '.join(['/* pytoc'] + flags + ['*/'])
+
+    def optimize_ir(self, irlst):
+        """
+        Runs the optimization passes selected by the options over the IR
+        """
+        optimize_ir(irlst, self.optimize, self.bounds_check, self.unroll_budget, self.unroll_factor)
+
+class Module(object):
+    """
+    A parsed source file. Its name is the file name without the extension,
+    and is what other modules import it by.
+    """
+
+    def __init__(self, path, parser):
+        self.path = path
+        self.name = os.path.splitext(os.path.basename(path))[0]
+        self.mtime = os.path.getmtime(path)
+
+        with open(path, 'r') as f:
+            self.data = f.read()
+        self.root = parser.parse(self.data)
+        self.source_map = parser.source_map
+        self.diagnostics = locate_all(parser.diagnostics, self.source_map, path)
+
+    def imports(self):
+        return self.root.imports if self.root is not None else []
+
+    def functions(self):
+        """
+        The functions the module exports: all of them but main
+        """
+        if self.root is None:
+            return []
+        return [decl for decl in self.root.func_decl if decl.name != 'main']
+
+    def signatures(self):
+        """
+        (name, return type, [(param name, param type)]) of each exported
+        function, as written to the module's header
+        """
+        return [(decl.name, decl.ret_type.name, [(param.name, param.type.name) for param in decl.params.params])
+                for decl in self.functions()]
+
+    def func_types(self):
+        """
+        ([param types], return type) of each exported function, by name, as
+        declared in the global symbol table of the modules importing it
+        """
+        return {decl.name: ([param.type for param in decl.params.params], decl.ret_type)
+                for decl in self.functions()}
+
+class ModuleLoader(object):
+    """
+    Finds, parses and caches the modules imported by a program. An import
+    is looked up in the directory of the importing file first, then in the
+    directories of the search path, in order.
+    """
+
+    def __init__(self, search_path=(), parser=None):
+        self.search_path = list(search_path)
+        self.parser = parser
+        # Modules parsed so far, by absolute path
+        self.modules = {}
+        # Where the modules that couldn't be found would be looked up first
+        self.missing = set()
+
+    def find(self, name, importer_dir='.'):
+        """
+        Returns the path of the source of module 'name', or None if there
+        is none
+        """
+        for directory in [importer_dir] + self.search_path:
+            path = os.path.join(directory, name + SOURCE_SUFFIX)
+            if os.path.isfile(path):
+                return path
+        self.missing.add(os.path.join(importer_dir, name + SOURCE_SUFFIX))
+        return None
+
+    def load(self, path):
+        """
+        Returns the Module for the file at 'path', which is only parsed
+        again if it changed since it was last loaded
+        """
+        key = os.path.abspath(path)
+        module = self.modules.get(key)
+        if module is None or module.mtime != os.path.getmtime(path):
+            if self.parser is None:
+                self.parser = SimplePythonParser()
+            module = self.modules[key] = Module(path, self.parser)
+        return module
+
+    def resolve(self, root, importer_dir='.'):
+        """
+        Returns the Modules the program imports, along with the types of
+        the functions it imports from them, by name. Raises a ParseErrorList
+        for imports that can't be satisfied.
+        """
+        modules = []
+        imported = {}
+        errors = []
+        for imp in root.imports:
+            path = self.find(imp.module, importer_dir)
+            if path is None:
+                errors.append(ParseError("No module named \"" + imp.module + "\"", imp.coord))
+                continue
+
+            module = self.load(path)
+            if module.diagnostics:
+                errors.append(ParseError("Module \"" + imp.module + "\" has errors", imp.coord))
+                continue
+            if module not in modules:
+                modules.append(module)
+
+            types = module.func_types()
+            for name in imp.names:
+                if name not in types:
+                    errors.append(ParseError("Module \"" + imp.module + "\" has no function named \"" + name + "\"", imp.coord))
+                else:
+                    imported[name] = types[name]
+
+        if errors:
+            raise ParseErrorList(errors)
+        return modules, imported
+
+# Parser kept by each process compiling modules, so its tables are only
+# built once
+_parser = None
+
+def compile_module(path, imported, options, cache_path=None):
+    """
+    Compiles one module against the types of the functions it imports, and
+    returns its C code (None if it has errors) along with its diagnostics.
+    Modules don't share any state, so they can be compiled in parallel.
+    With a 'cache_path', only the functions that changed are recompiled.
+    """
+    global _parser
+    if _parser is None:
+        _parser = SimplePythonParser()
+
+    with open(path, 'r') as f:
+        data = f.read()
+    root = _parser.parse(data)
+    source_map = _parser.source_map
+    if _parser.diagnostics:
+        return None, locate_all(_parser.diagnostics, source_map, path)
+
+    if cache_path is not None:
+        compiler = IncrementalCompiler(FunctionCache(cache_path, options.stamp()), options, imported)
+        try:
+            return compiler.compile(root, data), []
+        except ParseError as e:
+            return None, locate_all(from_error(e), source_map, path)
+
+    try:
+        TypeChecker(1, imported).typecheck(root)
+    except ParseError as e:
+        return None, locate_all(from_error(e), source_map, path)
+
+    irgen = IRGen(options.compact_ir)
+    irgen.generate(root)
+    options.optimize_ir(irgen.IR_lst)
+    return SPtoC(irgen, options.bounds_check, options.vector_hints, options.local_allocation).generate(), []
+
+class ModuleBuilder(object):
+    """
+    Compiles a program made of several modules into one C file (and one
+    header) per module in 'out_dir'. Like make, it only recompiles the
+    modules whose C file is out of date: a module is recompiled when its
+    source changed, when the options changed, or when the header of a
+    module it imports changed. Headers are only rewritten when the exported
+    signatures change, so editing the body of a function doesn't recompile
+    the modules importing it.
+    """
+
+    def __init__(self, loader, out_dir, options, jobs=1, verbose=False):
+        self.loader = loader
+        self.out_dir = out_dir
+        self.options = options
+        self.jobs = jobs
+        self.verbose = verbose
+        # Modules of the program, once built, and the source files of every
+        # module it imports, including those with errors
+        self.modules = []
+        self.sources = []
+        # Number of modules recompiled by the last build
+        self.compiled = 0
+        # Worker processes, kept between builds so that their parsers are
+        # already built when watching the files
+        self.pool = None
+
+    def output(self, module, suffix):
+        return os.path.join(self.out_dir, module.name + suffix)
+
+    def collect(self, paths):
+        """
+        Returns the modules of the given files and of everything they
+        import, directly or not, along with the diagnostics found in them
+        """
+        modules = []
+        diagnostics = []
+        pending = list(paths)
+        seen = set()
+        while pending:
+            path = pending.pop(0)
+            if os.path.abspath(path) in seen:
+                continue
+            seen.add(os.path.abspath(path))
+
+            module = self.loader.load(path)
+            modules.append(module)
+            diagnostics.extend(module.diagnostics)
+            for imp in module.imports():
+                found = self.loader.find(imp.module, os.path.dirname(path) or '.')
+                if found is not None:
+                    pending.append(found)
+        return modules, diagnostics
+
+    def write_header(self, module):
+        """
+        Writes the header of the module, unless it's already up to date, so
+        that its modification time only changes with its content
+        """
+        path = self.output(module, '.h')
+        header = module_header(module.name, module.signatures())
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                if f.read() == header:
+                    return
+        write_file(path, header)
+
+    def is_stale(self, module, imported_modules):
+        path = self.output(module, '.c')
+        if not os.path.exists(path):
+            return True
+        with open(path, 'r') as f:
+            if f.readline().rstrip('\n') != self.options.stamp():
+                return True
+        mtime = os.path.getmtime(path)
+        if mtime < module.mtime:
+            return True
+        return any(mtime < os.path.getmtime(self.output(imported, '.h')) for imported in imported_modules)
+
+    def build(self, paths):
+        """
+        Brings the C files of the program up to date, and returns their
+        paths along with the diagnostics of the modules that failed
+        """
+        os.makedirs(self.out_dir, exist_ok=True)
+        modules, diagnostics = self.collect(paths)
+        self.sources = [module.path for module in modules]
+        self.modules = modules = [module for module in modules if not module.diagnostics]
+        for module in modules:
+            self.write_header(module)
+
+        stale = []
+        for module in modules:
+            try:
+                imported_modules, imported = self.loader.resolve(module.root, os.path.dirname(module.path) or '.')
+            except ParseError as e:
+                diagnostics.extend(locate_all(from_error(e, 'import'), module.source_map, module.path))
+                continue
+            if self.is_stale(module, imported_modules):
+                stale.append((module, imported))
+            elif self.verbose:
+                print("* " + module.name + " is up to date")
+
+        paths = [module.path for module, _ in stale]
+        imports = [imported for _, imported in stale]
+        options = [self.options] * len(stale)
+        caches = [self.output(module, CACHE_SUFFIX) if self.options.incremental else None for module, _ in stale]
+        if self.jobs > 1 and len(stale) > 1:
+            if self.pool is None:
+                self.pool = ProcessPoolExecutor(self.jobs)
+            results = list(self.pool.map(compile_module, paths, imports, options, caches))
+        else:
+            results = list(map(compile_module, paths, imports, options, caches))
+
+        self.compiled = len(stale)
+        for (module, _), (code, errors) in zip(stale, results):
+            diagnostics.extend(errors)
+            if code is not None:
+                if self.verbose:
+                    print("* Compiled " + module.name)
+                write_file(self.output(module, '.c'), self.options.stamp() + '\n' + code)
+
+        c_files = [self.output(module, '.c') for module in modules]
+        return c_files, diagnostics
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
@@ -1,6 +1,45 @@
 import sys
 from SimplePythonIRGen import TAC, IRControl, Operand
 
+# Loops with a known trip count are fully unrolled if that takes at most
+# this many lines of IR, and otherwise unrolled by UNROLL_FACTOR
+UNROLL_BUDGET = 64
+UNROLL_FACTOR = 4
+
+# Builtins that reduce an array of ints (or, for min and max, several ints)
+# to an int
+ARRAY_REDUCTIONS = {
+    'sum': sum,
+    'min': min,
+    'max': max,
+}
+
+
+def fold_int(op, left, right):
+    """
+    Returns the value of 'left op right' on C ints, or None for a division
+    by zero, which is left to fail at runtime
+    """
+    if op in ('/', '%'):
+        if right == 0:
+            return None
+        # C truncates the quotient towards zero, unlike Python
+        quotient = abs(left) // abs(right)
+        if (left < 0) != (right < 0):
+            quotient = -quotient
+        return quotient if op == '/' else left - right * quotient
+    return eval('left {} right'.format(op), {}, {'left': left, 'right': right})
+
+
+def int_values(operand):
+    """
+    Returns the values of the elements of an array operand, or None if
+    some of them aren't int constants
+    """
+    if operand.op_type != 'array' or any(element.op_type != 'int' for element in operand.value):
+        return None
+    return [element.value for element in operand.value]
+
 
 class SimplePythonOptimizer(object):
     def __init__(self, irlst):
@@ -79,6 +118,13 @@ class ConstOptimizer(SimplePythonOptimizer):
                 self.unknown_context_depth += 1
             elif ir.ctl == 'ENDWHILE':
                 self.unknown_context_depth -= 1
+            elif ir.ctl == 'FOR':
+                # The bounds are computed before the loop starts
+                var, start, end, step, reductions = ir.data
+                ir.data = (var, self.fold_operand(start), self.fold_operand(end), step, reductions)
+                self.unknown_context_depth += 1
+            elif ir.ctl == 'ENDFOR':
+                self.unknown_context_depth -= 1
             elif ir.ctl == 'PRINT':
                 ir.data = [(self.fold_operand(tup[0]), tup[1]) for tup in ir.data]
             elif ir.ctl == 'ENDFUNC':
@@ -100,8 +146,12 @@ class ConstOptimizer(SimplePythonOptimizer):
                 ir = self.optimize_unaryOp(ir)
             elif ir.op == 'CALL':
                 ir.src2 = [self.fold_operand(x) for x in ir.src2]
+            elif ir.op == 'BUILTIN':
+                ir = self.optimize_builtin(ir)
             elif ir.op == 'ARRAY_IDX':
                 ir = self.optimize_array_idx(ir)
+            elif ir.op == 'SLICE':
+                ir = self.optimize_slice(ir)
             return ir
 
     def optimize_assign(self, ir):
@@ -110,6 +160,9 @@ class ConstOptimizer(SimplePythonOptimizer):
         if ir.dest is not None:
             if value.op_type in self.constant_types:
                 self.var_to_value[ir.dest.value] = value
+            else:
+                # The variable no longer holds the constant it was given
+                self.var_to_value.pop(ir.dest.value, None)
         return ir
 
     def optimize_binop(self, ir):
@@ -121,10 +174,73 @@ class ConstOptimizer(SimplePythonOptimizer):
             ir.src2 = s2
             return ir
 
-        ir.dest.value = eval('s1 {} s2'.format(ir.op), {}, {'s1': s1.value, 's2': s2.value})
+        if ir.arr_depth > 0 and ir.op != '+':
+            return self.optimize_elementwise(ir, s1, s2)
+        elif ir.op in ('/', '%') and ir.typeinfo == 'int':
+            value = fold_int(ir.op, s1.value, s2.value)
+            if value is None:
+                ir.src1 = s1
+                ir.src2 = s2
+                return ir
+            ir.dest.value = value
+        else:
+            ir.dest.value = eval('s1 {} s2'.format(ir.op), {}, {'s1': s1.value, 's2': s2.value})
         ir.dest.op_type = 'array' if isinstance(ir.dest.value, list) else ir.typeinfo
         return None
 
+    def optimize_elementwise(self, ir, s1, s2):
+        """
+        Folds an element-wise operation on constant arrays of ints, or on
+        one and an int constant
+        """
+        left = int_values(s1) if s1.op_type == 'array' else s1.value
+        right = int_values(s2) if s2.op_type == 'array' else s2.value
+        if left is None or right is None:
+            ir.src1 = s1
+            ir.src2 = s2
+            return ir
+        if not isinstance(left, list):
+            left = [left] * len(right)
+        if not isinstance(right, list):
+            right = [right] * len(left)
+
+        values = [fold_int(ir.op, l, r) for l, r in zip(left, right)]
+        # Arrays of different sizes and divisions by zero fail at runtime
+        if len(left) != len(right) or None in values:
+            ir.src1 = s1
+            ir.src2 = s2
+            return ir
+        ir.dest.value = [Operand('int', value) for value in values]
+        ir.dest.op_type = 'array'
+        return None
+
+    def optimize_builtin(self, ir):
+        """
+        Folds the length of a constant array or string, and the reductions
+        of constant arrays of ints and of int constants
+        """
+        args = ir.src2 = [self.fold_operand(arg) for arg in ir.src2]
+        name = ir.src1
+        if name == 'len' and args[0].op_type == 'array':
+            value = len(args[0].value)
+        elif name == 'strlen' and args[0].op_type == 'str' and '\\' not in args[0].value:
+            # Escape sequences are only turned into characters by C
+            value = len(args[0].value)
+        elif name in ARRAY_REDUCTIONS and len(args) == 1:
+            values = int_values(args[0])
+            # min and max of an empty array fail at runtime
+            if values is None or (not values and name != 'sum'):
+                return ir
+            value = ARRAY_REDUCTIONS[name](values)
+        elif name in ARRAY_REDUCTIONS and all(arg.op_type == 'int' for arg in args):
+            value = ARRAY_REDUCTIONS[name](arg.value for arg in args)
+        else:
+            return ir
+
+        ir.dest.value = value
+        ir.dest.op_type = 'int'
+        return None
+
     def optimize_unaryOp(self, ir):
         expr = self.fold_operand(ir.src1)
 
@@ -166,6 +282,20 @@ class ConstOptimizer(SimplePythonOptimizer):
         ir.dest.op_type = result.op_type
         return None
 
+    def optimize_slice(self, ir):
+        """
+        Folds a slice of a constant array with constant bounds
+        """
+        array = self.fold_operand(ir.src1)
+        bounds = ir.src2 = [self.fold_operand(bound) for bound in ir.src2]
+        if array.op_type != 'array' or any(bound.op_type != 'int' for bound in bounds):
+            return ir
+
+        start, stop, _ = slice(bounds[0].value, bounds[1].value).indices(len(array.value))
+        ir.dest.value = array.value[start:stop]
+        ir.dest.op_type = 'array'
+        return None
+
     def optimize_if(self, ir, is_else):
         cond = self.fold_operand(ir.data)
         ir.data = cond
@@ -196,3 +326,691 @@ class ConstOptimizer(SimplePythonOptimizer):
             return None
 
         return ir
+
+
+class InductionLoop(object):
+    """
+    Describes a while loop of the form
+
+        <var> = <lo>
+        while <var> < <bound>:      (or <=)
+            ...
+            <var> = <var> + <step>
+            ...
+
+    where the induction variable is only updated by the single increment
+    at the top level of the loop body, or a for loop of the form
+
+        for <var> in range(<lo>, <bound>, <step>):
+            ...
+
+    counting up, whose variable can't be assigned in its body.
+    """
+
+    def __init__(self, var, lo, bound, inclusive, step, begin, cond, end, incr):
+        self.var = var
+        self.lo = lo
+        self.bound = bound
+        self.inclusive = inclusive
+        self.step = step
+        # Indices of BEGINLOOPCOND, WHILE, ENDWHILE and the increment (FOR,
+        # FOR, ENDFOR and ENDFOR for a for loop)
+        self.begin = begin
+        self.cond = cond
+        self.end = end
+        self.incr = incr
+
+    def trip_count(self):
+        """
+        Returns the number of iterations if it is known at compile time,
+        or None otherwise
+        """
+        if self.lo is None or self.bound.op_type != 'int':
+            return None
+        stop = self.bound.value + 1 if self.inclusive else self.bound.value
+        if self.lo >= stop:
+            return 0
+        return (stop - self.lo + self.step - 1) // self.step
+
+    def last_value(self):
+        """
+        Returns the last value the induction variable takes inside the body,
+        or None if it is not known at compile time
+        """
+        trips = self.trip_count()
+        if not trips:
+            return None
+        return self.lo + (trips - 1) * self.step
+
+
+def match_blocks(irlst):
+    """
+    Returns a dict mapping the index of every block opening control
+    (BEGINLOOPCOND, WHILE, FOR, IF, ELSE) to the index of its END control.
+    BEGINLOOPCOND is mapped to the ENDWHILE of its loop.
+    """
+    matches = {}
+    stack = []
+    for i, ir in enumerate(irlst):
+        if not isinstance(ir, IRControl):
+            continue
+        if ir.ctl in ('BEGINLOOPCOND', 'FOR', 'IF', 'ELSE'):
+            stack.append(i)
+        elif ir.ctl == 'WHILE':
+            stack.append(i)
+        elif ir.ctl == 'ENDWHILE':
+            cond = stack.pop()
+            begin = stack.pop()
+            matches[cond] = i
+            matches[begin] = i
+        elif ir.ctl in ('ENDFOR', 'ENDIF', 'ENDELSE'):
+            matches[stack.pop()] = i
+    return matches
+
+
+def assigned_names(irlst, start, end):
+    """
+    Returns the set of variable names assigned in irlst[start:end]
+    """
+    names = set()
+    for ir in irlst[start:end]:
+        if isinstance(ir, TAC) and ir.op in ('DECL', 'ASSIGN') and ir.dest is not None:
+            names.add(ir.dest.value)
+    return names
+
+
+def find_induction_loops(irlst):
+    """
+    Scans a list of IR lines and returns a dict mapping the index of every
+    BEGINLOOPCOND that starts a simple counted loop, and of every FOR
+    counting up, to its InductionLoop
+    """
+    matches = match_blocks(irlst)
+    loops = {}
+
+    # Constant values of int variables, valid at the current point
+    known = {}
+    # Names assigned in each of the currently open if/else blocks
+    block_assigns = []
+
+    for i, ir in enumerate(irlst):
+        if isinstance(ir, IRControl):
+            if ir.ctl == 'FUNC' or ir.ctl == 'ENDFUNC':
+                known = {}
+            elif ir.ctl in ('IF', 'ELSE', 'WHILE'):
+                block_assigns.append(set())
+            elif ir.ctl == 'FOR':
+                end = matches[i]
+                loop = for_induction_loop(ir.data, i, end, known)
+                if loop is not None:
+                    loops[i] = loop
+                # The loop variable shadows any variable with the same name
+                names = assigned_names(irlst, i, end) | set([ir.data[0].value])
+                for name in names:
+                    known.pop(name, None)
+                block_assigns.append(set())
+            elif ir.ctl in ('ENDIF', 'ENDELSE', 'ENDWHILE', 'ENDFOR'):
+                # The block may not have run, so forget what it assigned
+                names = block_assigns.pop()
+                for name in names:
+                    known.pop(name, None)
+                if block_assigns:
+                    block_assigns[-1].update(names)
+            elif ir.ctl == 'BEGINLOOPCOND':
+                end = matches[i]
+                loop = match_induction_loop(irlst, i, end, known)
+                if loop is not None:
+                    loops[i] = loop
+                # Anything assigned in the loop changes between iterations
+                for name in assigned_names(irlst, i, end):
+                    known.pop(name, None)
+        elif ir.op in ('DECL', 'ASSIGN') and ir.dest is not None:
+            if ir.src1.op_type == 'int':
+                known[ir.dest.value] = ir.src1.value
+            else:
+                known.pop(ir.dest.value, None)
+            if block_assigns:
+                block_assigns[-1].add(ir.dest.value)
+
+    return loops
+
+
+def for_induction_loop(data, begin, end, known):
+    """
+    Returns an InductionLoop for the FOR at index 'begin', with the given
+    data, whose ENDFOR is at index 'end', if it counts up
+    """
+    var, start, bound, step, reductions = data
+    if step < 1 or bound.op_type not in ('int', 'id'):
+        return None
+    # The bounds are only computed once, when the loop starts
+    if bound.op_type == 'id' and bound.value in known:
+        bound = Operand('int', known[bound.value])
+    if start.op_type == 'int':
+        lo = start.value
+    elif start.op_type == 'id':
+        lo = known.get(start.value)
+    else:
+        lo = None
+    return InductionLoop(var.value, lo, bound, False, step, begin, begin, end, end)
+
+
+def match_induction_loop(irlst, begin, end, known):
+    """
+    Returns an InductionLoop if the loop between the BEGINLOOPCOND at
+    index 'begin' and the ENDWHILE at index 'end' is a simple counted loop
+    """
+    cond = None
+    for i in range(begin + 1, end):
+        ir = irlst[i]
+        if isinstance(ir, IRControl) and ir.ctl == 'WHILE':
+            cond = i
+            break
+    # The condition must be a single comparison of the variable to the bound
+    if cond is None or cond != begin + 2:
+        return None
+    test = irlst[begin + 1]
+    if not isinstance(test, TAC) or test.op not in ('<', '<=') or test.dest is not irlst[cond].data:
+        return None
+    if test.src1.op_type != 'id' or test.src2.op_type not in ('int', 'id'):
+        return None
+
+    var = test.src1.value
+    bound = test.src2
+    assigned = assigned_names(irlst, begin, end)
+    if bound.op_type == 'id' and bound.value in assigned:
+        return None
+
+    # Find the only update of the variable, which has to be an increment
+    # at the top level of the body
+    incr = None
+    depth = 0
+    for i in range(cond + 1, end):
+        ir = irlst[i]
+        if isinstance(ir, IRControl):
+            if ir.ctl in ('IF', 'ELSE', 'WHILE', 'FOR'):
+                depth += 1
+            elif ir.ctl in ('ENDIF', 'ENDELSE', 'ENDWHILE', 'ENDFOR'):
+                depth -= 1
+            continue
+        if ir.op not in ('DECL', 'ASSIGN') or ir.dest is None or ir.dest.value != var:
+            continue
+        if incr is not None or depth != 0:
+            return None
+        incr = i
+
+    if incr is None:
+        return None
+    update = irlst[incr - 1]
+    if (not isinstance(update, TAC) or update.op != '+' or update.dest is not irlst[incr].src1 or
+            update.src1.op_type != 'id' or update.src1.value != var or
+            update.src2.op_type != 'int' or update.src2.value < 1):
+        return None
+
+    return InductionLoop(var, known.get(var), bound, test.op == '<=', update.src2.value,
+                         begin, cond, end, incr)
+
+
+class BoundsCheckOptimizer(SimplePythonOptimizer):
+    """
+    Turns every array access whose index can't be proven to be in range
+    into a CHECKED_ARRAY_IDX. Accesses indexed by the induction variable
+    of a counted while or for loop are either proven in range, or get a
+    single CHECKBOUNDS in front of the loop instead of a check per
+    iteration.
+    """
+
+    def optimize(self):
+        irlst = [ir for ir in self.irlst if ir is not None]
+        lengths = self.array_lengths(irlst)
+        loops = find_induction_loops(irlst)
+
+        # Loops enclosing each line, innermost last
+        enclosing = []
+        open_loops = []
+        for i, ir in enumerate(irlst):
+            while open_loops and open_loops[-1].end < i:
+                open_loops.pop()
+            if i in loops:
+                open_loops.append(loops[i])
+            enclosing.append(list(open_loops))
+
+        hoisted = {}
+        func = None
+        for i, ir in enumerate(irlst):
+            if isinstance(ir, IRControl) and ir.ctl == 'FUNC':
+                func = ir.data[0]
+            if not isinstance(ir, TAC) or ir.op != 'ARRAY_IDX':
+                continue
+
+            if ir.src1.op_type == 'array':
+                # A row of a constant nested array
+                length = len(ir.src1.value)
+            else:
+                length = lengths.get((func, ir.src1.value))
+            idx = ir.src2
+            if idx.op_type == 'int':
+                if length is not None and 0 <= idx.value < length:
+                    continue
+            elif idx.op_type == 'id':
+                loop = self.induction_loop_for(idx.value, i, enclosing[i])
+                if loop is not None and self.check_loop_access(loop, ir.src1, length, irlst, i, hoisted):
+                    continue
+
+            ir.op = 'CHECKED_ARRAY_IDX'
+
+        # Insert the hoisted checks in front of their loops
+        result = []
+        for i, ir in enumerate(irlst):
+            for array in hoisted.get(i, []):
+                loop = loops[i]
+                result.append(IRControl('CHECKBOUNDS', (array, loop.lo, loop.bound, '<=' if loop.inclusive else '<')))
+            result.append(ir)
+        self.irlst[:] = result
+
+    def array_lengths(self, irlst):
+        """
+        Returns a dict mapping (function name, variable name) to the
+        statically known length of each array variable. Variables declared
+        with different lengths in the same function are left out.
+        """
+        result = {}
+        lengths = {}
+        conflicts = set()
+        temp_lengths = {}
+
+        def length_of(operand):
+            if operand.op_type == 'array':
+                return len(operand.value)
+            elif operand.op_type == 'expr':
+                return temp_lengths.get(operand)
+            elif operand.op_type == 'id' and operand.value not in conflicts:
+                return lengths.get(operand.value)
+            return None
+
+        for ir in irlst:
+            if isinstance(ir, IRControl):
+                if ir.ctl == 'ENDFUNC':
+                    for name, length in lengths.items():
+                        result[(ir.data, name)] = length
+                    lengths = {}
+                    conflicts = set()
+                    temp_lengths = {}
+                continue
+            if ir.arr_depth == 0:
+                continue
+            if ir.op == '+':
+                len1 = length_of(ir.src1)
+                len2 = length_of(ir.src2)
+                if len1 is not None and len2 is not None:
+                    temp_lengths[ir.dest] = len1 + len2
+            elif ir.op in self.binOps:
+                # An element-wise operation keeps the length of its arrays,
+                # which fails at runtime unless they have the same length
+                lens = set(length_of(src) for src in (ir.src1, ir.src2)) - {None}
+                if len(lens) == 1:
+                    temp_lengths[ir.dest] = lens.pop()
+            elif ir.op == 'SLICE':
+                length = length_of(ir.src1)
+                if length is not None and all(bound.op_type == 'int' for bound in ir.src2):
+                    start, stop, _ = slice(ir.src2[0].value, ir.src2[1].value).indices(length)
+                    temp_lengths[ir.dest] = max(stop - start, 0)
+            elif ir.op in ('DECL', 'ASSIGN') and ir.dest is not None:
+                name = ir.dest.value
+                length = length_of(ir.src1)
+                if name in conflicts:
+                    continue
+                if length is None or lengths.get(name, length) != length:
+                    conflicts.add(name)
+                    lengths.pop(name, None)
+                else:
+                    lengths[name] = length
+
+        return result
+
+    def induction_loop_for(self, var, i, loops):
+        """
+        Returns the innermost loop enclosing line i whose induction variable
+        is var, if line i is in its body before the increment
+        """
+        for loop in reversed(loops):
+            if loop.var == var:
+                if loop.cond < i < loop.incr:
+                    return loop
+                return None
+        return None
+
+    def check_loop_access(self, loop, array, length, irlst, i, hoisted):
+        """
+        Returns True if the access to 'array' on line i, indexed by the
+        induction variable of 'loop', doesn't need a check on every
+        iteration, either because it's proven in range or because the check
+        has been hoisted
+        """
+        if loop.lo is None or loop.lo < 0:
+            return False
+
+        last = loop.last_value()
+        if loop.trip_count() == 0 or (last is not None and length is not None and last < length):
+            return True
+
+        # The check can only move in front of the loop if the array is
+        # already there, and the index reaches every value up to the bound.
+        # A row of a nested array is a temporary, computed in the loop.
+        if loop.step != 1 or array.op_type != 'id' or array.value in assigned_names(irlst, loop.begin, loop.end):
+            return False
+        if not self.runs_every_iteration(loop, i, irlst):
+            return False
+        arrays = hoisted.setdefault(loop.begin, [])
+        if all(a.value != array.value for a in arrays):
+            arrays.append(array)
+        return True
+
+    def runs_every_iteration(self, loop, i, irlst):
+        """
+        Returns whether line i runs on every iteration of the loop, and the
+        loop runs up to its bound: the line isn't in a block nested in the
+        body, and nothing in the body leaves the loop early
+        """
+        depth = 0
+        for j in range(loop.cond + 1, loop.end):
+            ir = irlst[j]
+            if not isinstance(ir, IRControl):
+                continue
+            if ir.ctl in ('RET', 'BREAK', 'CONTINUE'):
+                return False
+            if j < i:
+                if ir.ctl in ('IF', 'ELSE', 'WHILE', 'FOR'):
+                    depth += 1
+                elif ir.ctl in ('ENDIF', 'ENDELSE', 'ENDWHILE', 'ENDFOR'):
+                    depth -= 1
+        return depth == 0
+
+
+class LoopUnroller(SimplePythonOptimizer):
+    """
+    Unrolls the counted loops whose trip count is known at compile time.
+    A loop whose body fits 'budget' lines of IR once repeated for every
+    iteration is replaced by the copies of its body, so that constants
+    propagate through it. A larger loop repeats its body 'factor' times
+    per iteration, followed by the iterations left over. Inner loops are
+    unrolled first.
+
+    Each copy gets its own temporaries, since the other passes update them
+    in place, and its own scope. The copies of the body of a for loop see
+    its variable as a constant, or as an offset from the variable of the
+    unrolled loop.
+    """
+
+    def __init__(self, irlst, budget=UNROLL_BUDGET, factor=UNROLL_FACTOR, bounds_check=False):
+        super().__init__(irlst)
+        self.budget = budget
+        self.factor = factor
+        # The bounds checks of a loop are hoisted by following its induction
+        # variable, which unrolling it by a factor would lose
+        self.bounds_check = bounds_check
+        self.temps = 0
+
+    def optimize(self):
+        self.irlst[:] = self.unroll([ir for ir in self.irlst if ir is not None])
+
+    def unroll(self, irlst):
+        loops = find_induction_loops(irlst)
+        result = []
+        i = 0
+        while i < len(irlst):
+            loop = loops.get(i)
+            if loop is None:
+                result.append(irlst[i])
+                i += 1
+                continue
+            body = self.unroll(irlst[loop.cond + 1:loop.end])
+            result.extend(self.unroll_loop(irlst, loop, body))
+            i = loop.end + 1
+        return result
+
+    def unroll_loop(self, irlst, loop, body):
+        """
+        Returns the lines replacing the loop, whose body is 'body' once its
+        own loops are unrolled
+        """
+        begin = irlst[loop.begin]
+        trips = loop.trip_count()
+        if trips is None:
+            return irlst[loop.begin:loop.cond + 1] + body + [irlst[loop.end]]
+
+        is_for = begin.ctl == 'FOR'
+        result = []
+        if trips * len(body) <= self.budget:
+            for n in range(trips):
+                result.extend(self.copy_body(body, loop, n if is_for else None))
+            return result
+
+        factor = self.factor
+        if (factor < 2 or trips < 2 * factor or factor * len(body) > self.budget or
+                (self.bounds_check and any(isinstance(ir, TAC) and ir.op == 'ARRAY_IDX' for ir in body))):
+            return irlst[loop.begin:loop.cond + 1] + body + [irlst[loop.end]]
+
+        # The unrolled loop stops before the iterations left over
+        main_trips = trips // factor * factor
+        stop = Operand('int', loop.lo + main_trips * loop.step)
+        if is_for:
+            var, start, end, step, reductions = begin.data
+            result.append(IRControl('FOR', (var, start, stop, step * factor, reductions)))
+            for k in range(factor):
+                result.extend(self.copy_body(body, loop, None, k))
+            result.append(irlst[loop.end])
+        else:
+            test = irlst[loop.begin + 1]
+            result.append(begin)
+            result.append(TAC('<', test.typeinfo, test.dest, test.src1, stop))
+            result.append(irlst[loop.cond])
+            for k in range(factor):
+                result.extend(self.copy_body(body, loop, None))
+            result.append(irlst[loop.end])
+
+        for n in range(main_trips, trips):
+            result.extend(self.copy_body(body, loop, n if is_for else None))
+        return result
+
+    def copy_body(self, body, loop, n, offset=0):
+        """
+        Returns a copy of the body of the loop for one iteration. In the
+        body of a for loop, the variable is replaced by its value in the
+        n-th iteration, if n is given, or by its value plus 'offset'
+        iterations.
+        """
+        value = None
+        result = []
+        if n is not None:
+            value = Operand('int', loop.lo + n * loop.step)
+        elif offset:
+            value = self.new_temp()
+            result.append(TAC('+', 'int', value, Operand('id', loop.var), Operand('int', offset * loop.step)))
+
+        temps = {}
+        # Whether each of the for loops open in the body redeclares the
+        # variable being replaced
+        shadowed = []
+
+        def copy(operand):
+            if isinstance(operand, (list, tuple)):
+                return type(operand)(copy(op) for op in operand)
+            elif not isinstance(operand, Operand):
+                return operand
+            elif operand.op_type == 'expr':
+                if id(operand) not in temps:
+                    temps[id(operand)] = Operand('expr', operand.value)
+                return temps[id(operand)]
+            elif operand.op_type == 'array':
+                return Operand('array', copy(operand.value))
+            elif (value is not None and operand.op_type == 'id' and operand.value == loop.var and
+                  not any(shadowed)):
+                return value
+            return operand
+
+        for ir in body:
+            if isinstance(ir, IRControl):
+                result.append(IRControl(ir.ctl, copy(ir.data)))
+                if ir.ctl == 'FOR':
+                    shadowed.append(ir.data[0].value == loop.var)
+                elif ir.ctl == 'ENDFOR':
+                    shadowed.pop()
+            else:
+                result.append(TAC(ir.op, ir.typeinfo, copy(ir.dest), copy(ir.src1), copy(ir.src2), ir.arr_depth))
+
+        # The C variables declared by the body (its variables, and those the
+        # emitter declares for temporaries, such as the lengths of strings
+        # and the buffers of array literals) would be redeclared by the next
+        # copy
+        return [IRControl('BLOCK')] + result + [IRControl('ENDBLOCK')]
+
+    def new_temp(self):
+        self.temps += 1
+        return Operand('expr', '_u%d' % self.temps)
+
+
+class TailCallOptimizer(SimplePythonOptimizer):
+    """
+    Turns self-recursive functions into loops. The body of the function is
+    wrapped in an infinite WHILE loop, and a return of a call to the
+    function itself becomes an update of the parameters followed by a
+    CONTINUE. Linear recursion of the form 'return x + f(...)' or
+    'return x * f(...)' on ints is handled by accumulating x into an extra
+    variable, which is then combined with every other returned value.
+    """
+
+    def __init__(self, irlst):
+        super().__init__(irlst)
+        self.identities = {'+': 0, '*': 1}
+        self.sites = 0
+
+    def optimize(self):
+        irlst = [ir for ir in self.irlst if ir is not None]
+        result = []
+        start = None
+        for i, ir in enumerate(irlst):
+            if isinstance(ir, IRControl) and ir.ctl == 'FUNC':
+                start = i
+                # Numbered per function, so that a function is optimized
+                # the same way whether or not it's compiled on its own
+                self.sites = 0
+            elif isinstance(ir, IRControl) and ir.ctl == 'ENDFUNC':
+                result.extend(self.optimize_func(irlst[start:i + 1]))
+                start = None
+            elif start is None:
+                # Lines outside of functions, such as IMPORTs
+                result.append(ir)
+        self.irlst[:] = result
+
+    def find_tail_calls(self, func):
+        """
+        Returns a dict mapping the index of each RET that can become a jump
+        back to the start of the function to the op accumulating its result,
+        or None if the call's result is returned as is
+        """
+        name = func[0].data[0]
+        sites = {}
+        loop_depth = 0
+        for i, ir in enumerate(func):
+            if not isinstance(ir, IRControl):
+                continue
+            if ir.ctl in ('WHILE', 'FOR'):
+                loop_depth += 1
+            elif ir.ctl in ('ENDWHILE', 'ENDFOR'):
+                loop_depth -= 1
+            elif ir.ctl == 'RET' and loop_depth == 0 and ir.data.op_type == 'expr':
+                prev = func[i - 1]
+                if self.is_self_call(prev, name) and prev.dest is ir.data:
+                    sites[i] = None
+                elif (isinstance(prev, TAC) and prev.op in self.identities and prev.typeinfo == 'int' and
+                      prev.arr_depth == 0 and prev.dest is ir.data and self.is_self_call(func[i - 2], name)):
+                    call = func[i - 2].dest
+                    if (prev.src1 is call) != (prev.src2 is call):
+                        sites[i] = prev.op
+        return sites
+
+    def is_self_call(self, ir, name):
+        return isinstance(ir, TAC) and ir.op == 'CALL' and ir.src1 == name
+
+    def optimize_func(self, func):
+        sites = self.find_tail_calls(func)
+        ops = set(op for op in sites.values() if op is not None)
+        if not sites or len(ops) > 1:
+            return func
+
+        name, ret_type, params = func[0].data
+        acc_op = ops.pop() if ops else None
+        acc = Operand('id', '_acc')
+
+        result = [func[0]]
+        if acc_op is not None:
+            result.append(TAC('DECL', ret_type, acc, Operand(ret_type, self.identities[acc_op])))
+        loop_cond = Operand('bool', True)
+        result.append(IRControl('BEGINLOOPCOND'))
+        result.append(IRControl('WHILE', loop_cond))
+
+        for i in range(1, len(func) - 1):
+            ir = func[i]
+            if i in sites:
+                # Drop the call (and the op using its result) added just before
+                if sites[i] is None:
+                    call = result.pop()
+                else:
+                    binop = result.pop()
+                    call = result.pop()
+                    other = binop.src1 if binop.src2 is call.dest else binop.src2
+                    result.append(TAC('ASSIGN', 'int', acc, self.accumulate(result, acc_op, acc, other)))
+                self.jump_to_start(result, params, call.src2)
+            elif acc_op is not None and isinstance(ir, IRControl) and ir.ctl == 'RET':
+                result.append(IRControl('RET', self.accumulate(result, acc_op, acc, ir.data)))
+            else:
+                result.append(ir)
+
+        # Falling off the end of the body leaves the function
+        last = result[-1]
+        if not isinstance(last, IRControl) or last.ctl not in ('RET', 'CONTINUE'):
+            result.append(IRControl('BREAK'))
+        result.append(IRControl('ENDWHILE', loop_cond))
+        result.append(func[-1])
+        return result
+
+    def accumulate(self, result, op, acc, value):
+        """
+        Adds the computation of 'acc <op> value' to result and returns the
+        temporary holding it
+        """
+        total = Operand('expr', '_acc%d' % len(result))
+        result.append(TAC(op, 'int', total, acc, value))
+        return total
+
+    def jump_to_start(self, result, params, args):
+        """
+        Assigns the call arguments to the parameters and jumps back to the
+        start of the function. The arguments are saved first, since they may
+        depend on the parameters being reassigned.
+        """
+        self.sites += 1
+        saved = []
+        for (param, type), arg in zip(params, args):
+            # Parameters passed along unchanged don't need to be updated
+            if arg.op_type == 'id' and arg.value == param:
+                continue
+            copy = Operand('id', '_tc%d_%s' % (self.sites, param))
+            result.append(TAC('DECL', type, copy, arg))
+            saved.append((param, type, copy))
+        for param, type, copy in saved:
+            result.append(TAC('ASSIGN', type, Operand('id', param), copy))
+        result.append(IRControl('CONTINUE'))
+
+
+def optimize_ir(irlst, optimize=False, bounds_check=False, unroll_budget=UNROLL_BUDGET, unroll_factor=UNROLL_FACTOR):
+    """
+    Runs the passes selected by the driver's options over the IR, in order
+    """
+    if optimize:
+        LoopUnroller(irlst, unroll_budget, unroll_factor, bounds_check).optimize()
+        ConstOptimizer(irlst).optimize()
+        TailCallOptimizer(irlst).optimize()
+    if bounds_check:
+        BoundsCheckOptimizer(irlst).optimize()
@@ -2,12 +2,38 @@
 
 import argparse
 from ply import yacc
-from SimplePythonLexer import SimplePythonLexer
+from ply.lex import LexToken
+from SimplePythonLexer import SimplePythonLexer, SCANNED_TOKENS
 import SimplePythonAST as ast
+from SimplePythonDiagnostics import Diagnostic, SourceMap, make_span, span_start, SPAN_SHIFT, SPAN_MASK
 
 # Get the token map from the lexer. This is required.
 from SimplePythonLexer import tokens
 
+def describe_token(tok):
+    """
+    Describes an unexpected token in a syntax error message
+    """
+    if tok.type == 'NEWLINE':
+        return "end of line"
+    elif tok.type == 'INDENT':
+        return "indent"
+    elif tok.type == 'DEDENT':
+        return "dedent"
+    elif tok.type == 'STRINGLIT':
+        return "string " + repr(tok.value)
+    return "'" + str(tok.value) + "'"
+
+def token_end(tok):
+    """
+    Returns the offset just past a token
+    """
+    if tok.type in SCANNED_TOKENS:
+        return tok.endlexpos
+    elif tok.type in ('INDENT', 'DEDENT'):
+        return tok.lexpos
+    return tok.lexpos + len(tok.value)
+
 class SimplePythonParser:
     """
     SimplePythonParser follows similar language defined in the grammar.txt file on our repository
@@ -32,14 +58,51 @@ class SimplePythonParser:
 
     def p_program(self, p):
         '''
-        program : main_func_decl
-                | func_decl_list main_func_decl
+        program : imports_or_empty main_func_decl
+                | imports_or_empty func_decl_list main_func_decl
+                | imports_or_empty func_decl_list
+        '''
+        # A file without main is a module, which other files import from
+        span = make_span(0, len(self.data))
+        if len(p) == 3 and isinstance(p[2], list):
+            p[0] = ast.Program(None, p[2], span, p[1])
+        elif len(p) == 3:
+            p[0] = ast.Program(p[2], [], span, p[1])
+        else:
+            p[0] = ast.Program(p[3], p[2], span, p[1])
+
+    ################################
+    ## Imports
+    ################################
+
+    def p_imports_or_empty(self, p):
+        '''
+        imports_or_empty : empty
+                         | imports_or_empty import_stmt
         '''
         if len(p) == 2:
-            p[0] = ast.Program(p[1], [])
+            p[0] = []
+        elif p[2] is None:
+            p[0] = p[1]
         else:
-            p[0] = ast.Program(p[2], p[1])
-        
+            p[0] = p[1] + [p[2]]
+
+    def p_import_statement(self, p):
+        '''
+        import_stmt : FROM ID IMPORT import_names NEWLINE
+        '''
+        p[0] = ast.Import(p[2], p[4], self.span(p, 1, 3))
+
+    def p_import_names(self, p):
+        '''
+        import_names : ID
+                     | import_names COMMA ID
+        '''
+        if len(p) == 2:
+            p[0] = [p[1]]
+        else:
+            p[0] = p[1] + [p[3]]
+
     ################################
     ## Main Function
     ################################
@@ -49,7 +112,7 @@ class SimplePythonParser:
         main_func_decl : DEF MAIN LPAREN RPAREN COLON NEWLINE block
         '''
         int_type = ast.Type("int")
-        p[0] = ast.MethodDecl("main", int_type, ast.ParamList([]), p[7])
+        p[0] = ast.MethodDecl("main", int_type, ast.ParamList([], self.span(p, 3, 4)), p[7], self.span(p, 1, 7))
 
     ################################
     ## Function Declarations
@@ -60,16 +123,26 @@ class SimplePythonParser:
         func_decl_list : func_decl
                        | func_decl_list func_decl
         '''
+        # Declarations that failed to parse are left out
         if len(p) == 2:
-            p[0] = [p[1]]
+            p[0] = [p[1]] if p[1] is not None else []
         else:
-            p[0] = p[1] + [p[2]]
+            p[0] = p[1] + [p[2]] if p[2] is not None else p[1]
 
     def p_func_decl(self, p):
         '''
         func_decl : DEF ID method_param ARROW type COLON NEWLINE block
         '''
-        p[0] = ast.MethodDecl(p[2], p[5], p[3], p[8])
+        p[0] = ast.MethodDecl(p[2], p[5], p[3], p[8], self.span(p, 1, 8))
+
+    def p_func_decl_error(self, p):
+        '''
+        func_decl : error NEWLINE
+                  | error NEWLINE block
+        '''
+        # Skip to the end of a malformed line at the top level, along with
+        # the block under it
+        p[0] = None
 
     ################################
     ## Formals / Parameters
@@ -79,7 +152,7 @@ class SimplePythonParser:
         '''
         method_param : LPAREN formals_or_empty RPAREN
         '''
-        p[0] = ast.ParamList(p[2])
+        p[0] = ast.ParamList(p[2], self.span(p, 1, 3))
 
     def p_formals_or_empty(self, p):
         '''
@@ -105,7 +178,7 @@ class SimplePythonParser:
         '''
         formal : ID COLON type
         '''
-        p[0] = ast.Formal(p[1], p[3])
+        p[0] = ast.Formal(p[1], p[3], self.span(p, 1, 1))
 
     ################################
     ## Statements
@@ -114,8 +187,11 @@ class SimplePythonParser:
     def p_block(self, p):
         '''
         block : INDENT stmts_or_empty DEDENT
+              | INDENT stmts_or_empty error DEDENT
         '''
-        p[0] = ast.StmtList(p[2])
+        # The indentation tokens sit at the end of the lines before and at the
+        # end of the block
+        p[0] = ast.StmtList(p[2], make_span(p.slice[1].lexpos, p.slice[-1].lexpos))
 
     def p_statements_or_empty(self, p):
         '''
@@ -124,6 +200,8 @@ class SimplePythonParser:
         '''
         if len(p) == 2:
             p[0] = []
+        elif p[2] is None:
+            p[0] = p[1]
         else:
             p[0] = p[1] + [p[2]]
 
@@ -134,6 +212,15 @@ class SimplePythonParser:
         '''
         p[0] = p[1]
 
+    def p_statement_error(self, p):
+        '''
+        statement : error NEWLINE
+                  | error NEWLINE block
+        '''
+        # Panic mode: drop everything up to the end of the line (and the
+        # block under it, if the line was the header of a compound statement)
+        p[0] = None
+
     def p_simple_statement(self, p):
         '''
         simple_stmt : assign_stmt
@@ -146,13 +233,13 @@ class SimplePythonParser:
         '''
         simple_stmt : expr
         '''
-        p[0] = ast.ExprStmt(p[1])
+        p[0] = ast.ExprStmt(p[1], p[1].coord)
 
     def p_assignment_statement(self, p):
         '''
         assign_stmt : ID EQ expr
         '''
-        p[0] = ast.AssignStmt(p[1], p[3])
+        p[0] = ast.AssignStmt(p[1], p[3], self.span(p, 1, 3))
         
     def p_array(self, p):
         '''
@@ -160,35 +247,39 @@ class SimplePythonParser:
              | LBRACK array_values RBRACK
         '''
         if len(p) == 3:
-            p[0] = ast.Array([])
+            p[0] = ast.Array([], self.span(p, 1, 2))
         else:
-            p[0] = ast.Array(p[2])
+            p[0] = ast.Array(p[2], self.span(p, 1, 3))
             
     def p_array_values(self, p):
         '''
-        array_values : expr COMMA array_values
+        array_values : array_values COMMA expr
                      | expr
         '''
+        # Left recursive, so that PLY reduces each value as it's read and the
+        # list is extended in place, rather than copied once per value
         if len(p) == 2:
             p[0] = [p[1]]
         else:
-            p[0] = [p[1]] + p[3]
+            p[0] = p[1]
+            p[0].append(p[3])
         
     def p_print_statement(self, p):
         '''
         print_stmt : PRINT LPAREN args_list RPAREN
         '''
-        p[0] = ast.PrintStmt(p[3])
+        p[0] = ast.PrintStmt(p[3], self.span(p, 1, 4))
         
     def p_function_call(self, p):
         '''
         fn_call : ID LPAREN args_list RPAREN 
                 | ID LPAREN RPAREN
         '''
+        call = ast.BuiltinCall if p[1] in ast.BUILTINS else ast.FunctionCall
         if len(p) == 4:
-            p[0] = ast.FunctionCall(p[1], [])
+            p[0] = call(p[1], [], self.span(p, 1, 3))
         else:
-            p[0] = ast.FunctionCall(p[1], p[3])
+            p[0] = call(p[1], p[3], self.span(p, 1, 4))
             
     def p_args_list(self, p):
         '''
@@ -205,6 +296,7 @@ class SimplePythonParser:
         compound_stmt : if_else_stmt
                       | if_stmt
                       | while_stmt
+                      | for_stmt
         '''
         p[0] = p[1]
 
@@ -212,25 +304,48 @@ class SimplePythonParser:
         '''
         if_else_stmt : IF expr COLON NEWLINE block ELSE COLON NEWLINE block
         '''
-        p[0] = ast.IfStmt(p[2], p[5], p[9])
+        p[0] = ast.IfStmt(p[2], p[5], p[9], self.span(p, 1, 9))
         
     def p_if_statement(self, p):
         '''
         if_stmt : IF expr COLON NEWLINE block
         '''
-        p[0] = ast.IfStmt(p[2], p[5], None)
+        p[0] = ast.IfStmt(p[2], p[5], None, self.span(p, 1, 5))
 
     def p_while_statement(self, p):
         '''
         while_stmt : WHILE expr COLON NEWLINE block
         '''
-        p[0] = ast.WhileStmt(p[2], p[5])
+        p[0] = ast.WhileStmt(p[2], p[5], self.span(p, 1, 5))
+
+    def p_for_statement(self, p):
+        '''
+        for_stmt : FOR ID IN RANGE LPAREN args_list RPAREN COLON NEWLINE block
+                 | PARALLEL FOR ID IN RANGE LPAREN args_list RPAREN COLON NEWLINE block
+        '''
+        # The iterations of a parallel loop are split between threads
+        parallel = len(p) == 12
+        first = 2 if parallel else 1
+
+        # range(end), range(start, end) or range(start, end, step)
+        args = p[first + 5]
+        if not 1 <= len(args) <= 3:
+            self.diagnostics.append(Diagnostic('syntax', "range expects 1 to 3 arguments, but it was given " +
+                                               str(len(args)), self.span(p, first + 3, first + 6)))
+            p[0] = None
+            return
+        if len(args) == 1:
+            args = [ast.Constant('int', 0)] + args
+        if len(args) == 2:
+            args = args + [ast.Constant('int', 1)]
+        p[0] = ast.ForRange(p[first + 1], args[0], args[1], args[2], p[first + 9], self.span(p, 1, first + 9),
+                            parallel)
 
     def p_return_statement(self, p):
         '''
         ret_stmt : RETURN expr
         '''
-        p[0] = ast.RetStmt(p[2])
+        p[0] = ast.RetStmt(p[2], self.span(p, 1, 2))
 
 
     ################################
@@ -253,7 +368,7 @@ class SimplePythonParser:
              | expr AND expr
              | expr OR expr
         '''
-        p[0] = ast.BinOp(p[2], p[1], p[3])
+        p[0] = ast.BinOp(p[2], p[1], p[3], self.span(p, 1, 3))
 
     def p_func_call_expr(self, p):
         '''
@@ -261,11 +376,36 @@ class SimplePythonParser:
         '''
         p[0] = p[1]
         
+    def p_array_indexing_expr(self, p):
+        '''
+        expr : array_indexing
+        '''
+        p[0] = p[1]
+
     def p_array_indexing(self, p):
         '''
-        expr : ID LBRACK expr RBRACK
+        array_indexing : ID LBRACK expr RBRACK
+                       | array_indexing LBRACK expr RBRACK
+        '''
+        # Each index of a nested array picks an element of the array
+        # picked by the indices (or slice) before it
+        array = p[1] if isinstance(p[1], ast.Node) else ast.Constant('id', p[1], self.span(p, 1, 1))
+        p[0] = ast.ArrayIndexing(array, p[3], self.span(p, 1, 4))
+
+    def p_array_slice(self, p):
+        '''
+        array_indexing : ID LBRACK slice_bound COLON slice_bound RBRACK
+                       | array_indexing LBRACK slice_bound COLON slice_bound RBRACK
+        '''
+        array = p[1] if isinstance(p[1], ast.Node) else ast.Constant('id', p[1], self.span(p, 1, 1))
+        p[0] = ast.ArraySlice(array, p[3], p[5], self.span(p, 1, 6))
+
+    def p_slice_bound(self, p):
+        '''
+        slice_bound : expr
+                    | empty
         '''
-        p[0] = ast.ArrayIndexing(ast.Constant('id', p[1]), p[3])
+        p[0] = p[1]
 
     def p_expr_group(self, p):
         '''
@@ -278,33 +418,33 @@ class SimplePythonParser:
         expr : MINUS expr %prec UNARY
              | NOT expr %prec UNARY
         '''
-        p[0] = ast.UnaryOp(p[1], p[2])
+        p[0] = ast.UnaryOp(p[1], p[2], self.span(p, 1, 2))
 
     def p_expr_number(self, p):
         '''
         expr : DECIMAL
         '''
-        p[0] = ast.Constant('int', p[1])
+        p[0] = ast.Constant('int', p[1], self.span(p, 1, 1))
 
     def p_expr_bool(self, p):
         '''
         expr : TRUE
              | FALSE
         '''
-        p[0] = ast.Constant('bool', p[1] == 'True')
+        p[0] = ast.Constant('bool', p[1] == 'True', self.span(p, 1, 1))
 
     def p_expr_id(self, p):
         '''
         expr : ID
         '''
-        p[0] = ast.Constant('id', p[1])
+        p[0] = ast.Constant('id', p[1], self.span(p, 1, 1))
 
 
     def p_expr_string(self, p):
         '''
         expr : STRINGLIT
         '''
-        p[0] = ast.Constant('str', p[1])
+        p[0] = ast.Constant('str', p[1], self.span(p, 1, 1))
 
     ################################
     ## Types
@@ -333,12 +473,39 @@ class SimplePythonParser:
     #
     #       optitem : item
     #               | empty
+    def span(self, p, first, last):
+        """
+        Returns the span from the start of the 'first' symbol of a production
+        to the end of its 'last' symbol. Tokens carry their offset, and the
+        nodes built for nonterminals carry their own span.
+        """
+        # This runs for every node, so the span helpers are inlined
+        syms = p.slice
+        sym = syms[first]
+        if sym.__class__ is LexToken:
+            start = sym.lexpos
+        else:
+            start = sym.value.coord & SPAN_MASK
+        sym = syms[last]
+        if sym.__class__ is LexToken:
+            end = sym.endlexpos if sym.type in SCANNED_TOKENS else sym.lexpos + len(sym.value)
+        else:
+            end = sym.value.coord >> SPAN_SHIFT
+        return start | (end << SPAN_SHIFT)
+
     def p_empty(self, p):
         'empty :'
         pass
 
     def p_error(self, p):
-        raise SyntaxError("Syntax error at token {}".format(p))
+        # Record the error and let the error productions resynchronize at
+        # the next NEWLINE or DEDENT, so the rest of the file is checked too
+        if p is None:
+            end = len(self.data)
+            self.diagnostics.append(Diagnostic('syntax', "Unexpected end of input", make_span(end, end)))
+        else:
+            self.diagnostics.append(Diagnostic('syntax', "Unexpected " + describe_token(p),
+                                               make_span(p.lexpos, token_end(p))))
 
     def build(self, **kwargs):
         self.tokens = tokens
@@ -348,7 +515,9 @@ class SimplePythonParser:
 
     def test(self, data):
         # self.lexer.test(data)
-        result = self.parser.parse(data)
+        result = self.parse(data)
+        for diagnostic in self.diagnostics:
+            print(diagnostic.format())
         visitor = ast.NodeVisitor()
         visitor.visit(result)
         return result
@@ -364,9 +533,21 @@ class SimplePythonParser:
 
     def parse(self, data):
         """
-        Returns the root (Program) node of the AST, after parsing the file
+        Returns the root (Program) node of the AST, after parsing the file.
+        The syntax errors found along the way are left in self.diagnostics;
+        if there are any, the tree is incomplete (or None).
         """
-        return self.parser.parse(data)
+        self.data = data
+        self.diagnostics = []
+        self.lexer.reset()
+        self.source_map = SourceMap(data)
+        root = self.parser.parse(data, lexer=self.lexer.lexer)
+        lex_errors = [Diagnostic('lexical', message, make_span(offset, offset + 1))
+                      for message, offset in self.lexer.errors]
+        self.diagnostics = sorted(lex_errors + self.diagnostics, key=lambda d: span_start(d.span))
+        for diagnostic in self.diagnostics:
+            diagnostic.locate(self.source_map)
+        return root
 
 if __name__ == "__main__":
 
@@ -2,50 +2,100 @@
 
 class ParseError(Exception): pass
 
+class ParseErrorList(ParseError):
+    """
+    All the errors found while checking a program, reported together
+    """
+
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
+
+    def __str__(self):
+        return '\n'.join(str(error) for error in self.errors)
+
+class Binding(object):
+    """
+    A declared variable, along with the depth of the scope declaring it
+    """
+
+    __slots__ = ('name', 'type', 'depth')
+
+    def __init__(self, name, type, depth):
+        self.name = name
+        self.type = type
+        self.depth = depth
+
 class SymbolTable(object):
     """
     Base symbol table class
+
+    All scopes share a single map from each name to the chain of its
+    bindings, innermost last, so lookups don't depend on the nesting depth.
+    Each scope keeps an undo log of the names it declared, which are
+    unbound again when the scope is popped.
     """
 
     def __init__(self):
-        self.scope_stack = [dict()]
+        self.bindings = dict()
+        self.undo_log = [[]]
 
     def push_scope(self):
-        self.scope_stack.append(dict())
+        self.undo_log.append([])
 
     def pop_scope(self):
-        assert len(self.scope_stack) > 1
-        self.scope_stack.pop()
+        assert len(self.undo_log) > 1
+        for name in self.undo_log.pop():
+            chain = self.bindings[name]
+            chain.pop()
+            if not chain:
+                del self.bindings[name]
 
     def declare_variable(self, name, type, line_number):
         """
-        Add a new variable.
+        Add a new variable and return its binding.
         Need to do duplicate variable declaration error checking.
         """
-        if name in self.scope_stack[-1]:
+        depth = len(self.undo_log)
+        chain = self.bindings.get(name)
+        if chain is None:
+            chain = self.bindings[name] = []
+        elif chain[-1].depth == depth:
             raise ParseError("Redeclaring variable named \"" + name + "\"", line_number)
-        self.scope_stack[-1][name] = type
+        binding = Binding(name, type, depth)
+        chain.append(binding)
+        self.undo_log[-1].append(name)
+        return binding
+
+    def lookup_binding(self, name):
+        """
+        Return the innermost binding of the variable named 'name', or None
+        if the variable is not declared in the scope.
+        """
+        chain = self.bindings.get(name)
+        return chain[-1] if chain else None
 
     def lookup_variable(self, name, line_number):
         """
-        Return the type of the variable named 'name', or throw
-        a ParseError if the variable is not declared in the scope.
+        Return the type of the variable named 'name', or None if the
+        variable is not declared in the scope.
         """
-        # You should traverse through the entire scope stack
-        for scope in reversed(self.scope_stack):
-            if name in scope:
-                return scope[name]
-        return None
+        chain = self.bindings.get(name)
+        return chain[-1].type if chain else None
 
 class FunctionSymbolTable(SymbolTable):
     """
-    The class for the symbol table for a function, which stores the interfaces of
-    its methods and class variables
+    The class for the symbol table for a function, which stores its variables
+    and looks up the functions it calls in the global symbol table
     """
 
-    def __init__(self, func_name):
+    def __init__(self, func_name, global_st):
         super().__init__()
         self.func_name = func_name
+        self.global_st = global_st
+
+    def lookup_func(self, func_name, line_number):
+        return self.global_st.lookup_func(func_name, line_number)
 
 class GlobalSymbolTable(SymbolTable):
     """
@@ -1,11 +1,103 @@
 #!/usr/bin/env python3
 
-from SimplePythonSymbolTable import SymbolTable, GlobalSymbolTable, FunctionSymbolTable, ParseError
+from concurrent.futures import ProcessPoolExecutor
+from SimplePythonSymbolTable import SymbolTable, GlobalSymbolTable, FunctionSymbolTable, ParseError, ParseErrorList
 import SimplePythonAST as ast
 import sys
 
 sys.tracebacklimit = 0
 
+# Programs with fewer methods than this are always checked serially, as
+# starting the worker processes would cost more than it saves
+PARALLEL_THRESHOLD = 64
+
+# Methods and global symbol table of the program checked by a worker process
+_worker_decls = None
+_worker_global_st = None
+
+def _init_worker(decls, funcs):
+    global _worker_decls, _worker_global_st
+    _worker_decls = decls
+    _worker_global_st = GlobalSymbolTable()
+    _worker_global_st.funcs = funcs
+
+def _check_method_worker(index):
+    """
+    Typecheck one method and send back the errors and the annotations the
+    type checker added to its nodes, rather than the whole typed subtree
+    """
+    decl = _worker_decls[index]
+    errors = TypeChecker().check_method(decl, _worker_global_st)
+    types = []
+    decls = []
+    # The bindings of a method are sent together, so the nodes sharing one
+    # still share it once copied back
+    bindings = []
+    for node in walk(decl):
+        types.append(getattr(node, 'type', None))
+        if isinstance(node, ast.AssignStmt):
+            decls.append(getattr(node, 'isDecl', None))
+        if isinstance(node, (ast.AssignStmt, ast.Constant)):
+            bindings.append(node.binding)
+    return errors, types, decls, bindings
+
+def walk(node):
+    """
+    Yields the nodes of a subtree in a fixed order
+    """
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        yield node
+        stack.extend(child for name, child in node.children())
+
+def literal_shape(node):
+    """
+    Returns the length of each dimension of a typechecked array literal,
+    or None if it isn't one, or if some of its rows aren't literals
+    """
+    if not isinstance(node, ast.Array):
+        return None
+    shape = (len(node.array_vals),)
+    if node.type.arr_depth > 1 and node.array_vals:
+        inner = literal_shape(node.array_vals[0])
+        if inner is None:
+            return None
+        shape += inner
+    return shape
+
+def reduction_operand(node):
+    """
+    Returns the use of the assigned variable in an assignment of the form
+    'x = x <op> <expr>', where <op> can reduce the values of a parallel
+    loop and <expr> doesn't use x, or None if it isn't one. The operator
+    is associative, so x can be anywhere in a chain of it, such as
+    'x = a + x + b'.
+    """
+    expr = node.expr
+    if not isinstance(expr, ast.BinOp) or expr.op not in ('+', '*', 'and', 'or'):
+        return None
+
+    def is_var(n):
+        return isinstance(n, ast.Constant) and n.const_type == 'id' and n.value == node.name
+
+    # The operands of the chain, which the parser nests to the left
+    operands = []
+    stack = [expr]
+    while stack:
+        n = stack.pop()
+        if isinstance(n, ast.BinOp) and n.op == expr.op:
+            stack.extend((n.right, n.left))
+        else:
+            operands.append(n)
+
+    uses = [operand for operand in operands if is_var(operand)]
+    if len(uses) != 1:
+        return None
+    if any(is_var(n) for operand in operands if operand is not uses[0] for n in walk(operand)):
+        return None
+    return uses[0]
+
 class TypeChecker(object):
     """
     Uses the same visitor pattern as ast.NodeVisitor, but modified to
@@ -35,8 +127,17 @@ class TypeChecker(object):
           (i.e., no method call, can only declare one method at a time, etc...)
     """
 
-    def __init__(self):
+    def __init__(self, jobs=1, imported=None):
         self.current_func = None
+        self.jobs = jobs
+        # Signatures (param types, return type) of the functions imported
+        # from other modules, by name
+        self.imported = imported or {}
+        # Errors found in the method being checked
+        self.errors = []
+        # Bindings of the variables of the enclosing for loops, which can't
+        # be assigned in their loop
+        self.loop_bindings = []
 
     def typecheck(self, node, st=None):
         method = 'check_' + node.__class__.__name__
@@ -44,31 +145,44 @@ class TypeChecker(object):
         return node.type
 
     def generic_typecheck(self, node, st=None):
-        if node is None:
-            return ast.Type('None')
-        else:
-            return ast.Type(''.join(self.typecheck(c, st).name for c_name, c in node.children()))
+        if node is not None:
+            for c_name, c in node.children():
+                self.typecheck(c, st)
+        return ast.NONE
 
     def eq_type(self, t1, t2):
         """
         Helper function to check if two given type node is that of the
-        same type. Precondition is that both t1 and t2 are that of class Type
+        same type. Precondition is that both t1 and t2 are that of class Type.
+        Types are interned, so this is an identity check. The error type
+        matches every type, as its error has already been reported.
         """
         if not isinstance(t1, ast.Type) or not isinstance(t2, ast.Type):
             raise ParseError("eq_type invoked on non-type objects")
-        return t1.name == t2.name
+        return t1 is t2 or t1 is ast.ERROR or t2 is ast.ERROR
 
     def check_AssignStmt(self, node, st):
-        var_type = st.lookup_variable(node.name, node.coord)
-        expr_type = self.typecheck(node.expr, st)
-
-        if var_type is None:
-            st.declare_variable(node.name, expr_type, node.coord)
+        binding = st.lookup_binding(node.name)
+        try:
+            expr_type = self.typecheck(node.expr, st)
+        except ParseError:
+            # Still declare the variable, so its uses aren't reported as well
+            if binding is None:
+                node.binding = st.declare_variable(node.name, ast.ERROR, node.coord)
+            raise
+
+        if binding is None:
+            node.binding = st.declare_variable(node.name, expr_type, node.coord)
             node.isDecl = True
-        elif not self.eq_type(var_type, expr_type):
-            raise ParseError("Variable \"" + node.name + "\" has the type",
-                             var_type.name, "but is being assigned the type",
-                             expr_type.name)
+            return expr_type
+
+        if any(binding is loop_binding for loop_binding in self.loop_bindings):
+            raise ParseError("The loop variable \"" + node.name + "\" can't be assigned in its loop", node.coord)
+        var_type = binding.type
+        node.binding = binding
+        if not self.eq_type(var_type, expr_type):
+            raise ParseError("Variable \"" + node.name + "\" has the type " + var_type.name +
+                             " but is being assigned the type " + expr_type.name, node.coord)
         else:
             node.isDecl = False
 
@@ -86,13 +200,15 @@ class TypeChecker(object):
 
         left_type = self.typecheck(node.left, st)
         right_type = self.typecheck(node.right, st)
-        if not self.eq_type(left_type, right_type):
+        if left_type is ast.ERROR or right_type is ast.ERROR:
+            return ast.ERROR
+        elif node.op in ['-', '*', '/', '%'] and (left_type.arr_depth > 0 or right_type.arr_depth > 0):
+            return self.check_elementwise(node, left_type, right_type)
+        elif not self.eq_type(left_type, right_type):
             raise ParseError("Left and right expressions are of different type", node.coord)
         elif node.op in ['-', '*', '/', '%'] and left_type.name != "int":
             raise ParseError(node.op + " is only valid for integer operands", node.coord)
         elif node.op == '+' and (left_type.arr_depth > 0 or right_type.arr_depth > 0) and left_type.arr_depth != right_type.arr_depth:
-            print(left_type.arr_depth)
-            print(right_type.arr_depth)
             raise ParseError(node.op + " is only valid for arrays of same depth and type", node.coord)
         elif node.op == '+' and (left_type.name != "int" and left_type.name != "str"):
             raise ParseError(node.op + " is only valid for integer operands or string operands", node.coord)
@@ -102,35 +218,56 @@ class TypeChecker(object):
             raise ParseError(node.op + " is only valid for boolean operands", node.coord)
 
         if node.op in ['-', '*', '/', '%']:
-            return ast.Type("int")
+            return ast.INT
         elif node.op == '+' and left_type.arr_depth > 0:
             return left_type
         elif node.op == '+' and left_type.name == 'int':
-            return ast.Type("int")
+            return ast.INT
         elif node.op == '+' and left_type.name == 'str':
-            return ast.Type("str")
+            return ast.STR
         elif node.op in ['!', '<', '<=', '>', '>=', '==', 'and', 'or']:
-            return ast.Type("bool")
+            return ast.BOOL
+
+    def check_elementwise(self, node, left_type, right_type):
+        """
+        - * / and % apply element by element to two arrays of ints, or to an
+        array of ints and an int, and give an array of ints
+        """
+        int_array = ast.INT.array_type()
+        if left_type not in (ast.INT, int_array) or right_type not in (ast.INT, int_array):
+            raise ParseError(node.op + " is only valid for integers and arrays of integers", node.coord)
+        return int_array
 
     def check_MethodDecl(self, node, st):
-        st.declare_func(node.name, ([param.type for param in node.params.params], node.ret_type), node.coord)
+        """
+        Typecheck the body of a method against the global symbol table 'st',
+        which already holds the signature of every method.
+        """
+        fst = FunctionSymbolTable(node.name, st)
 
         # Store the return type, so we can check against it when we encounter a return statement
         self.current_func = node.name
 
-        # We might want to find a cleaner way of separating parameters from other function scopes.
-        # Right now, we're already creating a scope for each StmtList, so we
-        # end up creating two scopes.
-        st.push_scope()
+        # The parameters and the top level of the body share a single scope
         # Go through the parameters
         if node.params is not None:
-            self.typecheck(node.params, st)
+            self.typecheck(node.params, fst)
         # Go through the method body and type check each statements
         if node.body is not None:
-            self.typecheck(node.body, st)
-        st.pop_scope()
+            node.body.type = self.check_StmtList(node.body, fst, new_scope=False)
 
-        return ast.Type('None')
+        return ast.NONE
+
+    def check_method(self, node, global_st):
+        """
+        Typecheck a method and return the list of errors found in it
+        """
+        self.errors = []
+        try:
+            self.typecheck(node, global_st)
+        except ParseError as e:
+            self.errors.append(e)
+        return self.errors
 
     def check_FunctionCall(self, node, st):
         """
@@ -139,9 +276,8 @@ class TypeChecker(object):
         """
         param_types, ret_type = st.lookup_func(node.name, node.coord)
         if len(param_types) != len(node.args_list):
-            raise ParseError('The function "' + node.name + '" was called with ',
-                             len(node.args_list), ' args, but it expected ',
-                             len(param_types), node.coord)
+            raise ParseError('The function "' + node.name + '" was called with ' + str(len(node.args_list)) +
+                             ' args, but it expected ' + str(len(param_types)), node.coord)
         for i in range(len(node.args_list)):
             arg_type = self.typecheck(node.args_list[i], st)
             if not self.eq_type(arg_type, param_types[i]):
@@ -150,18 +286,46 @@ class TypeChecker(object):
         return ret_type
 
 
+    def check_BuiltinCall(self, node, st):
+        """
+        len takes an array or a string, sum an array of ints, and min and
+        max either an array of ints or several ints. They all return an int.
+        """
+        arg_types = [self.typecheck(arg, st) for arg in node.args_list]
+        if ast.ERROR in arg_types:
+            return ast.INT
+
+        if node.name in ('min', 'max') and len(arg_types) > 1:
+            if any(arg_type is not ast.INT for arg_type in arg_types):
+                raise ParseError('The arguments of "' + node.name + '" must be integers, or a single array of integers',
+                                 node.coord)
+        elif len(arg_types) != 1:
+            raise ParseError('The function "' + node.name + '" was called with ' + str(len(arg_types)) +
+                             ' args, but it expected 1', node.coord)
+        elif node.name == 'len':
+            if arg_types[0].arr_depth == 0 and arg_types[0] is not ast.STR:
+                raise ParseError('The argument of "len" must be an array or a string', node.coord)
+        elif arg_types[0] is not ast.INT.array_type():
+            raise ParseError('The argument of "' + node.name + '" must be an array of integers', node.coord)
+
+        return ast.INT
+
     def check_Constant(self, node, st):
         """
         Returns the type of the constant. If the constant refers to
         some kind of id, then we need to find if the id has been declared.
         """
         if node.const_type == 'id':
-            res = st.lookup_variable(node.value, node.coord)
-            if res is None:
+            binding = st.lookup_binding(node.value)
+            if binding is None:
+                # Report each undefined name once per scope
+                node.binding = st.declare_variable(node.value, ast.ERROR, node.coord)
                 raise ParseError("Referencing undefined variable \"" + node.value + "\"", node.coord)
-            else:
-                return res
-        return ast.Type(node.const_type)
+            # Cache the binding, which the checks of parallel loops compare
+            # to find the uses of shared variables without resolving them again
+            node.binding = binding
+            return binding.type
+        return ast.Type.get(node.const_type)
 
     def check_DeclStmt(self, node, st):
         st.declare_variable(node.name, node.type, node.coord)
@@ -182,16 +346,20 @@ class TypeChecker(object):
         something you should consider for your project.
         """
 
-        cond_type = self.typecheck(node.cond, st)
-        if not self.eq_type(ast.Type('bool'), cond_type):
-            raise ParseError("If statement requires boolean as its condition", node.coord)
+        # An error in the condition doesn't stop the bodies from being checked
+        try:
+            cond_type = self.typecheck(node.cond, st)
+            if not self.eq_type(ast.BOOL, cond_type):
+                raise ParseError("If statement requires boolean as its condition", node.coord)
+        except ParseError as e:
+            self.errors.append(e)
 
         if node.true_body is not None:
             self.typecheck(node.true_body, st)
         if node.false_body is not None:
             self.typecheck(node.false_body, st)
 
-        return ast.Type('None')
+        return ast.NONE
 
     def check_ParamList(self, node, st):
         """
@@ -201,48 +369,108 @@ class TypeChecker(object):
         # "Formal" class, instead of declaring them as a variable here.
         for param in node.params:
             st.declare_variable(param.name, param.type, param.coord)
-        return ast.Type('None')
+        return ast.NONE
 
     def check_Program(self, node, st=None):
         """
         Generate global symbol table. Recursively typecheck its classes and
         add its class symbol table to itself.
         """
-        # Generate global symbol table
-        global_st = GlobalSymbolTable()
-
-        # Iterate through the declared functions, perform typecheck on them
-        # and add them to the global symbol table
-        for decl in node.func_decl:
-            self.typecheck(decl, global_st)
+        # First add the signatures of all the functions to the global
+        # symbol table, so they can be called regardless of their order
+        decls = node.methods()
+        global_st, errors = self.declare_functions(decls)
+
+        # The bodies only depend on the signatures, so they can be checked
+        # independently of each other
+        if self.jobs > 1 and len(decls) >= PARALLEL_THRESHOLD:
+            errors += self.check_methods_parallel(decls, global_st)
+        else:
+            for decl in decls:
+                errors += self.check_method(decl, global_st)
 
-        self.typecheck(node.main_func, global_st)
+        if len(errors) == 1:
+            raise errors[0]
+        elif errors:
+            raise ParseErrorList(errors)
 
         return global_st
 
+    def declare_functions(self, decls):
+        """
+        Returns the global symbol table holding the signatures of the
+        imported functions and of 'decls', along with the errors found
+        while declaring them
+        """
+        global_st = GlobalSymbolTable()
+        errors = []
+        for name, signature in self.imported.items():
+            global_st.declare_func(name, signature, None)
+        for decl in decls:
+            if decl.name in ast.BUILTINS:
+                # It's still declared, so that its body can be checked
+                errors.append(ParseError('"' + decl.name + '" is a builtin function, and can\'t be redeclared', decl.coord))
+            try:
+                global_st.declare_func(decl.name, ([param.type for param in decl.params.params], decl.ret_type),
+                                       decl.coord)
+            except ParseError as e:
+                errors.append(e)
+        return global_st, errors
+
+    def check_methods_parallel(self, decls, global_st):
+        """
+        Typecheck the methods in a pool of worker processes, and copy the
+        types and bindings they found back onto the nodes of the tree
+        """
+        chunksize = max(1, len(decls) // (self.jobs * 4))
+        errors = []
+        with ProcessPoolExecutor(self.jobs, initializer=_init_worker, initargs=(decls, global_st.funcs)) as pool:
+            results = pool.map(_check_method_worker, range(len(decls)), chunksize=chunksize)
+
+            for decl, (decl_errors, types, is_decls, bindings) in zip(decls, results):
+                errors += decl_errors
+                is_decls = iter(is_decls)
+                bindings = iter(bindings)
+                for n, t in zip(walk(decl), types):
+                    if t is not None:
+                        n.type = t
+                    if isinstance(n, ast.AssignStmt):
+                        n.isDecl = next(is_decls)
+                    if isinstance(n, (ast.AssignStmt, ast.Constant)):
+                        n.binding = next(bindings)
+        return errors
+
     def check_RetStmt(self, node, st):
         # Check if the type of the return statement matches the return type
         # of the method
         expr_type = self.typecheck(node.expr, st)
-        curr_ret_type = st.lookup_func(self.current_func, node.coord)
+        curr_ret_type = st.lookup_func(st.func_name, node.coord)
         if not self.eq_type(expr_type, curr_ret_type[1]):
             raise ParseError("Mismatch of return type within method \"" +
-                             self.current_func + "\"", node.coord)
+                             st.func_name + "\"", node.coord)
         return expr_type
 
-    def check_StmtList(self, node, st):
+    def check_StmtList(self, node, st, new_scope=True):
         """
         Iterate through all the statements and perform typecheck on them.
         StmtList acts similarily to a new scope -- it should push additional
-        scope to the scope_stack and pop the scope when done.
+        scope to the symbol table and pop the scope when done, unless it is
+        the body of a method, which shares the scope of the parameters.
+        An error in a statement is recorded and checking resumes at the next
+        statement, so all the errors of a method are reported at once.
         """
-        st.push_scope()
+        if new_scope:
+            st.push_scope()
         for stmt in node.stmt_lst:
-            self.typecheck(stmt, st)
-        st.pop_scope()
+            try:
+                self.typecheck(stmt, st)
+            except ParseError as e:
+                self.errors.append(e)
+        if new_scope:
+            st.pop_scope()
 
         # List itself does not have any type
-        return ast.Type('None')
+        return ast.NONE
 
     def check_Type(self, node, st):
         return node
@@ -255,7 +483,9 @@ class TypeChecker(object):
         (i.e., '-' could only make sense if the expression is an integer)
         """
         type = self.typecheck(node.expr, st)
-        if node.op == 'not' and type.name != 'bool':
+        if type is ast.ERROR:
+            return type
+        elif node.op == 'not' and type.name != 'bool':
             raise ParseError(node.op + " is only valid for boolean operands", node.coord)
         elif node.op == '-' and type.name != 'int':
             raise ParseError(node.op + " is only valid for integer operands", node.coord)
@@ -269,48 +499,156 @@ class TypeChecker(object):
         within the while statement body.
         """
 
-        cond_type = self.typecheck(node.cond, st)
-        if not self.eq_type(ast.Type('bool'), cond_type):
-            raise ParseError("While statement requires boolean as its condition", node.coord)
+        try:
+            cond_type = self.typecheck(node.cond, st)
+            if not self.eq_type(ast.BOOL, cond_type):
+                raise ParseError("While statement requires boolean as its condition", node.coord)
+        except ParseError as e:
+            self.errors.append(e)
 
         if node.body is not None:
             self.typecheck(node.body, st)
 
-        return ast.Type('None')
-        
+        return ast.NONE
+
+    def check_ForRange(self, node, st):
+        """
+        Check that the bounds of the range are integers and that its step is
+        a nonzero constant. The loop variable is declared in a scope of its
+        own, so it only exists in the loop, and can't be assigned in it.
+        """
+        try:
+            for arg in (node.start, node.end, node.step):
+                if not self.eq_type(ast.INT, self.typecheck(arg, st)):
+                    raise ParseError("The arguments of range must be integers", arg.coord or node.coord)
+            step = ast.constant_int(node.step)
+            if step is None:
+                raise ParseError("The step of range must be a constant integer", node.step.coord)
+            elif step == 0:
+                raise ParseError("The step of range must not be zero", node.step.coord)
+            # The C loop declares its variable before computing the bounds
+            for arg in (node.start, node.end):
+                if any(isinstance(n, ast.Constant) and n.const_type == 'id' and n.value == node.var for n in walk(arg)):
+                    raise ParseError("The range of a loop can't use its loop variable \"" + node.var + "\"",
+                                     arg.coord)
+        except ParseError as e:
+            self.errors.append(e)
+
+        st.push_scope()
+        self.loop_bindings.append(st.declare_variable(node.var, ast.INT, node.coord))
+        try:
+            if node.body is not None:
+                self.typecheck(node.body, st)
+                if node.parallel:
+                    self.errors += self.check_parallel(node, len(st.undo_log))
+        finally:
+            self.loop_bindings.pop()
+            st.pop_scope()
+
+        return ast.NONE
+
+    def check_parallel(self, node, depth):
+        """
+        Returns the errors that keep the iterations of a parallel loop from
+        running in any order. Variables declared outside of the loop (in a
+        scope shallower than 'depth') are shared between the threads, so
+        the loop may only reduce them, with a statement such as
+        's = s + <expr>' using the same operator all along, and can't
+        read them otherwise. It can't print or return either.
+        """
+        errors = []
+        reductions = {}
+        # The uses of the reduction variables inside their reductions
+        operands = set()
+        for n in walk(node.body):
+            if isinstance(n, ast.PrintStmt):
+                errors.append(ParseError("A parallel loop can't print", n.coord))
+            elif isinstance(n, ast.RetStmt):
+                errors.append(ParseError("A parallel loop can't return", n.coord))
+            if not isinstance(n, ast.AssignStmt) or n.binding is None or n.binding.depth >= depth:
+                continue
+
+            operand = reduction_operand(n)
+            if operand is None:
+                op = n.expr.op if isinstance(n.expr, ast.BinOp) and n.expr.op in ('+', '*', 'and', 'or') else '+'
+                errors.append(ParseError("The parallel loop writes to the shared variable \"" + n.name +
+                                         "\", which it can only reduce, as in \"" + n.name + " = " + n.name +
+                                         " " + op + " (expr)\", where (expr) doesn't use it", n.coord))
+                continue
+            op = n.expr.op
+            operands.add(id(operand))
+            if n.binding.type is ast.ERROR:
+                continue
+            elif ((op in ('+', '*')) != (n.binding.type is ast.INT) or
+                  (op in ('and', 'or')) != (n.binding.type is ast.BOOL)):
+                errors.append(ParseError("The shared variable \"" + n.name + "\" can only be reduced with + or * if it is " +
+                                         "an int, or with and or or if it is a bool", n.coord))
+            elif reductions.setdefault(n.binding, op) != op:
+                errors.append(ParseError("The shared variable \"" + n.name + "\" is reduced with both " +
+                                         reductions[n.binding] + " and " + op, n.coord))
+
+        for n in walk(node.body):
+            if (isinstance(n, ast.Constant) and n.const_type == 'id' and n.binding in reductions and
+                    id(n) not in operands):
+                errors.append(ParseError("The reduction variable \"" + n.value + "\" can't be read in the " +
+                                         "parallel loop, other than by its reduction", n.coord))
+        return errors
+
     def check_Array(self, node, st):
     
         arr_type = None
         
         if node.array_vals != []:
             arr_type = self.typecheck(node.array_vals[0], st)
+            if arr_type is ast.ERROR:
+                return arr_type
             
-            for aval in node.array_vals:
+            for aval in node.array_vals[1:]:
                 aval_type = self.typecheck(aval, st)
                 if not self.eq_type(aval_type, arr_type):
                     raise ParseError("Array is not of a homogenous type", node.coord)
+
+            # Nested arrays are stored as a single block, so their rows must
+            # all have the same shape, which is checked at runtime for the
+            # rows that aren't literals
+            shapes = set(literal_shape(aval) for aval in node.array_vals) - {None}
+            if len(shapes) > 1:
+                raise ParseError("The rows of a nested array must all have the same length", node.coord)
                     
             #arr_type.name = "Array: " + arr_type.name
             
-            return ast.Type(arr_type.name, arr_type.arr_depth+1)
+            return arr_type.array_type()
         else:
-            return ast.Type('int', 1)
+            return ast.INT.array_type()
         
     def check_ArrayIndexing(self, node, st):
 
-        arr_type = None
-        idx_type = None
-        
-        try:
-            arr_type = st.lookup_variable(node.array_name.value, node.coord)
-            idx_type = self.typecheck(node.array_index, st)
-        except:
-            pass
-            
-        if arr_type == None or arr_type.arr_depth == 0:
-            raise ParseError(node.array_name + " is not an array", node.coord)
-            
-        if idx_type == None or not self.eq_type(ast.Type('int'), idx_type) or idx_type.arr_depth > 0:
-            raise ParseError(node.array_index + " is not an integer", node.coord)
-            
-        return ast.Type(arr_type.name, arr_type.arr_depth-1)
+        arr_type = self.typecheck(node.array_name, st)
+        idx_type = self.typecheck(node.array_index, st)
+
+        if arr_type is ast.ERROR:
+            return arr_type
+        elif arr_type.arr_depth == 0:
+            if isinstance(node.array_name, (ast.ArrayIndexing, ast.ArraySlice)):
+                raise ParseError('"' + node.name() + '" has fewer dimensions than it is indexed with', node.coord)
+            raise ParseError('"' + node.name() + '" is not an array', node.coord)
+
+        if not self.eq_type(ast.INT, idx_type):
+            raise ParseError('The index of "' + node.name() + '" is not an integer', node.array_index.coord)
+
+        return arr_type.element_type()
+
+    def check_ArraySlice(self, node, st):
+        arr_type = self.typecheck(node.array, st)
+        for bound in (node.lower, node.upper):
+            if bound is not None and not self.eq_type(ast.INT, self.typecheck(bound, st)):
+                raise ParseError('The bounds of the slice of "' + node.name() + '" are not integers', bound.coord)
+
+        if arr_type is ast.ERROR:
+            return arr_type
+        elif arr_type.arr_depth == 0:
+            if isinstance(node.array, (ast.ArrayIndexing, ast.ArraySlice)):
+                raise ParseError('"' + node.name() + '" has fewer dimensions than it is indexed with', node.coord)
+            raise ParseError('"' + node.name() + '" is not an array', node.coord)
+
+        return arr_type
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import time
+
+from SimplePythonParser import SimplePythonParser
+from SimplePythonSymbolTable import ParseError
+from SimplePythonDiagnostics import from_error, locate_all
+from SimplePythonIRtoC import module_header
+from SimplePythonIncremental import FunctionCache, IncrementalCompiler
+from SimplePythonModules import ModuleLoader
+from SimplePythonBuild import write_file
+
+# How often the watched files are checked for changes, in seconds
+POLL_INTERVAL = 0.1
+
+def file_state(path):
+    """
+    Returns what tells whether a file changed: its modification time and
+    size, or None if it doesn't exist
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+class FileWatcher(object):
+    """
+    Waits for changes to a set of files by polling them. A program is made
+    of a handful of files, so checking them costs a few stat calls every
+    POLL_INTERVAL, which keeps rebuilds well under a second without
+    depending on an OS-specific notification API.
+    """
+
+    def __init__(self, interval=POLL_INTERVAL):
+        self.interval = interval
+        # State of each watched file when it was last seen
+        self.states = {}
+
+    def watch(self, paths):
+        """
+        Sets the files to watch. The files already watched keep the state
+        they had, so that a change made during a build isn't missed.
+        """
+        self.states = {path: self.states[path] if path in self.states else file_state(path)
+                       for path in paths}
+
+    def changed(self):
+        changed = []
+        for path, state in self.states.items():
+            new_state = file_state(path)
+            if new_state != state:
+                self.states[path] = new_state
+                changed.append(path)
+        return changed
+
+    def wait(self):
+        """
+        Blocks until some of the files change, and returns them
+        """
+        changed = self.changed()
+        while not changed:
+            time.sleep(self.interval)
+            changed = self.changed()
+
+        # Editors often save a file in several steps, so wait until the
+        # files stop changing
+        while True:
+            time.sleep(self.interval / 2)
+            more = self.changed()
+            if not more:
+                return changed
+            changed.extend(path for path in more if path not in changed)
+
+class FileBuild(object):
+    """
+    Compiles a single source file into a C file, over and over. The parser
+    (whose tables take a while to build), the imported modules and the
+    compiled functions are kept between builds, so that a build only does
+    the work needed for what changed.
+    """
+
+    def __init__(self, path, output, options, include_dirs=(), jobs=1, verbose=False, cache_path=None):
+        self.path = path
+        self.output = output
+        self.options = options
+        self.jobs = jobs
+        self.verbose = verbose
+        self.parser = SimplePythonParser()
+        self.loader = ModuleLoader(include_dirs, self.parser)
+        self.cache = FunctionCache(cache_path, options.stamp())
+        self.imported_modules = []
+        self.summary = ''
+
+    def sources(self):
+        """
+        The files the output depends on, including where the imports that
+        couldn't be found would be
+        """
+        return [self.path] + [module.path for module in self.imported_modules] + sorted(self.loader.missing)
+
+    def build(self):
+        """
+        Brings the C file up to date, and returns it along with the
+        diagnostics found (in which case it's left as it was)
+        """
+        with open(self.path, 'r') as f:
+            data = f.read()
+        root = self.parser.parse(data)
+        source_map = self.parser.source_map
+        if self.parser.diagnostics:
+            return [], locate_all(self.parser.diagnostics, source_map, self.path)
+
+        self.loader.missing.clear()
+        try:
+            self.imported_modules, imported = self.loader.resolve(root, os.path.dirname(self.path) or '.')
+        except ParseError as e:
+            return [], locate_all(from_error(e, 'import'), source_map, self.path)
+
+        compiler = IncrementalCompiler(self.cache, self.options, imported, self.jobs, self.verbose)
+        try:
+            code = compiler.compile(root, data)
+        except ParseError as e:
+            return [], locate_all(from_error(e), source_map, self.path)
+
+        write_file(self.output, code)
+        for module in self.imported_modules:
+            write_file(os.path.join(os.path.dirname(self.output), module.name + '.h'),
+                       module_header(module.name, module.signatures()))
+        self.summary = '{} of {} functions recompiled'.format(compiler.recompiled, len(compiler.decls))
+        return [self.output], []
+
+class ModulesBuild(object):
+    """
+    Compiles the modules of a program with a ModuleBuilder, over and over
+    """
+
+    def __init__(self, builder, paths):
+        self.builder = builder
+        self.paths = paths
+        self.summary = ''
+
+    def sources(self):
+        return list(dict.fromkeys(self.paths + self.builder.sources + sorted(self.builder.loader.missing)))
+
+    def build(self):
+        self.builder.loader.missing.clear()
+        c_files, diagnostics = self.builder.build(self.paths)
+        self.summary = '{} of {} modules recompiled'.format(self.builder.compiled, len(self.builder.modules))
+        return c_files, diagnostics
+
+def watch(target, report, on_success=None, watcher=None, out=sys.stderr):
+    """
+    Builds the target, then rebuilds it every time one of its sources
+    changes, until interrupted. The diagnostics of a failed build are given
+    to 'report'; the C files of a successful one to 'on_success', which
+    returns whether it succeeded too.
+    """
+    watcher = watcher or FileWatcher()
+    changed = None
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                c_files, diagnostics = target.build()
+                failed = bool(diagnostics)
+            except OSError as e:
+                # A file was removed or renamed under us
+                out.write('error: ' + str(e) + '\n')
+                c_files, failed = [], True
+            if diagnostics:
+                report(diagnostics)
+            elif not failed and on_success is not None:
+                failed = not on_success(c_files)
+            elapsed = (time.perf_counter() - start) * 1000
+
+            what = 'Built' if changed is None else ', '.join(os.path.basename(path) for path in changed) + ' changed, rebuilt'
+            status = 'failed' if failed else target.summary
+            out.write('[{}] {} in {:.0f} ms ({})\n'.format(time.strftime('%H:%M:%S'), what, elapsed, status))
+            out.flush()
+
+            watcher.watch(target.sources())
+            changed = watcher.wait()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+COMPILER = os.path.join(BENCH_DIR, '..', 'SimplePythonMain.py')
+
+sys.path.insert(0, os.path.join(BENCH_DIR, '..'))
+
+from SimplePythonBuild import CCompiler, BUILD_PRESETS
+
+# Each program is compiled with and without the escape analysis
+VARIANTS = {
+    'local': [],
+    'malloc': ['--no-escape-analysis'],
+}
+
+
+def temporaries_source(iterations):
+    """
+    Returns a program building short-lived arrays and strings in a hot
+    loop: a concatenation of fixed size, which fits on the stack, and a
+    concatenation of a slice and a string concatenation, whose sizes are
+    only known at runtime
+    """
+    return '\n'.join([
+        'def main():',
+        '    a = [3, 1, 4, 1, 5, 9, 2, 6]',
+        '    b = [2, 7, 1, 8, 2, 8, 1, 8]',
+        '    total = 0',
+        '    for i in range({}):'.format(iterations),
+        '        both = a + b',
+        '        tail = both[i % 16:] + a',
+        '        word = "ab" + "cd"',
+        '        total = (total + both[i % 16] + sum(tail) + len(word)) % 1000003',
+        '    print(total)',
+    ]) + '\n'
+
+
+def measure(executable):
+    """
+    Runs the executable and returns its wall time in seconds, its peak RSS
+    in KiB and its output
+    """
+    start = time.perf_counter()
+    proc = subprocess.Popen([executable], stdout=subprocess.PIPE, universal_newlines=True)
+    output = proc.stdout.read()
+    _, status, rusage = os.wait4(proc.pid, 0)
+    elapsed = time.perf_counter() - start
+    if os.waitstatus_to_exitcode(status) != 0:
+        raise RuntimeError('{} exited with status {}'.format(executable, os.waitstatus_to_exitcode(status)))
+    return elapsed, rusage.ru_maxrss, output
+
+
+def build(program, variant, workdir, cc, preset, flags):
+    """
+    Compiles a SimplePython program to C and then to an executable, and
+    returns the path of the executable
+    """
+    name = os.path.splitext(os.path.basename(program))[0] + '-' + variant
+    c_file = os.path.join(workdir, name + '.c')
+    executable = os.path.join(workdir, name)
+    cmd = [sys.executable, COMPILER, '-o', c_file] + flags + VARIANTS[variant] + [program]
+    # Run from the work directory so that PLY's tables don't end up in the tree
+    subprocess.run(cmd, cwd=workdir, check=True, stdout=subprocess.DEVNULL)
+    cc.compile([c_file], executable, preset)
+    return executable
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser(description='Compare the runtime and memory of short-lived arrays and strings built locally and with malloc')
+    argparser.add_argument('-n', '--iterations', type=int, default=2000000, help="Number of iterations of the loop")
+    argparser.add_argument('-r', '--repeat', type=int, default=5, help="Number of timed runs per executable")
+    argparser.add_argument('-O', '--optimize', action='store_true', help="Compile with the optimizer")
+    argparser.add_argument('-b', '--build', choices=sorted(BUILD_PRESETS), default='O2', help="C compiler preset")
+    argparser.add_argument('--cc', action='store', help="C compiler to build with")
+    args = argparser.parse_args()
+
+    cc = CCompiler(args.cc)
+    flags = ['-O'] if args.optimize else []
+    workdir = tempfile.mkdtemp(prefix='sp-bench-')
+    try:
+        program = os.path.join(workdir, 'temporaries.py')
+        with open(program, 'w') as f:
+            f.write(temporaries_source(args.iterations))
+
+        print('{:>8} {:>10} {:>10}'.format('variant', 'time', 'peak RSS'))
+        times = {}
+        outputs = {}
+        for variant in sorted(VARIANTS):
+            executable = build(program, variant, workdir, cc, args.build, flags)
+            runs = [measure(executable) for _ in range(args.repeat)]
+            times[variant] = min(elapsed for elapsed, _, _ in runs)
+            rss = max(rss for _, rss, _ in runs)
+            outputs[variant] = runs[0][2]
+            print('{:>8} {:>9.4f}s {:>6} MiB'.format(variant, times[variant], rss // 1024))
+        if outputs['local'] != outputs['malloc']:
+            sys.exit('The program printed different output without the escape analysis')
+        print('{:>8} {:>9.2f}x'.format('speedup', times['malloc'] / times['local']))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from SimplePythonIRGen import IRGen, IRControl, TAC, Operand
+from SimplePythonIRtoC import SPtoC
+
+
+def build_ir(instructions, func_size=500):
+    """
+    Returns an IRGen holding about 'instructions' lines of IR, split into
+    functions of roughly 'func_size' lines doing arithmetic, loops, string
+    concatenation and printing
+    """
+    irgen = IRGen()
+    func = 0
+    while len(irgen.IR_lst) < instructions:
+        irgen.reset_var()
+        irgen.add_code(IRControl('FUNC', ('f%d' % func, 'int', [('x', 'int')])))
+        irgen.add_code(TAC('DECL', 'int', Operand('id', 'acc'), Operand('int', 0)))
+        irgen.add_code(TAC('DECL', 'str', Operand('id', 's'), Operand('str', 'a')))
+        start = len(irgen.IR_lst)
+        while len(irgen.IR_lst) - start < func_size:
+            cond = irgen.inc_var()
+            irgen.add_code(IRControl('BEGINLOOPCOND'))
+            irgen.add_code(TAC('<', 'bool', cond, Operand('id', 'acc'), Operand('id', 'x')))
+            irgen.add_code(IRControl('WHILE', cond))
+            t1 = irgen.inc_var()
+            irgen.add_code(TAC('*', 'int', t1, Operand('id', 'x'), Operand('int', 3)))
+            t2 = irgen.inc_var()
+            irgen.add_code(TAC('+', 'int', t2, Operand('id', 'acc'), t1))
+            irgen.add_code(TAC('ASSIGN', 'int', Operand('id', 'acc'), t2))
+            t3 = irgen.inc_var()
+            irgen.add_code(TAC('+', 'str', t3, Operand('id', 's'), Operand('str', 'b')))
+            irgen.add_code(TAC('ASSIGN', 'str', Operand('id', 's'), t3))
+            irgen.add_code(IRControl('PRINT', [(Operand('id', 'acc'), 'int'), (Operand('id', 's'), 'str')]))
+            irgen.add_code(IRControl('ENDWHILE', cond))
+        irgen.add_code(IRControl('RET', Operand('id', 'acc')))
+        irgen.add_code(IRControl('ENDFUNC', 'f%d' % func))
+        func += 1
+    return irgen
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser(description='Measure the throughput of the C emitter')
+    argparser.add_argument('-n', '--instructions', type=int, default=100000, help="Number of IR instructions")
+    argparser.add_argument('-r', '--repeat', type=int, default=5, help="Number of timed runs")
+    args = argparser.parse_args()
+
+    irgen = build_ir(args.instructions)
+    count = len(irgen.IR_lst)
+
+    times = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        code = SPtoC(irgen).generate()
+        times.append(time.perf_counter() - start)
+
+    best = min(times)
+    print('IR instructions: {}'.format(count))
+    print('C output:        {} bytes'.format(len(code)))
+    print('Best time:       {:.3f} s'.format(best))
+    print('Throughput:      {:.0f} instructions/s'.format(count / best))
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..'))
+
+from SimplePythonParser import SimplePythonParser
+from SimplePythonTypeChecker import TypeChecker
+from SimplePythonIRGen import IRGen
+from SimplePythonIRtoC import SPtoC
+from SimplePythonModules import CompileOptions
+from SimplePythonIncremental import FunctionCache, IncrementalCompiler
+from bench_parser import build_source
+
+
+def compile_full(root, options):
+    TypeChecker().typecheck(root)
+    irgen = IRGen()
+    irgen.generate(root)
+    options.optimize_ir(irgen.IR_lst)
+    return SPtoC(irgen, options.bounds_check).generate()
+
+
+def compile_incremental(root, data, options, cache_path):
+    cache = FunctionCache(cache_path, options.stamp())
+    compiler = IncrementalCompiler(cache, options)
+    code = compiler.compile(root, data)
+    return code, compiler.recompiled
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser(description='Compare a full compilation with an incremental one after editing a function')
+    argparser.add_argument('-f', '--funcs', type=int, default=100, help="Number of functions")
+    argparser.add_argument('-s', '--stmts', type=int, default=100, help="Statements per function")
+    argparser.add_argument('-O', '--optimize', action='store_true', help="Run the optimizer")
+    args = argparser.parse_args()
+
+    data = build_source(args.funcs, args.stmts)
+    # Change a constant in the first function only
+    edited = data.replace('x1 = (x0 + 1)', 'x1 = (x0 + 2)', 1)
+
+    os.chdir(os.environ.get('TMPDIR', '/tmp'))
+    parser = SimplePythonParser()
+    options = CompileOptions(args.optimize)
+    cache_path = os.path.join(tempfile.mkdtemp(), 'bench.spcache')
+
+    # Every run parses the whole file, which is timed separately
+    parse_time, _ = timed(parser.parse, edited)
+    full_time, full_code = timed(compile_full, parser.parse(edited), options)
+    cold_time, _ = timed(compile_incremental, parser.parse(data), data, options, cache_path)
+    warm_time, (_, unchanged) = timed(compile_incremental, parser.parse(data), data, options, cache_path)
+    edit_time, (code, recompiled) = timed(compile_incremental, parser.parse(edited), edited, options, cache_path)
+
+    print('Functions:              {}'.format(args.funcs + 1))
+    print('Parsing (every run):    {:.3f} s'.format(parse_time))
+    print('Full compilation:       {:.3f} s'.format(full_time))
+    print('Incremental, cold:      {:.3f} s'.format(cold_time))
+    print('Incremental, no change: {:.3f} s ({} recompiled)'.format(warm_time, unchanged))
+    print('Incremental, one edit:  {:.3f} s ({} recompiled, {:.1f}x faster)'.format(
+        edit_time, recompiled, full_time / edit_time))
+    print('Cache size:             {:.1f} KiB'.format(os.path.getsize(cache_path) / 1024))
+    print('Same C output:          {}'.format(code == full_code))
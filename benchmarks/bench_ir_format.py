@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+
+import argparse
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from SimplePythonIRFormat import dump, load
+from SimplePythonIRtoC import SPtoC
+from SimplePythonIRGen import IRGen
+from bench_emitter import build_ir
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser(description='Measure how fast IR is saved and loaded')
+    argparser.add_argument('-n', '--instructions', type=int, default=100000, help="Number of IR instructions")
+    argparser.add_argument('-r', '--repeat', type=int, default=5, help="Number of timed runs")
+    args = argparser.parse_args()
+
+    irgen = build_ir(args.instructions)
+    count = len(irgen.IR_lst)
+
+    save_times = []
+    load_times = []
+    for _ in range(args.repeat):
+        out = io.StringIO()
+        start = time.perf_counter()
+        dump(irgen.IR_lst, out)
+        save_times.append(time.perf_counter() - start)
+
+        out.seek(0)
+        start = time.perf_counter()
+        irlst = load(out)
+        load_times.append(time.perf_counter() - start)
+
+    loaded = IRGen()
+    loaded.IR_lst = irlst
+
+    print('IR instructions: {}'.format(count))
+    print('File size:       {:.1f} KiB'.format(len(out.getvalue()) / 1024))
+    print('Save:            {:.3f} s ({:.0f} instructions/s)'.format(min(save_times), count / min(save_times)))
+    print('Load:            {:.3f} s ({:.0f} instructions/s)'.format(min(load_times), count / min(load_times)))
+    print('Same C output:   {}'.format(SPtoC(irgen).generate() == SPtoC(loaded).generate()))
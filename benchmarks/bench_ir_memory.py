@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from SimplePythonTypeChecker import TypeChecker
+from SimplePythonIRGen import IRGen
+from SimplePythonIRtoC import SPtoC
+from SimplePythonOptimizer import ConstOptimizer
+from bench_typechecker import build_program
+
+
+def generate(root, compact):
+    """
+    Returns the IRGen for the program, along with the memory retained by
+    its IR
+    """
+    gc.collect()
+    tracemalloc.start()
+    irgen = IRGen(compact)
+    irgen.generate(root)
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return irgen, current
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser(description='Compare the memory used by the list and the compact IR')
+    argparser.add_argument('-f', '--funcs', type=int, default=200, help="Number of functions")
+    argparser.add_argument('-s', '--stmts', type=int, default=500, help="Statements per function")
+    args = argparser.parse_args()
+
+    root = build_program(args.funcs, args.stmts)
+    TypeChecker().typecheck(root)
+
+    results = {}
+    for name, compact in (('List', False), ('Compact', True)):
+        irgen, memory = generate(root, compact)
+        start = time.perf_counter()
+        ConstOptimizer(irgen.IR_lst).optimize()
+        optimize_time = time.perf_counter() - start
+        start = time.perf_counter()
+        code = SPtoC(irgen).generate()
+        emit_time = time.perf_counter() - start
+        results[name] = (len(irgen.IR_lst), memory, optimize_time, emit_time, code)
+        del irgen
+
+    count = results['List'][0]
+    print('IR instructions:  {}'.format(count))
+    for name in ('List', 'Compact'):
+        _, memory, optimize_time, emit_time, _ = results[name]
+        print('{:<8}  {:8.1f} KiB ({:5.1f} B/instruction), optimize {:.3f} s, emit {:.3f} s'.format(
+            name + ':', memory / 1024, memory / count, optimize_time, emit_time))
+    print('Memory saved:     {:.1f}%'.format((1 - results['Compact'][1] / results['List'][1]) * 100))
+    print('Same C output:    {}'.format(results['List'][4] == results['Compact'][4]))
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+COMPILER = os.path.join(BENCH_DIR, '..', 'SimplePythonMain.py')
+
+sys.path.insert(0, os.path.join(BENCH_DIR, '..'))
+
+from SimplePythonBuild import CCompiler, BUILD_PRESETS
+
+DEFAULT_SIZES = [1000, 10000, 100000, 300000]
+
+
+def literal_values(size):
+    """
+    Returns the elements of the literal of 'size' elements, which don't
+    repeat in any short pattern
+    """
+    return [(i * 7919) % 100003 for i in range(size)]
+
+
+def literal_source(size):
+    """
+    Returns a program summing an array literal of 'size' elements
+    """
+    values = ', '.join(map(str, literal_values(size)))
+    return ('def main():\n'
+            '    a = [' + values + ']\n'
+            '    s = 0\n'
+            '    for i in range(len(a)):\n'
+            '        s = (s + a[i]) % 1000003\n'
+            '    print(s)\n')
+
+
+def measure(cmd, cwd):
+    """
+    Runs the command and returns its wall time in seconds and its peak RSS
+    in KiB, which covers the subprocesses it waited for
+    """
+    start = time.perf_counter()
+    proc = subprocess.Popen(cmd, cwd=cwd, stdout=subprocess.DEVNULL)
+    _, status, rusage = os.wait4(proc.pid, 0)
+    elapsed = time.perf_counter() - start
+    if os.waitstatus_to_exitcode(status) != 0:
+        raise RuntimeError('{} exited with status {}'.format(cmd[0], os.waitstatus_to_exitcode(status)))
+    return elapsed, rusage.ru_maxrss
+
+
+def bench(size, workdir, cc, preset, flags):
+    """
+    Compiles the program for a literal of 'size' elements to C and then to
+    an executable, checks what it prints, and returns the time, peak RSS
+    and output size of both steps
+    """
+    program = os.path.join(workdir, 'literal{}.py'.format(size))
+    with open(program, 'w') as f:
+        f.write(literal_source(size))
+    c_file = os.path.join(workdir, 'literal{}.c'.format(size))
+    executable = os.path.join(workdir, 'literal{}'.format(size))
+
+    # Run from the work directory so that PLY's tables don't end up in the tree
+    sp_time, sp_rss = measure([sys.executable, COMPILER, '-o', c_file] + flags + [program], workdir)
+    cc_time, cc_rss = measure([cc.cc] + cc.flags(preset) + ['-o', executable, c_file], workdir)
+
+    output = subprocess.run([executable], stdout=subprocess.PIPE, check=True, universal_newlines=True).stdout
+    expected = sum(literal_values(size)) % 1000003
+    if int(output) != expected:
+        sys.exit('The literal of {} elements summed to {}, not {}'.format(size, output.strip(), expected))
+    return sp_time, sp_rss, os.path.getsize(c_file), cc_time, cc_rss
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser(description='Measure the time and memory taken to compile large array literals')
+    argparser.add_argument('sizes', type=int, nargs='*', default=DEFAULT_SIZES, help="Numbers of elements of the literals")
+    argparser.add_argument('-O', '--optimize', action='store_true', help="Compile with the optimizer")
+    argparser.add_argument('-b', '--build', choices=sorted(BUILD_PRESETS), default='O2', help="C compiler preset")
+    argparser.add_argument('--cc', action='store', help="C compiler to build with")
+    args = argparser.parse_args()
+
+    cc = CCompiler(args.cc)
+    flags = ['-O'] if args.optimize else []
+    workdir = tempfile.mkdtemp(prefix='sp-bench-')
+    try:
+        print('{:>9} {:>10} {:>10} {:>10} {:>10} {:>10}'.format(
+            'elements', 'spc time', 'spc RSS', 'C size', 'cc time', 'cc RSS'))
+        for size in args.sizes:
+            sp_time, sp_rss, c_size, cc_time, cc_rss = bench(size, workdir, cc, args.build, flags)
+            print('{:>9} {:>9.2f}s {:>7} MiB {:>6} KiB {:>9.2f}s {:>7} MiB'.format(
+                size, sp_time, sp_rss // 1024, c_size // 1024, cc_time, cc_rss // 1024))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
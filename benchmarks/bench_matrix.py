@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+
+import argparse
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+COMPILER = os.path.join(BENCH_DIR, '..', 'SimplePythonMain.py')
+
+sys.path.insert(0, os.path.join(BENCH_DIR, '..'))
+
+from SimplePythonBuild import CCompiler, BUILD_PRESETS
+
+# The same product, over the same data (a[i][j] = j % 8 + 1), written in C
+# with an array of separately allocated rows, the way nested arrays were
+# laid out before they were stored flat
+JAGGED_PROGRAM = '''\
+#include <stdio.h>
+#include <stdlib.h>
+
+int main() {{
+    int** a = malloc({n} * sizeof(int*));
+    for (int i = 0; i < {n}; i++) {{
+        a[i] = malloc({n} * sizeof(int));
+        for (int j = 0; j < {n}; j++) a[i][j] = j % 8 + 1;
+    }}
+    int total = 0;
+    for (int r = 0; r < {repeat}; r++) {{
+        for (int i = 0; i < {n}; i++) {{
+            for (int j = 0; j < {n}; j++) {{
+                int s = 0;
+                for (int k = 0; k < {n}; k++) s = s + a[i][k] * a[k][j];
+                total = (total + s) % 1000003;
+            }}
+        }}
+    }}
+    printf("%d\\n", total);
+}}
+'''
+
+
+def repeat_lines(name, base, count):
+    """
+    Returns the lines setting 'name' to 'count' copies of the array 'base'
+    concatenated, doubling it and adding up the copies of the set bits
+    """
+    lines = ['    {}_0 = {}'.format(name, base)]
+    bit = 0
+    while 2 ** (bit + 1) <= count:
+        lines.append('    {0}_{1} = {0}_{2} + {0}_{2}'.format(name, bit + 1, bit))
+        bit += 1
+    parts = ['{}_{}'.format(name, b) for b in range(bit, -1, -1) if count & 2 ** b]
+    lines.append('    {} = {}'.format(name, ' + '.join(parts)))
+    return lines
+
+
+def matrix_source(size, repeat):
+    """
+    Returns a program multiplying a matrix of 'size' rows and columns, a
+    multiple of 8, by itself 'repeat' times
+    """
+    lines = ['def main():']
+    lines.extend(repeat_lines('row', '[1, 2, 3, 4, 5, 6, 7, 8]', size // 8))
+    lines.extend(repeat_lines('a', '[row]', size))
+    lines.extend([
+        '    total = 0',
+        '    for r in range({}):'.format(repeat),
+        '        for i in range({}):'.format(size),
+        '            for j in range({}):'.format(size),
+        '                s = 0',
+        '                for k in range({}):'.format(size),
+        '                    s = s + a[i][k] * a[k][j]',
+        '                total = (total + s) % 1000003',
+        '    print(total)',
+    ])
+    return '\n'.join(lines) + '\n'
+
+
+def build(workdir, cc, preset, size, repeat):
+    """
+    Builds the flat SimplePython version and the jagged C version, and
+    returns the paths of their executables
+    """
+    program = os.path.join(workdir, 'matrix.py')
+    with open(program, 'w') as f:
+        f.write(matrix_source(size, repeat))
+    flat_c = os.path.join(workdir, 'flat.c')
+    # Run from the work directory so that PLY's tables don't end up in the tree
+    subprocess.run([sys.executable, COMPILER, '-o', flat_c, program], cwd=workdir, check=True,
+                   stdout=subprocess.DEVNULL)
+
+    jagged_c = os.path.join(workdir, 'jagged.c')
+    with open(jagged_c, 'w') as f:
+        f.write(JAGGED_PROGRAM.format(n=size, repeat=repeat))
+
+    executables = {}
+    for name, c_file in (('flat', flat_c), ('jagged', jagged_c)):
+        executables[name] = os.path.join(workdir, name)
+        cc.compile([c_file], executables[name], preset)
+    return executables
+
+
+def run(executable, repeat):
+    """
+    Returns the best wall time of the executable, in seconds, along with
+    its output
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = subprocess.run([executable], stdout=subprocess.PIPE, check=True, universal_newlines=True)
+        times.append(time.perf_counter() - start)
+    return min(times), result.stdout
+
+
+def cache_misses(executable):
+    """
+    Returns the cache misses counted by perf for one run of the executable,
+    or None if perf can't count them here
+    """
+    if shutil.which('perf') is None:
+        return None
+    result = subprocess.run(['perf', 'stat', '-x,', '-e', 'cache-misses', executable],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, universal_newlines=True)
+    match = re.search(r'^(\d+),.*cache-misses', result.stderr, re.MULTILINE)
+    return int(match.group(1)) if match else None
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser(description='Compare a matrix product over flat nested arrays with one over separately allocated rows')
+    argparser.add_argument('-s', '--size', type=int, default=520, help="Rows and columns of the matrix, a multiple of 8. Powers of two make the flat layout read each column from the same few cache sets.")
+    argparser.add_argument('-n', '--products', type=int, default=2, help="Number of products computed")
+    argparser.add_argument('-r', '--repeat', type=int, default=5, help="Number of timed runs per executable")
+    argparser.add_argument('-b', '--build', choices=sorted(BUILD_PRESETS), default='O2', help="C compiler preset")
+    argparser.add_argument('--cc', action='store', help="C compiler to build with")
+    args = argparser.parse_args()
+
+    if args.size <= 0 or args.size % 8:
+        argparser.error('the size must be a positive multiple of 8')
+
+    cc = CCompiler(args.cc)
+    workdir = tempfile.mkdtemp(prefix='sp-bench-')
+    try:
+        executables = build(workdir, cc, args.build, args.size, args.products)
+        times = {}
+        outputs = {}
+        print('{:>8} {:>10} {:>14}'.format('layout', 'time', 'cache misses'))
+        for name in ('jagged', 'flat'):
+            times[name], outputs[name] = run(executables[name], args.repeat)
+            misses = cache_misses(executables[name])
+            print('{:>8} {:>9.4f}s {:>14}'.format(name, times[name], 'n/a' if misses is None else misses))
+        if outputs['flat'] != outputs['jagged']:
+            sys.exit('The layouts printed {!r} and {!r}'.format(outputs['flat'], outputs['jagged']))
+        print('{:>8} {:>9.2f}x'.format('speedup', times['jagged'] / times['flat']))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+COMPILER = os.path.join(BENCH_DIR, '..', 'SimplePythonMain.py')
+
+sys.path.insert(0, os.path.join(BENCH_DIR, '..'))
+
+from SimplePythonBuild import CCompiler, BUILD_PRESETS
+
+# Each iteration of the outer loop does 'inner' iterations of work, and
+# returns a small value so that the sum doesn't overflow
+PROGRAM = '''\
+def work(i: int) -> int:
+    total = 0
+    for j in range({inner}):
+        total = (total + i * j + 7) % 1000003
+    return total % 1000
+
+def main():
+    s = 0
+    parallel for i in range({outer}):
+        s = s + work(i)
+    print(s)
+'''
+
+
+def build(source, name, workdir, cc, preset):
+    """
+    Compiles a SimplePython program to C and then to an executable, and
+    returns the path of the executable
+    """
+    program = os.path.join(workdir, name + '.py')
+    c_file = os.path.join(workdir, name + '.c')
+    executable = os.path.join(workdir, name)
+    with open(program, 'w') as f:
+        f.write(source)
+    # Run from the work directory so that PLY's tables don't end up in the tree
+    subprocess.run([sys.executable, COMPILER, '-o', c_file, program], cwd=workdir, check=True,
+                   stdout=subprocess.DEVNULL)
+    cc.compile([c_file], executable, preset)
+    return executable
+
+
+def run(executable, threads, repeat):
+    """
+    Runs the executable with the given number of OpenMP threads, and
+    returns its best wall time in seconds along with its output
+    """
+    env = dict(os.environ, OMP_NUM_THREADS=str(threads))
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = subprocess.run([executable], env=env, stdout=subprocess.PIPE, check=True,
+                                universal_newlines=True)
+        times.append(time.perf_counter() - start)
+    return min(times), result.stdout
+
+
+def thread_counts(limit):
+    counts = []
+    threads = 1
+    while threads < limit:
+        counts.append(threads)
+        threads *= 2
+    return counts + [limit]
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser(description='Measure how a parallel loop scales with the number of threads')
+    argparser.add_argument('-n', '--outer', type=int, default=2000, help="Iterations of the parallel loop")
+    argparser.add_argument('-m', '--inner', type=int, default=20000, help="Iterations of work in each of them")
+    argparser.add_argument('-t', '--threads', type=int, default=os.cpu_count() or 1, help="Most threads to run with")
+    argparser.add_argument('-r', '--repeat', type=int, default=3, help="Number of timed runs per thread count")
+    argparser.add_argument('-b', '--build', choices=sorted(BUILD_PRESETS), default='O2', help="C compiler preset")
+    argparser.add_argument('--cc', action='store', help="C compiler to build with")
+    args = argparser.parse_args()
+
+    cc = CCompiler(args.cc)
+    if not cc.openmp_flags():
+        print(cc.cc + ' has no OpenMP support, the parallel loop will run serially', file=sys.stderr)
+
+    source = PROGRAM.format(outer=args.outer, inner=args.inner)
+    workdir = tempfile.mkdtemp(prefix='sp-bench-')
+    try:
+        serial = build(source.replace('parallel for', 'for'), 'serial', workdir, cc, args.build)
+        parallel = build(source, 'parallel', workdir, cc, args.build)
+
+        serial_time, expected = run(serial, 1, args.repeat)
+        print('{:>8}: {:.4f} s'.format('serial', serial_time))
+        for threads in thread_counts(args.threads):
+            elapsed, output = run(parallel, threads, args.repeat)
+            if output != expected:
+                sys.exit('The parallel loop printed {!r} instead of {!r}'.format(output, expected))
+            print('{:>8}: {:.4f} s, {:.2f}x'.format('{} thr'.format(threads), elapsed, serial_time / elapsed))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
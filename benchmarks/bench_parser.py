@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..'))
+
+from SimplePythonParser import SimplePythonParser
+from SimplePythonTypeChecker import walk
+
+
+def build_source(funcs, stmts):
+    """
+    Returns the source of a program with 'funcs' functions of about 'stmts'
+    statements each, mixing arithmetic, comparisons, arrays and calls
+    """
+    lines = []
+    for f in range(funcs):
+        lines.append('def f%d(p: int) -> int:' % f)
+        lines.append('    x0 = p + 1')
+        lines.append('    a = [1, 2, 3]')
+        for s in range(1, stmts):
+            lines.append('    x%d = (x%d + %d) * a[%d]' % (s, s - 1, s, s % 3))
+            if s % 10 == 0:
+                lines.append('    if x%d < 100:' % s)
+                lines.append('        print(x%d, "small")' % s)
+        if f > 0:
+            lines.append('    f%d(x0)' % (f - 1))
+        lines.append('    return x%d' % (stmts - 1))
+        lines.append('')
+    lines.append('def main():')
+    lines.append('    f%d(1)' % (funcs - 1))
+    return '\n'.join(lines) + '\n'
+
+
+def no_span(p, first, last):
+    return None
+
+
+def time_parse(parser, data):
+    gc.collect()
+    start = time.perf_counter()
+    parser.parse(data)
+    return time.perf_counter() - start
+
+
+def retained(parser, data):
+    """
+    Returns the memory retained by the tree, along with its number of nodes
+    """
+    gc.collect()
+    tracemalloc.start()
+    root = parser.parse(data)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    nodes = 1 + sum(1 for decl in root.func_decl + [root.main_func] for _ in walk(decl))
+    return current, nodes
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser(description='Measure the cost of recording source spans while parsing')
+    argparser.add_argument('-f', '--funcs', type=int, default=50, help="Number of functions")
+    argparser.add_argument('-s', '--stmts', type=int, default=200, help="Statements per function")
+    argparser.add_argument('-r', '--repeat', type=int, default=5, help="Number of timed runs of each mode")
+    args = argparser.parse_args()
+
+    data = build_source(args.funcs, args.stmts)
+
+    # Build the tables in the work directory rather than in the tree
+    os.chdir(os.environ.get('TMPDIR', '/tmp'))
+    parser = SimplePythonParser()
+
+    # Without spans, every node is left with a coord of None. The two are
+    # timed alternately so that both see the same machine conditions.
+    times = {'With spans': [], 'Without spans': []}
+    for _ in range(args.repeat):
+        times['With spans'].append(time_parse(parser, data))
+        parser.span = no_span
+        times['Without spans'].append(time_parse(parser, data))
+        del parser.span
+
+    memory = {'With spans': retained(parser, data)}
+    parser.span = no_span
+    memory['Without spans'] = retained(parser, data)
+    del parser.span
+
+    with_spans = min(times['With spans']), memory['With spans'][0], memory['With spans'][1]
+    without_spans = min(times['Without spans']), memory['Without spans'][0], memory['Without spans'][1]
+
+    print('Source:           {:.1f} KiB, {} nodes'.format(len(data) / 1024, with_spans[2]))
+    for name, (best, memory, nodes) in (('With spans', with_spans), ('Without spans', without_spans)):
+        print('{:<16}  {:.3f} s ({:.0f} KiB/s), {:.1f} KiB retained ({:.1f} B/node)'.format(
+            name + ':', best, len(data) / 1024 / best, memory / 1024, memory / nodes))
+    print('Time overhead:    {:+.1f}%'.format((with_spans[0] / without_spans[0] - 1) * 100))
+    print('Memory overhead:  {:+.1f} B/node'.format((with_spans[1] - without_spans[1]) / with_spans[2]))
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import SimplePythonAST as ast
+from SimplePythonTypeChecker import TypeChecker
+
+
+def build_program(funcs, stmts):
+    """
+    Returns the AST of a program with 'funcs' functions of about 'stmts'
+    statements each, mixing arithmetic, comparisons, arrays and calls
+    """
+    def const(value):
+        return ast.Constant('int', value)
+
+    def var(name):
+        return ast.Constant('id', name)
+
+    decls = []
+    for f in range(funcs):
+        body = [ast.AssignStmt('x0', ast.BinOp('+', var('p'), const(1))),
+                ast.AssignStmt('a', ast.Array([const(1), const(2), const(3)]))]
+        for s in range(1, stmts):
+            expr = ast.BinOp('*', ast.BinOp('+', var('x%d' % (s - 1)), const(s)),
+                             ast.ArrayIndexing(var('a'), const(s % 3)))
+            body.append(ast.AssignStmt('x%d' % s, expr))
+            if s % 10 == 0:
+                cond = ast.BinOp('<', var('x%d' % s), const(100))
+                body.append(ast.IfStmt(cond, ast.StmtList([ast.PrintStmt([var('x%d' % s)])]), None))
+        if f > 0:
+            body.append(ast.ExprStmt(ast.FunctionCall('f%d' % (f - 1), [var('x0')])))
+        body.append(ast.RetStmt(var('x%d' % (stmts - 1))))
+        params = ast.ParamList([ast.Formal('p', ast.Type('int'))])
+        decls.append(ast.MethodDecl('f%d' % f, ast.Type('int'), params, ast.StmtList(body)))
+
+    main_body = ast.StmtList([ast.ExprStmt(ast.FunctionCall('f%d' % (funcs - 1), [const(1)]))])
+    main = ast.MethodDecl('main', ast.Type('int'), ast.ParamList([]), main_body)
+    return ast.Program(main, decls)
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser(description='Measure the time and memory used to typecheck a large AST')
+    argparser.add_argument('-f', '--funcs', type=int, default=200, help="Number of functions")
+    argparser.add_argument('-s', '--stmts', type=int, default=500, help="Statements per function")
+    argparser.add_argument('-r', '--repeat', type=int, default=3, help="Number of timed runs")
+    args = argparser.parse_args()
+
+    times = []
+    for _ in range(args.repeat):
+        root = build_program(args.funcs, args.stmts)
+        start = time.perf_counter()
+        TypeChecker().typecheck(root)
+        times.append(time.perf_counter() - start)
+
+    # Measure the memory allocated while typechecking on a fresh tree
+    root = build_program(args.funcs, args.stmts)
+    tracemalloc.start()
+    TypeChecker().typecheck(root)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print('Statements:       {}'.format(args.funcs * args.stmts))
+    print('Best time:        {:.3f} s'.format(min(times)))
+    print('Retained memory:  {:.1f} KiB'.format(current / 1024))
+    print('Peak memory:      {:.1f} KiB'.format(peak / 1024))
+    print('Distinct types:   {}'.format(sum(len(depths) for depths in ast.Type._interned.values())))
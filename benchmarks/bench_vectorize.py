@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+
+import argparse
+import glob
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+COMPILER = os.path.join(BENCH_DIR, '..', 'SimplePythonMain.py')
+
+sys.path.insert(0, os.path.join(BENCH_DIR, '..'))
+
+from SimplePythonBuild import CCompiler, BUILD_PRESETS
+
+# Each program is compiled with and without the vector hints
+VARIANTS = {
+    'hints': [],
+    'no-hints': ['--no-vector-hints'],
+}
+
+# Flags making the C compiler report the loops it vectorized
+GCC_REPORT_FLAGS = ['-fopt-info-vec-optimized']
+CLANG_REPORT_FLAGS = ['-Rpass=loop-vectorize']
+
+
+def dot_product_source(doublings, repeat):
+    """
+    Returns a program summing the products of two arrays of 8 * 2 **
+    'doublings' elements, 'repeat' times
+    """
+    lines = ['def main():',
+             '    a0 = [1, 2, 3, 4, 5, 6, 7, 8]',
+             '    b0 = [3, 1, 4, 1, 5, 9, 2, 6]']
+    for k in range(1, doublings + 1):
+        lines.append('    a{} = a{} + a{}'.format(k, k - 1, k - 1))
+        lines.append('    b{} = b{} + b{}'.format(k, k - 1, k - 1))
+    lines.extend([
+        '    total = 0',
+        '    for r in range({}):'.format(repeat),
+        '        s = 0',
+        '        for i in range({}):'.format(8 * 2 ** doublings),
+        '            s = s + a{0}[i] * b{0}[i] * r'.format(doublings),
+        '        total = (total + s) % 1000003',
+        '    print(total)',
+    ])
+    return '\n'.join(lines) + '\n'
+
+
+def build(program, variant, workdir, cc, preset):
+    """
+    Compiles a SimplePython program to C and then to an executable, and
+    returns the path of the executable along with the number of loops the
+    C compiler reported as vectorized
+    """
+    name = os.path.splitext(os.path.basename(program))[0] + '-' + variant
+    c_file = os.path.join(workdir, name + '.c')
+    executable = os.path.join(workdir, name)
+    cmd = [sys.executable, COMPILER, '-o', c_file] + VARIANTS[variant] + [program]
+    # Run from the work directory so that PLY's tables don't end up in the tree
+    subprocess.run(cmd, cwd=workdir, check=True, stdout=subprocess.DEVNULL)
+
+    report_flags = CLANG_REPORT_FLAGS if cc.is_clang else GCC_REPORT_FLAGS
+    result = cc.run([cc.cc] + cc.flags(preset) + report_flags + ['-o', executable, c_file])
+    vectorized = sum(1 for line in result.stderr.splitlines() if 'loop vectorized' in line or 'vectorized loop' in line)
+    return executable, vectorized
+
+
+def run(executable, repeat):
+    """
+    Returns the best wall time of the executable, in seconds, along with
+    its output
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = subprocess.run([executable], stdout=subprocess.PIPE, check=True, universal_newlines=True)
+        times.append(time.perf_counter() - start)
+    return min(times), result.stdout
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser(description='Compare the loops the C compiler vectorizes, and their runtime, with and without vector hints')
+    argparser.add_argument('PROGRAM', nargs='*', help="Benchmark programs to run (defaults to a dot product and all of benchmarks/programs)")
+    argparser.add_argument('-d', '--doublings', type=int, default=13, help="Size of the dot product's arrays, as the times 8 elements are doubled")
+    argparser.add_argument('-n', '--dot-repeat', type=int, default=2000, help="Number of dot products computed")
+    argparser.add_argument('-r', '--repeat', type=int, default=5, help="Number of timed runs per executable")
+    argparser.add_argument('-b', '--build', choices=sorted(BUILD_PRESETS), default='O3-native', help="C compiler preset")
+    argparser.add_argument('--cc', action='store', help="C compiler to build with")
+    args = argparser.parse_args()
+
+    cc = CCompiler(args.cc)
+    workdir = tempfile.mkdtemp(prefix='sp-bench-')
+    try:
+        programs = [os.path.abspath(p) for p in args.PROGRAM]
+        if not programs:
+            dot_product = os.path.join(workdir, 'dot_product.py')
+            with open(dot_product, 'w') as f:
+                f.write(dot_product_source(args.doublings, args.dot_repeat))
+            programs = [dot_product] + sorted(glob.glob(os.path.join(BENCH_DIR, 'programs', '*.py')))
+
+        print('{:>16} {:>9} {:>10} {:>10}'.format('program', 'variant', 'vectorized', 'time'))
+        for program in programs:
+            name = os.path.splitext(os.path.basename(program))[0]
+            times = {}
+            outputs = {}
+            for variant in sorted(VARIANTS):
+                executable, vectorized = build(program, variant, workdir, cc, args.build)
+                times[variant], outputs[variant] = run(executable, args.repeat)
+                print('{:>16} {:>9} {:>10} {:>9.4f}s'.format(name, variant, vectorized, times[variant]))
+            if outputs['hints'] != outputs['no-hints']:
+                sys.exit('{} printed different output with the vector hints'.format(name))
+            print('{:>16} {:>9} {:>21.2f}x'.format(name, 'speedup', times['no-hints'] / times['hints']))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
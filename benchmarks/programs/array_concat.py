@@ -0,0 +1,10 @@
+def main():
+    a = [1, 2, 3, 4, 5, 6, 7, 8]
+    b = [8, 7, 6, 5, 4, 3, 2, 1]
+    total = 0
+    i = 0
+    while i < 1000000:
+        c = a + b
+        total = (total + c[i % 16]) % 1000003
+        i = i + 1
+    print(total)
@@ -0,0 +1,14 @@
+def main():
+    a = [3, 1, 4, 1, 5, 9, 2, 6, 5, 3, 5, 8, 9, 7, 9, 3]
+    b = [2, 7, 1, 8, 2, 8, 1, 8, 2, 8, 4, 5, 9, 0, 4, 5]
+    a2 = a + b
+    b2 = b + a
+    a4 = a2 + b2
+    b4 = b2 + a2
+    a8 = a4 + b4
+    b8 = b4 + a4
+    total = 0
+    for r in range(50000):
+        c = a8 * r - b8
+        total = (total + sum(c) + max(c) - min(c) + len(c)) % 1000003
+    print(total)
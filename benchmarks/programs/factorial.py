@@ -0,0 +1,14 @@
+def fact(n: int) -> int:
+    if n < 2:
+        return 1
+    else:
+        return (n * fact(n - 1)) % 1000003
+
+
+def main():
+    total = 0
+    i = 0
+    while i < 100000:
+        total = (total + fact(500)) % 1000003
+        i = i + 1
+    print(total)
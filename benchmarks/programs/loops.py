@@ -0,0 +1,10 @@
+def main():
+    total = 0
+    i = 0
+    while i < 10000:
+        j = 0
+        while j < 5000:
+            total = (total + i * j) % 1000003
+            j = j + 1
+        i = i + 1
+    print(total)
@@ -0,0 +1,7 @@
+def main():
+    s = ''
+    i = 0
+    while i < 5000:
+        s = s + 'ab'
+        i = i + 1
+    print(s)
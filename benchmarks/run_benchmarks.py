@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+
+import argparse
+import glob
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+COMPILER = os.path.join(BENCH_DIR, '..', 'SimplePythonMain.py')
+
+sys.path.insert(0, os.path.join(BENCH_DIR, '..'))
+
+from SimplePythonBuild import CCompiler, BUILD_PRESETS
+
+SCHEMA = 'pytoc-runtime-bench/1'
+
+# Each program is compiled once per variant, with these compiler flags
+VARIANTS = {
+    'O0': [],
+    'O': ['-O'],
+}
+
+
+def build(program, variant, workdir, cc, preset):
+    """
+    Compiles a SimplePython program to C and then to an executable, and
+    returns the path of the executable
+    """
+    name = os.path.splitext(os.path.basename(program))[0] + '-' + variant
+    c_file = os.path.join(workdir, name + '.c')
+    executable = os.path.join(workdir, name)
+    cmd = [sys.executable, COMPILER, '-o', c_file] + VARIANTS[variant] + [program]
+    # Run from the work directory so that PLY's tables don't end up in the tree
+    subprocess.run(cmd, cwd=workdir, check=True, stdout=subprocess.DEVNULL)
+    cc.compile([c_file], executable, preset)
+    return executable
+
+
+def run_once(executable):
+    """
+    Runs the executable and returns its wall time in seconds and its peak
+    RSS in KiB
+    """
+    start = time.perf_counter()
+    proc = subprocess.Popen([executable], stdout=subprocess.DEVNULL)
+    _, status, rusage = os.wait4(proc.pid, 0)
+    elapsed = time.perf_counter() - start
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    if proc.returncode != 0:
+        raise RuntimeError('{} exited with status {}'.format(executable, proc.returncode))
+    return elapsed, rusage.ru_maxrss
+
+
+def count_instructions(executable):
+    """
+    Returns the number of user-space instructions retired by one run of
+    the executable, or None if perf isn't available
+    """
+    perf = shutil.which('perf')
+    if perf is None:
+        return None
+    result = subprocess.run([perf, 'stat', '-x', ',', '-e', 'instructions:u', executable],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, universal_newlines=True)
+    for line in result.stderr.splitlines():
+        fields = line.split(',')
+        if len(fields) > 2 and fields[2].startswith('instructions') and fields[0].isdigit():
+            return int(fields[0])
+    return None
+
+
+def bench(executable, repeat):
+    times = []
+    rss = []
+    for _ in range(repeat):
+        elapsed, max_rss = run_once(executable)
+        times.append(elapsed)
+        rss.append(max_rss)
+
+    return {
+        'time_s': {
+            'min': round(min(times), 6),
+            'median': round(statistics.median(times), 6),
+            'mean': round(statistics.mean(times), 6),
+            'stdev': round(statistics.stdev(times), 6) if len(times) > 1 else 0.0,
+        },
+        'instructions': count_instructions(executable),
+        'max_rss_kib': max(rss),
+    }
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser(description='Measure the runtime of the native code generated for the benchmark programs')
+    argparser.add_argument('PROGRAM', nargs='*', help="Benchmark programs to run (defaults to all of benchmarks/programs)")
+    argparser.add_argument('-r', '--repeat', type=int, default=5, help="Number of timed runs per executable")
+    argparser.add_argument('-o', '--output', action='store', help="Write the JSON report to this file instead of stdout")
+    argparser.add_argument('-b', '--build', choices=sorted(BUILD_PRESETS), default='O2', help="C compiler preset")
+    argparser.add_argument('--cc', action='store', help="C compiler to build with")
+    args = argparser.parse_args()
+
+    programs = args.PROGRAM or sorted(glob.glob(os.path.join(BENCH_DIR, 'programs', '*.py')))
+    programs = [os.path.abspath(p) for p in programs]
+    cc = CCompiler(args.cc)
+
+    results = []
+    workdir = tempfile.mkdtemp(prefix='sp-bench-')
+    try:
+        for program in programs:
+            for variant in sorted(VARIANTS):
+                executable = build(program, variant, workdir, cc, args.build)
+                result = bench(executable, args.repeat)
+                result['program'] = os.path.splitext(os.path.basename(program))[0]
+                result['variant'] = variant
+                results.append(result)
+                print('{:>16} {:>3}: {:.4f} s'.format(result['program'], variant, result['time_s']['median']),
+                      file=sys.stderr)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'schema': SCHEMA,
+        'cc': cc.cc,
+        'preset': args.build,
+        'repeat': args.repeat,
+        'machine': platform.machine(),
+        'results': results,
+    }
+
+    out = open(args.output, 'w') if args.output else sys.stdout
+    json.dump(report, out, indent=2, sort_keys=True)
+    out.write('\n')
+    if out is not sys.stdout:
+        out.close()
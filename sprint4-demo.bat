@@ -23,3 +23,17 @@
 @ python SimplePythonMain.py -vio sprint4-demo/demo_output/demo11_Optimized_output.c -O sprint4-demo/demo11_propagation_if_while.py > sprint4-demo/demo_output/demo11_Optimized_output_IR.txt 2>&1
 @ python SimplePythonMain.py -vio sprint4-demo/demo_output/demo12_output.c              sprint4-demo/demo12_array_access_error.py > sprint4-demo/demo_output/demo12_output_IR.txt 2>&1
 @ python SimplePythonMain.py -vio sprint4-demo/demo_output/demo12_Optimized_output.c -O sprint4-demo/demo12_array_access_error.py > sprint4-demo/demo_output/demo12_Optimized_output_IR.txt 2>&1
+@ python SimplePythonMain.py -vio sprint4-demo/demo_output/demo13_output.c              sprint4-demo/demo13_for_range.py > sprint4-demo/demo_output/demo13_output_IR.txt 2>&1
+@ python SimplePythonMain.py -vio sprint4-demo/demo_output/demo13_Optimized_output.c -O sprint4-demo/demo13_for_range.py > sprint4-demo/demo_output/demo13_Optimized_output_IR.txt 2>&1
+@ python SimplePythonMain.py -vio sprint4-demo/demo_output/demo14_output.c              sprint4-demo/demo14_builtins.py > sprint4-demo/demo_output/demo14_output_IR.txt 2>&1
+@ python SimplePythonMain.py -vio sprint4-demo/demo_output/demo14_Optimized_output.c -O sprint4-demo/demo14_builtins.py > sprint4-demo/demo_output/demo14_Optimized_output_IR.txt 2>&1
+@ python SimplePythonMain.py -vio sprint4-demo/demo_output/demo15_output.c              sprint4-demo/demo15_slices.py > sprint4-demo/demo_output/demo15_output_IR.txt 2>&1
+@ python SimplePythonMain.py -vio sprint4-demo/demo_output/demo15_Optimized_output.c -O sprint4-demo/demo15_slices.py > sprint4-demo/demo_output/demo15_Optimized_output_IR.txt 2>&1
+@ python SimplePythonMain.py -vio sprint4-demo/demo_output/demo16_output.c              sprint4-demo/demo16_reassigned_arrays.py > sprint4-demo/demo_output/demo16_output_IR.txt 2>&1
+@ python SimplePythonMain.py -vio sprint4-demo/demo_output/demo16_Optimized_output.c -O sprint4-demo/demo16_reassigned_arrays.py > sprint4-demo/demo_output/demo16_Optimized_output_IR.txt 2>&1
+@ python SimplePythonMain.py -vio sprint4-demo/demo_output/demo17_output.c              sprint4-demo/demo17_string_lengths.py > sprint4-demo/demo_output/demo17_output_IR.txt 2>&1
+@ python SimplePythonMain.py -vio sprint4-demo/demo_output/demo17_Optimized_output.c -O sprint4-demo/demo17_string_lengths.py > sprint4-demo/demo_output/demo17_Optimized_output_IR.txt 2>&1
+@ python SimplePythonMain.py -vio sprint4-demo/demo_output/demo18_output.c              sprint4-demo/demo18_unrolled_strings.py > sprint4-demo/demo_output/demo18_output_IR.txt 2>&1
+@ python SimplePythonMain.py -vio sprint4-demo/demo_output/demo18_Optimized_output.c -O sprint4-demo/demo18_unrolled_strings.py > sprint4-demo/demo_output/demo18_Optimized_output_IR.txt 2>&1
+@ python SimplePythonMain.py -vio sprint4-demo/demo_output/demo19_output.c              sprint4-demo/demo19_parallel_reductions.py > sprint4-demo/demo_output/demo19_output_IR.txt 2>&1
+@ python SimplePythonMain.py -vio sprint4-demo/demo_output/demo19_Optimized_output.c -O sprint4-demo/demo19_parallel_reductions.py > sprint4-demo/demo_output/demo19_Optimized_output_IR.txt 2>&1
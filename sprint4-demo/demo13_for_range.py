@@ -0,0 +1,18 @@
+def sum_to(n: int) -> int:
+    total = 0
+    for i in range(1, n + 1):
+        total = total + i
+    return total
+
+def main():
+    x = [2, 4, 6]
+    y = [1, 3, 5]
+    z = x + y
+
+    for i in range(6):
+        print(z[i])
+
+    for i in range(5, 0, -2):
+        print(i)
+
+    print(sum_to(10))
@@ -0,0 +1,15 @@
+def main():
+    x = [2, 4, 6]
+    y = [1, 3, 5]
+    z = x + y
+
+    for i in range(len(z)):
+        print(z[i])
+
+    print(sum(z), min(z), max(z))
+    print(max(len(x), 2))
+
+    diff = x - y
+    scaled = y * 10
+    for i in range(len(diff)):
+        print(diff[i], scaled[i], x[i] % 4)
@@ -0,0 +1,16 @@
+def main():
+    x = [1, 2, 3, 4, 5, 6, 7, 8]
+    head = x[:3]
+    tail = x[5:]
+    print(len(head), sum(head), len(tail), tail[0])
+    print(x[-2:][0], len(x[6:2]))
+
+    total = 0
+    for i in range(len(x)):
+        window = x[i:i + 3]
+        total = total + sum(window)
+    print(total)
+
+    m = [[1, 2, 3], [4, 5, 6], [7, 8, 9]]
+    rows = m[1:]
+    print(len(rows), rows[0][2], sum(m[2][:2]))
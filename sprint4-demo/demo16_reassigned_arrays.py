@@ -0,0 +1,31 @@
+def grow(n: int) -> int:
+    x = [1, 2]
+    if n > 0:
+        x = x + [3]
+    return len(x)
+
+def loop(n: int) -> int:
+    x = [1, 2]
+    i = 0
+    while i < n:
+        x = x + [i]
+        i = i + 1
+    return sum(x)
+
+def names(n: int) -> int:
+    arr = ["a"]
+    for i in range(n):
+        arr = arr + ["b"]
+    return len(arr)
+
+def nested(n: int) -> int:
+    m = [[1, 2], [3, 4]]
+    if n > 0:
+        m = [[1, 2, 3], [4, 5, 6], [7, 8, 9]]
+    return m[1][1] + len(m)
+
+def main():
+    print(grow(0), grow(1))
+    print(loop(5))
+    print(names(10))
+    print(nested(0), nested(1))
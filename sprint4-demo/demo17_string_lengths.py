@@ -0,0 +1,26 @@
+def f(s: str) -> int:
+    a = len(s)
+    s = s + "xyz"
+    b = len(s)
+    return a * 100 + b
+
+def grow(n: int) -> int:
+    s = "ab"
+    t = s + "c"
+    i = 0
+    while i < n:
+        s = s + t
+        i = i + 1
+    return len(s)
+
+def pick(n: int) -> int:
+    s = "hello"
+    k = len(s)
+    if n > 0:
+        s = "hi"
+    return k + len(s)
+
+def main():
+    print(f("ab"))
+    print(grow(4))
+    print(pick(0), pick(1))
@@ -0,0 +1,29 @@
+def total(n: int) -> int:
+    s = 0
+    for i in range(3):
+        s = s + sum([i, n])
+    return s
+
+def mix(n: int) -> int:
+    a = [n, n + 1, n + 2, n + 3]
+    s = 0
+    for i in range(4):
+        s = s + a[i] + min([i, n]) + len(a[i:])
+    return s
+
+def main():
+    s = "q"
+    for i in range(4):
+        t = s + "x"
+        u = t + "?"
+        print(u)
+    w = ""
+    for i in range(3):
+        w = w + "ab"
+    print(w, len(w))
+    n = 0
+    while n < 50:
+        w = w + "ab"
+        n = n + 1
+    print(len(w))
+    print(total(5), mix(2))
@@ -0,0 +1,15 @@
+def main():
+    y = [3, 1, 4, 1, 5, 9, 2, 6]
+    t = 0
+    parallel for i in range(8):
+        t = t + len(y) + y[i]
+    u = 0
+    parallel for i in range(8):
+        u = y[i] + u + i * 2
+    p = 1
+    parallel for i in range(1, 6):
+        p = i * p * 2
+    ok = True
+    parallel for i in range(8):
+        ok = y[i] > 0 and ok and y[i] < 10
+    print(t, u, p, ok)